@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""Assemblies: products made of several splices in one piece of rope, eg. a locked eye
+on one end and a chain splice on the other, worked out in one go instead of running
+each calculator and adding up the lengths by hand.
+
+An assembly is a JSON object, one per line of a catalog:
+    {"sku": "HB-58-EC", "rope_type": "hollow_braid", "rope_diameter": "5/8", "length": "10ft",
+     "parts": [{"calculation": "eye", "radius": 1}, {"calculation": "chain_splice", "chain_radius": "3/8"}]}
+
+Each part is a job in the batch mode format (see headless.py), and everything in the
+assembly but 'sku', 'length' and 'parts' is passed on to every part, so the rope only
+needs to be given once. A part can use another part's result for a parameter, as
+'@<part>.<result>', eg. a grog sling sized from the fid length:
+    {"calculation": "grog_sling", "sling_radius": "@fid_length.half_length"}
+A part is called by its 'id', or by its calculation if it doesn't have one.
+
+The parts and the results they use make a DAG, which is sorted into levels with
+graphlib when the assembly is read. A catalog is then calculated a level at a time:
+each round calculates that level of every assembly as one batch per calculation (with
+NumPy when it's installed). The same calculation with the same arguments is only ever
+calculated once, whether it's in one assembly twice or in a thousand of them, and one
+that can't be calculated (eg. an eye too small for the rope) only fails the assemblies
+that use it.
+
+The rope an assembly needs is its 'length' (the finished length between the ends, 0
+if it isn't given) plus the cut length of each of its parts. Parts that don't use
+rope, like the fid length, and parts with "cut": false don't add to it.
+
+Usage:
+  assembly.py [<catalog>] [--output-format=<format>]
+  assembly.py --help
+
+Options:
+  --output-format=<format>  'jsonl' for every part's results, or 'csv' for just the
+                            total length of each assembly. [default: jsonl]
+  -h --help                 Show this message.
+
+Reads the catalog from stdin if no file is given, and writes the results to stdout in
+the same order.
+"""
+from __future__ import annotations
+import csv
+import json
+import os
+import sys
+from functools import cache
+from graphlib import CycleError, TopologicalSorter
+from typing import Iterable, Iterator, NamedTuple, TextIO
+import headless
+import parser
+import utilities
+
+# Assemblies read and calculated together
+CHUNK_SIZE = 4096
+
+# Calculations kept for reuse by later chunks before starting again
+MAX_INVOCATIONS = 65536
+
+# Keys of an assembly that aren't passed on to its parts
+OWN_KEYS = ("sku", "length", "parts")
+
+
+class AssemblyError(ValueError):
+    """Raised when an assembly can't be read or calculated."""
+    # The SKU of the assembly, if it got that far
+    sku = ""
+
+
+class Part(NamedTuple):
+    id: str
+    calculation: type
+    # The part's job, with the assembly's keys filled in
+    job: dict
+    # Parameter: (part, result) it comes from
+    references: dict[str, tuple[str, str]]
+    # Whether its cut length adds to the assembly's
+    cut: bool
+
+    def arguments(self, results: dict[str, dict]) -> tuple:
+        """Gets the arguments for calculate(), once the parts it uses have results.
+
+        Args:
+            results (dict[str, dict]): The records of the assembly's parts so far,
+                with each result by name.
+
+        Raises:
+            headless.JobError: If a parameter is missing or has a bad value.
+        """
+        job = self.job
+        if self.references:
+            job = {**job, **{key: results[part][result] for key, (part, result) in self.references.items()}}
+        return tuple(headless.job_arguments(self.calculation, job))
+
+
+class Assembly:
+    def __init__(self, definition: dict):
+        """An assembly, checked and ready to calculate.
+
+        Args:
+            definition (dict): The assembly, in the format in the module docstring.
+
+        Raises:
+            AssemblyError: If the assembly isn't valid, eg. a part refers to one that
+                isn't there, or two parts depend on each other.
+        """
+        if not isinstance(definition, dict):
+            raise AssemblyError("assembly is not a JSON object")
+        self.sku = str(definition.get("sku", ""))
+        try:
+            self.length = parser.parse_length(definition.get("length") or 0)
+        except (TypeError, ValueError):
+            raise AssemblyError("'length' is not a length") from None
+        parts = definition.get("parts")
+        if not isinstance(parts, list) or not parts:
+            raise AssemblyError("no parts given")
+
+        shared = {k: v for k, v in definition.items() if k not in OWN_KEYS}
+        self.parts: dict[str, Part] = {}
+        for part in parts:
+            if not isinstance(part, dict):
+                raise AssemblyError("part is not a JSON object")
+            job = {**shared, **part}
+            rope_type = job.get("rope_type")
+            calculation = _find_calculation(str(job.get("calculation", "")), rope_type and str(rope_type))
+            id = str(part.get("id") or job["calculation"])
+            if id in self.parts:
+                raise AssemblyError(f"two parts called '{id}', give them each an 'id'")
+            references = {
+                key: _reference(value) for key, value in job.items()
+                if isinstance(value, str) and value.startswith("@")
+            }
+            cut = job.get("cut", True)
+            if not isinstance(cut, bool):
+                raise AssemblyError(f"part '{id}': 'cut' must be true or false")
+            self.parts[id] = Part(id, calculation, job, references, cut)
+
+        for id, part in self.parts.items():
+            for key, (other, result) in part.references.items():
+                if other not in self.parts:
+                    raise AssemblyError(f"part '{id}' uses '{other}', which isn't a part")
+                if result not in self.parts[other].calculation.results:
+                    options = ", ".join(self.parts[other].calculation.results)
+                    raise AssemblyError(f"'{other}' has no result '{result}', options are: {options}")
+
+        # The parts in the order they can be calculated, where each level only uses
+        # results from the ones before it
+        self.levels = _levels(tuple(
+            (id, tuple(other for other, _ in part.references.values())) for id, part in self.parts.items()
+        ))
+
+    def total_length(self, results: dict[str, dict]) -> float:
+        """Works out the rope the assembly needs, from the results of its parts."""
+        total = self.length
+        for id, part in self.parts.items():
+            if part.cut and hasattr(part.calculation, "cut_length"):
+                total += results[id][part.calculation.cut_length]
+        return total
+
+
+@cache
+def _find_calculation(name: str, rope_type: str = None) -> type:
+    # The rope type is given once for the whole assembly, so it mustn't hide the
+    # calculations that work for any rope, like the fid length. Catalogs use the
+    # same few calculations over and over, so the lookups are cached.
+    try:
+        return headless.find_calculation(name, rope_type)
+    except headless.JobError as e:
+        error = e
+    try:
+        calculation = headless.find_calculation(name)
+    except headless.JobError:
+        calculation = None
+    if calculation is None or calculation.rope_type is not utilities.RopeType.GENERAL:
+        raise AssemblyError(str(error))
+    return calculation
+
+
+@cache
+def _levels(graph: tuple[tuple[str, tuple[str, ...]], ...]) -> list[list[str]]:
+    # Sorts the parts into levels, given the parts each one uses. Catalogs repeat the
+    # same few shapes of assembly, so this is cached on the shape.
+    if not any(uses for _, uses in graph):
+        return [[id for id, _ in graph]]
+    try:
+        order = list(TopologicalSorter(dict(graph)).static_order())
+    except CycleError as e:
+        raise AssemblyError(f"parts depend on each other: {' -> '.join(e.args[1])}") from None
+    uses = dict(graph)
+    depth = {}
+    for id in order:
+        depth[id] = max((depth[other] + 1 for other in uses[id]), default=0)
+    levels = [[] for _ in range(max(depth.values()) + 1)]
+    for id, _ in graph:
+        levels[depth[id]].append(id)
+    return levels
+
+
+def _reference(value: str) -> tuple[str, str]:
+    part, dot, result = value[1:].rpartition(".")
+    if not dot or not part or not result:
+        raise AssemblyError(f"'{value}' should be '@<part>.<result>'")
+    return part, result
+
+
+class Evaluator:
+    def __init__(self):
+        """Calculates assemblies, keeping the result of every calculation it runs so
+        that later assemblies can reuse them.
+        """
+        # (calculation, arguments): its record (see headless.result_record), which has
+        # each result by name, or the error if it couldn't be calculated
+        self.invocations: dict[tuple[type, tuple], dict | AssemblyError] = {}
+        # Parts asked for, and calculations actually run
+        self.requested = 0
+        self.calculated = 0
+
+    def evaluate(self, assemblies: list[Assembly]) -> list[dict[str, dict] | AssemblyError]:
+        """Calculates every part of every assembly.
+
+        Args:
+            assemblies (list[Assembly]): The assemblies.
+
+        Returns:
+            list[dict[str, dict] | AssemblyError]: For each assembly, the record of
+                each of its parts (see headless.result_record), by part, or the error
+                if one of its parts couldn't be calculated. Records are shared between
+                assemblies, so they mustn't be changed.
+        """
+        results: list[dict | AssemblyError] = [{} for _ in assemblies]
+        invocations = self.invocations
+        if len(invocations) > MAX_INVOCATIONS:
+            invocations.clear()
+
+        # Each level of every assembly at once, with one batch per calculation
+        for level in range(max((len(a.levels) for a in assemblies), default=0)):
+            ready: list[tuple[int, str, tuple]] = []
+            pending: dict[type, dict[tuple, None]] = {}
+            for i, assembly in enumerate(assemblies):
+                if level >= len(assembly.levels) or isinstance(results[i], AssemblyError):
+                    continue
+                for id in assembly.levels[level]:
+                    part = assembly.parts[id]
+                    try:
+                        arguments = part.arguments(results[i])
+                    except headless.JobError as e:
+                        results[i] = AssemblyError(f"part '{id}': {e}")
+                        break
+                    key = (part.calculation, arguments)
+                    if key not in invocations:
+                        pending.setdefault(part.calculation, {})[arguments] = None
+                    ready.append((i, id, key))
+
+            for calculation, jobs in pending.items():
+                jobs = list(jobs)
+                try:
+                    batch = headless.calculate_many(calculation, jobs)
+                except (ArithmeticError, ValueError, TypeError):
+                    # Without NumPy one bad job fails the whole batch, so find out which
+                    # by calculating them one at a time
+                    batch = [None] * len(jobs)
+                for arguments, values in zip(jobs, batch):
+                    invocations[(calculation, arguments)] = _invocation(calculation, arguments, values)
+                self.calculated += len(jobs)
+            self.requested += len(ready)
+
+            for i, id, key in ready:
+                if isinstance(results[i], AssemblyError):
+                    continue
+                record = invocations[key]
+                if isinstance(record, AssemblyError):
+                    results[i] = AssemblyError(f"part '{id}': {record}")
+                else:
+                    results[i][id] = record
+        return results
+
+
+def _invocation(calculation: type, arguments: tuple, values: tuple[float] = None) -> dict | AssemblyError:
+    # The record for one calculation, calculating it on its own if there are no values
+    # for it. Jobs that can't be calculated raise in the formulas, or come out infinite
+    # or NaN from the batch versions, which result_record() can't write.
+    try:
+        if values is None:
+            values = headless.calculate_many(calculation, [arguments])[0]
+        return headless.result_record(calculation, values)
+    except (ArithmeticError, ValueError, TypeError) as e:
+        return AssemblyError(f"calculation failed ({e})")
+
+
+def result_record(assembly: Assembly, results: dict[str, dict]) -> dict:
+    """Builds the output record for an assembly, with its total length and the records
+    of its parts from Evaluator.evaluate()."""
+    total = assembly.total_length(results)
+    return {
+        "sku": assembly.sku,
+        "total_length": total,
+        "total_length_text": utilities.as_mixed_number(total),
+        "parts": {id: results[id] for id in assembly.parts},
+    }
+
+
+def read_assemblies(lines: Iterable[str]) -> Iterator[Assembly | AssemblyError]:
+    """Reads assemblies from lines of JSON, one at a time.
+
+    Yields:
+        Assembly | AssemblyError: Each assembly, or the error for a line that couldn't
+            be read.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            definition = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield AssemblyError(f"invalid JSON ({e.msg})")
+            continue
+        try:
+            yield Assembly(definition)
+        except AssemblyError as e:
+            if isinstance(definition, dict):
+                e.sku = str(definition.get("sku", ""))
+            yield e
+
+
+def run(source: TextIO, destination: TextIO, output_format: str = "jsonl", log: TextIO = None) -> int:
+    """Calculates a catalog of assemblies a chunk at a time, writing a result for each
+    one in the same order.
+
+    Args:
+        source (TextIO): The catalog, one assembly per line.
+        destination (TextIO): The stream to write the results to.
+        output_format (str, optional): 'jsonl' or 'csv'. Defaults to "jsonl".
+        log (TextIO, optional): Where to report errors. Defaults to sys.stderr.
+
+    Returns:
+        int: 0 if every assembly was calculated, 1 if any of them failed.
+    """
+    if log is None:
+        log = sys.stderr
+    evaluator = Evaluator()
+    failed = False
+    if output_format == "csv":
+        writer = csv.DictWriter(destination, ["sku", "total_length", "total_length_text", "error"], extrasaction="ignore")
+        writer.writeheader()
+
+    assemblies = read_assemblies(source)
+    line_number = 0
+    while True:
+        chunk = [a for _, a in zip(range(CHUNK_SIZE), assemblies)]
+        if not chunk:
+            break
+        valid = [a for a in chunk if isinstance(a, Assembly)]
+        evaluated = iter(evaluator.evaluate(valid))
+        lines = []
+        for assembly in chunk:
+            line_number += 1
+            results = next(evaluated) if isinstance(assembly, Assembly) else assembly
+            if isinstance(results, AssemblyError):
+                failed = True
+                sku = assembly.sku
+                print(f"line {line_number}: {sku + ': ' if sku else ''}{results}", file=log)
+                row = {"sku": sku, "error": str(results)}
+            else:
+                row = result_record(assembly, results)
+            if output_format == "csv":
+                writer.writerow(row)
+            else:
+                lines.append(json.dumps(row) + "\n")
+        destination.write("".join(lines))
+    destination.flush()
+    return 1 if failed else 0
+
+
+def main(arguments: dict) -> int:
+    """Runs the command in the usage.
+
+    Returns:
+        int: The exit status.
+    """
+    if arguments["--output-format"] not in ("jsonl", "csv"):
+        print("Error: the output format must be 'jsonl' or 'csv'", file=sys.stderr)
+        return 2
+    try:
+        if arguments["<catalog>"]:
+            with open(arguments["<catalog>"]) as catalog:
+                return run(catalog, sys.stdout, arguments["--output-format"])
+        return run(sys.stdin, sys.stdout, arguments["--output-format"])
+    except OSError as e:
+        if isinstance(e, BrokenPipeError):
+            # See headless.main
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+
+    sys.exit(main(docopt(__doc__)))
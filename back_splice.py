@@ -1,16 +1,30 @@
 #!/usr/bin/env python3
-from prompt_toolkit import PromptSession
-from prompt_toolkit.styles import Style
-from prompt_toolkit.shortcuts import input_dialog, message_dialog
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import core
+import parser
 import utilities
 import translate as tr
 
+if TYPE_CHECKING:
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.styles import Style
+
 
 class TwistedBackSplice:
     # Default value only, will be overridden by constructor with translation value
     title = "Back Splice"
+    name = "back_splice"
+    aliases = ("back",)
     rope_type = utilities.RopeType.TWISTED
     reference = "ABOK #2813"
+    parameters = ("rope_diameter",)
+    # Spec fields (see ropespec.py) that calculate() takes as keywords
+    multipliers = ("back_splice_multiplier",)
+    results = ("length",)
+    # Translation keys for the results, in the same order
+    labels = ("length",)
+    cut_length = "length"
 
     def __init__(
         self, session: PromptSession, style: Style, lang: str = "en"
@@ -26,47 +40,48 @@ class TwistedBackSplice:
         self.session = session
         self.lang = lang
         
-        self.title = tr.back_splice[lang]
+        self.msg = tr.catalog(lang)
+        self.title = self.msg.back_splice
     
-    def calculate(self, rope_diameter: float) -> float:
+    def calculate(self, rope_diameter: float, **multipliers: float) -> float:
             """Calculate length required for the back splice.
 
             Args:
                 rope_diameter (float): The rope diameter to calculate for.
+                **multipliers (float): Overrides for its 'multipliers', eg. from the
+                    rope's spec (see ropespec.py).
 
             Returns:
                 float: The length needed to tie a back splice.
             """
-            # === Run calculations ===
-            return rope_diameter * 15
-    
+            return core.back_splice_length(rope_diameter, **multipliers)
+
     def text(self):
         """Collects parameters and prints results in a basic text format."""
         # === Collect parameters ===
-        rope_diameter = float(self.session.prompt(tr.rope_diameter_message[self.lang]))
+        rope_diameter = parser.parse_length(self.session.prompt(self.msg.rope_diameter_message))
 
         # === Run calculations ===
         length = self.calculate(rope_diameter)
 
         # === Display results ===
-        print(
-            f"{tr.results[self.lang]}\n================",
-            f"{tr.length[self.lang]}: {utilities.as_mixed_number(length)}",
-            sep="\n"
-        )
+        template = self.msg.result_template(*self.labels)
+        print(template(*utilities.as_mixed_numbers((length,))))
 
     def dialog(self):
         """Collects parameters and prints results with a console GUI."""
+        from screen import input_dialog, message_dialog
+
         # === Collect parameters ===
         # try/except because when the user hits 'Cancel' on the dialog, it returns None
-        # which causes float() to throw a TypeError
+        # which causes parser.parse_length() to throw a TypeError
         try:
-            rope_diameter = float(
+            rope_diameter = parser.parse_length(
                 input_dialog(
                     title=self.title,
-                    text=tr.rope_diameter_message[self.lang],
-                    ok_text=tr.ok[self.lang],
-                    cancel_text=tr.cancel[self.lang],
+                    text=self.msg.rope_diameter_message,
+                    ok_text=self.msg.ok,
+                    cancel_text=self.msg.cancel,
                     style=self.style
                 ).run()
             )
@@ -77,10 +92,11 @@ class TwistedBackSplice:
         length = self.calculate(rope_diameter)
 
         # === Show results ===
+        template = self.msg.result_template(*self.labels, header=False)
         message_dialog(
             title=self.title,
-            text=f"{tr.length[self.lang]}: {utilities.as_mixed_number(length)}",
-            ok_text=tr.ok[self.lang],
+            text=template(*utilities.as_mixed_numbers((length,))),
+            ok_text=self.msg.ok,
             style=self.style
         ).run()
 
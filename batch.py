@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""Vectorized versions of the calculators' calculate() methods, for working through a
+large number of jobs at once.
+
+Each function takes NumPy arrays (or anything that can be broadcast into one) of the
+same parameters as the matching calculate() method, and returns a structured array
+with one field per value in the calculate() result tuple. The arithmetic is generated
+from the same expression tree as the scalar function in core.py (see formula.py), so
+a formula only ever needs to change there. 'verify()' (or running this file directly)
+still checks the two against each other.
+"""
+import numpy as np
+import core
+import registry
+import ropespec
+import eye_splice, back_splice, chain_splice, grog_sling, general
+
+
+def result_dtype(calculator: type) -> np.dtype:
+    """Builds the structured dtype used for the results of a calculator.
+
+    Args:
+        calculator (type): The calculator class.
+
+    Returns:
+        np.dtype: A dtype with a float64 field for each of the calculator's results.
+    """
+    return np.dtype([(name, np.float64) for name in calculator.results])
+
+
+def _pack(calculator: type, *columns: np.ndarray) -> np.ndarray:
+    """Packs the result columns into a structured array for the given calculator."""
+    out = np.empty(np.broadcast_shapes(*[np.shape(c) for c in columns]), dtype=result_dtype(calculator))
+    for name, column in zip(calculator.results, columns):
+        out[name] = column
+    return out
+
+
+def twisted_eye_splice(eye_radius, rope_diameter, tuck_count, **multipliers) -> np.ndarray:
+    """Batch version of 'eye_splice.TwistedEyeSplice.calculate'.
+
+    Args:
+        eye_radius (ArrayLike): The desired eye radii.
+        rope_diameter (ArrayLike): The diameters of the rope being used.
+        tuck_count (ArrayLike): The desired numbers of 'tucks'.
+        **multipliers (ArrayLike): Overrides for the calculator's 'multipliers'.
+
+    Returns:
+        np.ndarray: Structured array with the fields (full_length, eye_length,
+            tuck_length, lost_length).
+    """
+    columns = core.twisted_eye_splice.formula.vector(eye_radius, rope_diameter, tuck_count, **multipliers)
+    return _pack(eye_splice.TwistedEyeSplice, *columns)
+
+
+def locked_eye_splice(eye_radius, rope_diameter, **multipliers) -> np.ndarray:
+    """Batch version of 'eye_splice.HollowBraidLockedEyeSplice.calculate'.
+
+    Args:
+        eye_radius (ArrayLike): The desired eye radii.
+        rope_diameter (ArrayLike): The diameters of the rope.
+        **multipliers (ArrayLike): Overrides for the calculator's 'multipliers'.
+
+    Returns:
+        np.ndarray: Structured array with the fields (full_length, eye_length,
+            bury_length, lost_length).
+    """
+    columns = core.locked_eye_splice.formula.vector(eye_radius, rope_diameter, **multipliers)
+    return _pack(eye_splice.HollowBraidLockedEyeSplice, *columns)
+
+
+def twisted_chain_splice(chain_radius, rope_diameter, tuck_count, **multipliers) -> np.ndarray:
+    """Batch version of 'chain_splice.TwistedChainSplice.calculate'.
+
+    Args:
+        chain_radius (ArrayLike): The radii of the chain links.
+        rope_diameter (ArrayLike): The diameters of the rope.
+        tuck_count (ArrayLike): The numbers of 'tucks' desired.
+        **multipliers (ArrayLike): Overrides for the calculator's 'multipliers'.
+
+    Returns:
+        np.ndarray: Structured array with the fields (total_length, tuck_length,
+            loop_length, lost_length).
+    """
+    columns = core.twisted_chain_splice.formula.vector(chain_radius, rope_diameter, tuck_count, **multipliers)
+    return _pack(chain_splice.TwistedChainSplice, *columns)
+
+
+def hollow_braid_chain_splice(chain_radius, rope_diameter, **multipliers) -> np.ndarray:
+    """Batch version of 'chain_splice.HollowBraidChainSplice.calculate'.
+
+    Args:
+        chain_radius (ArrayLike): The radii of the chain links.
+        rope_diameter (ArrayLike): The diameters of the rope.
+        **multipliers (ArrayLike): Overrides for the calculator's 'multipliers'.
+
+    Returns:
+        np.ndarray: Structured array with the fields (total_length, bury_length,
+            loop_length, lost_length).
+    """
+    columns = core.hollow_braid_chain_splice.formula.vector(chain_radius, rope_diameter, **multipliers)
+    return _pack(chain_splice.HollowBraidChainSplice, *columns)
+
+
+def back_splice_length(rope_diameter, **multipliers) -> np.ndarray:
+    """Batch version of 'back_splice.TwistedBackSplice.calculate'.
+
+    Args:
+        rope_diameter (ArrayLike): The rope diameters to calculate for.
+        **multipliers (ArrayLike): Overrides for the calculator's 'multipliers'.
+
+    Returns:
+        np.ndarray: Structured array with the single field (length).
+    """
+    length = core.back_splice_length.formula.vector(rope_diameter, **multipliers)
+    return _pack(back_splice.TwistedBackSplice, length)
+
+
+def grog_sling_length(rope_diameter, sling_radius, **multipliers) -> np.ndarray:
+    """Batch version of 'grog_sling.GrogSling.calculate'.
+
+    Args:
+        rope_diameter (ArrayLike): The diameters of rope being used.
+        sling_radius (ArrayLike): The desired radii of the finished slings.
+        **multipliers (ArrayLike): Overrides for the calculator's 'multipliers'.
+
+    Returns:
+        np.ndarray: Structured array with the fields (total_length,
+            sling_circumference, tail_length).
+    """
+    columns = core.grog_sling_length.formula.vector(rope_diameter, sling_radius, **multipliers)
+    return _pack(grog_sling.GrogSling, *columns)
+
+
+def fid_length(rope_diameter) -> np.ndarray:
+    """Batch version of 'general.FidLengthCalculate.calculate'.
+
+    Args:
+        rope_diameter (ArrayLike): The diameters of the rope to calculate for.
+
+    Returns:
+        np.ndarray: Structured array with the fields (short_length, half_length,
+            long_length, full_length).
+    """
+    columns = core.fid_length.formula.vector(rope_diameter)
+    return _pack(general.FidLengthCalculate, *columns)
+
+
+# The batch function for each calculator class. Arguments are passed in the same order
+# as the calculator's 'parameters', and its 'multipliers' as keywords.
+kernels = {
+    eye_splice.TwistedEyeSplice: twisted_eye_splice,
+    eye_splice.HollowBraidLockedEyeSplice: locked_eye_splice,
+    chain_splice.TwistedChainSplice: twisted_chain_splice,
+    chain_splice.HollowBraidChainSplice: hollow_braid_chain_splice,
+    back_splice.TwistedBackSplice: back_splice_length,
+    grog_sling.GrogSling: grog_sling_length,
+    general.FidLengthCalculate: fid_length,
+}
+
+
+def calculate(calculator: type, **columns) -> np.ndarray:
+    """Runs the batch version of a calculator on columns of parameters.
+
+    Args:
+        calculator (type): The calculator class, eg. 'eye_splice.TwistedEyeSplice'.
+        **columns (ArrayLike): One array per name in the calculator's 'parameters',
+            and optionally per name in its 'multipliers'. When the default registry
+            has rope specs (see ropespec.py), the rope diameters are looked up in them
+            first, like the scalar calculators do.
+
+    Raises:
+        KeyError: If the calculator has no batch version.
+
+    Returns:
+        np.ndarray: Structured array with one field per name in the calculator's
+            'results'.
+    """
+    multipliers = getattr(calculator, "multipliers", ())
+    specs = registry.default().specs
+    if specs is not None and multipliers:
+        columns = resolve_specs(specs, calculator, columns)
+    return kernels[calculator](
+        *[columns[p] for p in calculator.parameters],
+        **{m: columns[m] for m in multipliers if m in columns}
+    )
+
+
+def resolve_specs(specs: ropespec.SpecDatabase, calculator: type, columns: dict) -> dict[str, np.ndarray]:
+    """Swaps the nominal rope diameters in a set of columns for the actual ones from
+    their specs, and adds a column for each of the calculator's multipliers that isn't
+    there already. Each distinct diameter is only looked up once.
+
+    Args:
+        specs (ropespec.SpecDatabase): The rope specs.
+        calculator (type): The calculator class.
+        columns (dict): One array per name in the calculator's 'parameters'.
+
+    Returns:
+        dict[str, np.ndarray]: The new columns.
+    """
+    diameters, inverse = np.unique(np.asarray(columns["rope_diameter"], dtype=np.float64), return_inverse=True)
+    resolved = [specs.resolve(calculator, d) for d in diameters.tolist()]
+    columns = dict(columns)
+    columns["rope_diameter"] = np.array([d for d, _ in resolved], dtype=np.float64)[inverse]
+    for name in calculator.multipliers:
+        if name not in columns:
+            values = [m.get(name, ropespec.DEFAULTS[name]) for _, m in resolved]
+            columns[name] = np.array(values, dtype=np.float64)[inverse]
+    return columns
+
+
+def sample_parameters(calculator: type, samples: int, seed: int = 0) -> dict[str, np.ndarray]:
+    """Generates random but realistic parameters for a calculator. Rope diameters
+    range from 1/8" to 2", radii from 1/4" to 6", and tucks from 3 to 7.
+
+    Args:
+        calculator (type): The calculator class.
+        samples (int): The number of jobs to generate.
+        seed (int, optional): Seed for the random generator. Defaults to 0.
+
+    Returns:
+        dict[str, np.ndarray]: One array per name in the calculator's 'parameters'.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for p in calculator.parameters:
+        if p == "rope_diameter":
+            columns[p] = rng.uniform(0.125, 2, samples)
+        elif p == "tuck_count":
+            columns[p] = rng.integers(3, 8, samples)
+        else:
+            columns[p] = rng.uniform(0.25, 6, samples)
+    return columns
+
+
+def verify(samples: int = 1000, seed: int = 0):
+    """Checks every batch function against the scalar calculate() method it replaces.
+
+    Args:
+        samples (int, optional): Number of random jobs to check per calculator.
+            Defaults to 1000.
+        seed (int, optional): Seed for the random parameters. Defaults to 0.
+
+    Raises:
+        ValueError: If any batch result differs from the scalar result.
+    """
+    for calculator in kernels:
+        instance = calculator(None, None)
+        columns = sample_parameters(calculator, samples, seed)
+        batch = calculate(calculator, **columns)
+
+        for i in range(samples):
+            scalar = instance.calculate(*[columns[p][i].item() for p in calculator.parameters])
+            if not isinstance(scalar, tuple):
+                scalar = (scalar,)
+            expected = np.array(scalar, dtype=np.float64)
+            got = np.array(batch[i].tolist(), dtype=np.float64)
+            if not np.allclose(got, expected, rtol=1e-12, atol=0):
+                raise ValueError(
+                    f"{calculator.__name__}: batch result {tuple(got)} does not match "
+                    f"scalar result {tuple(expected)} for job {i}"
+                )
+
+
+if __name__ == "__main__":
+    verify()
+    print(f"All {len(kernels)} batch calculations match their scalar versions.")
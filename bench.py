@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""Benchmarks for the calculations, the mixed number and result formatting, the fid
+table, and whole batches of jobs, so that a change can be checked for slowdowns before
+it goes in.
+
+Every benchmark works on synthetic jobs made from a fixed seed, with rope diameters
+from 1/8" to 2" and eye, chain and sling radii from 1/4" to 6", so two runs always see
+exactly the same inputs. Results are written as JSON, and comparing against an earlier
+results file flags anything that got slower than the threshold.
+
+Usage:
+  bench.py [--output=<file>] [--compare=<file>] [--threshold=<fraction>] [--repeat=<n>] [--seed=<n>] [--filter=<text>]
+  bench.py --help
+
+Options:
+  --output=<file>           Write the results to this file as well as the screen.
+  --compare=<file>          Earlier results to compare against.
+  --threshold=<fraction>    How much slower counts as a regression. [default: 0.10]
+  --repeat=<n>              Number of timed runs of each benchmark, the fastest is
+                            kept. [default: 5]
+  --seed=<n>                Seed for the synthetic jobs. [default: 1234]
+  --filter=<text>           Only run benchmarks with this in their name.
+  -h --help                 Show this message.
+"""
+import io
+import json
+import platform
+import random
+import sys
+import time
+from typing import Callable
+import headless
+import registry
+import utilities
+
+# Number of jobs or values each benchmark works through per run
+SIZE = 20000
+
+# name: function taking a random.Random and returning (function to time, operations)
+benchmarks: dict[str, Callable[[random.Random], tuple[Callable[[], object], int]]] = {}
+
+
+def benchmark(name: str):
+    """Decorator that adds a benchmark setup function to 'benchmarks'."""
+    def register(setup):
+        benchmarks[name] = setup
+        return setup
+    return register
+
+
+def random_arguments(calculation: type, rng: random.Random) -> list:
+    """Makes one set of realistic arguments for a calculation's calculate() method."""
+    arguments = []
+    for p in calculation.parameters:
+        if p == "rope_diameter":
+            arguments.append(rng.uniform(0.125, 2))
+        elif p == "tuck_count":
+            arguments.append(rng.randint(3, 7))
+        else:
+            arguments.append(rng.uniform(0.25, 6))
+    return arguments
+
+
+def random_job(calculation: type, rng: random.Random) -> dict:
+    """Makes a realistic job for a calculation, in the form batch mode reads."""
+    job = {"calculation": calculation.name}
+    job.update(zip(calculation.parameters, random_arguments(calculation, rng)))
+    return job
+
+
+def _calculations() -> list[type]:
+    return [c for c in registry.default() if hasattr(c, "parameters")]
+
+
+def _scalar_benchmark(calculation: type):
+    def setup(rng: random.Random):
+        calculate = registry.default().instance(calculation).calculate
+        jobs = [random_arguments(calculation, rng) for _ in range(SIZE)]
+
+        def run():
+            for arguments in jobs:
+                calculate(*arguments)
+        return run, SIZE
+    return setup
+
+
+for _c in _calculations():
+    benchmark(f"calculate.{_c.name}")(_scalar_benchmark(_c))
+
+
+@benchmark("format.as_mixed_number")
+def _format_scalar(rng: random.Random):
+    values = [rng.uniform(0, 600) for _ in range(SIZE)]
+
+    def run():
+        for v in values:
+            utilities.as_mixed_number(v)
+    return run, SIZE
+
+
+@benchmark("format.as_mixed_numbers")
+def _format_bulk(rng: random.Random):
+    values = [rng.uniform(0, 600) for _ in range(SIZE)]
+    return (lambda: utilities.as_mixed_numbers(values)), SIZE
+
+
+@benchmark("format.result_block")
+def _result_block(rng: random.Random):
+    import translate
+
+    template = translate.catalog("en").result_template("total_length", "eye_length", "tuck_length", "lost_length")
+    values = [[rng.uniform(0, 600) for _ in range(4)] for _ in range(SIZE)]
+
+    def run():
+        for v in values:
+            template(*utilities.as_mixed_numbers(v))
+    return run, SIZE
+
+
+@benchmark("table.fid_table")
+def _fid_table(rng: random.Random):
+    import general
+
+    table = general.FidLengthTable(None, None)
+    rows = len(table.fid_table) // 3
+
+    def run():
+        for _ in range(100):
+            table.build_table(rows)
+    return run, 100
+
+
+@benchmark("batch.headless_jsonl")
+def _headless(rng: random.Random):
+    calculations = _calculations()
+    lines = "".join(json.dumps(random_job(rng.choice(calculations), rng)) + "\n" for _ in range(SIZE))
+
+    def run():
+        headless.run(io.StringIO(lines), io.StringIO())
+    return run, SIZE
+
+
+@benchmark("cache.repeated_jobs")
+def _cache(rng: random.Random):
+    import memo
+
+    calculation = registry.default().get("twisted_eye_splice")
+    # Orders repeat a few dozen combinations, so most calls are hits
+    combinations = [random_arguments(calculation, rng) for _ in range(50)]
+    jobs = [rng.choice(combinations) for _ in range(SIZE)]
+    calculate = memo.Memo().cached(registry.default().instance(calculation))
+
+    def run():
+        for arguments in jobs:
+            calculate(*arguments)
+    return run, SIZE
+
+
+@benchmark("parse.order_column")
+def _parse_column(rng: random.Random):
+    import parser
+
+    # Order files repeat a handful of sizes, written every which way
+    sizes = [f"{w}-{n}/16" if w else f"{n}/16" for w in range(3) for n in range(1, 16, 2)]
+    sizes += [f'{n}/8"' for n in range(1, 8)] + [f"{n / 16}" for n in range(1, 33)]
+    column = [rng.choice(sizes) for _ in range(SIZE)]
+
+    def run():
+        parser.parse_column(column)
+    return run, SIZE
+
+
+@benchmark("batch.records")
+def _records(rng: random.Random):
+    import records
+
+    calculation = registry.default().get("twisted_eye_splice")
+    jobs = [random_arguments(calculation, rng) for _ in range(SIZE)]
+
+    def run():
+        batch = records.Batch(calculation)
+        batch.extend(jobs)
+        batch.calculate()
+    return run, SIZE
+
+
+@benchmark("batch.column_file")
+def _column_file(rng: random.Random):
+    import atexit
+    import os
+    import tempfile
+    import columnar
+    import records
+
+    calculation = registry.default().get("twisted_eye_splice")
+    jobs = records.Batch(calculation)
+    jobs.extend(random_arguments(calculation, rng) for _ in range(SIZE))
+    handle, path = tempfile.mkstemp(suffix=".cols")
+    os.close(handle)
+    atexit.register(os.remove, path)
+    columnar.write_batch(path, jobs).close()
+
+    def run():
+        with columnar.ColumnFile(path, writable=True) as columns:
+            columns.calculate()
+    return run, SIZE
+
+
+@benchmark("remnants.best_fit")
+def _remnants(rng: random.Random):
+    import remnants
+
+    inventory = remnants.Inventory()
+    for _ in range(SIZE * 10):
+        inventory.add(utilities.RopeType.TWISTED, 0.625, rng.uniform(6, 600))
+    needed = [rng.uniform(6, 620) for _ in range(SIZE)]
+
+    def run():
+        for length in needed:
+            inventory.best_fit(utilities.RopeType.TWISTED, 0.625, length)
+    return run, SIZE
+
+
+@benchmark("specs.resolved_jobs")
+def _specs(rng: random.Random):
+    import atexit
+    import os
+    import tempfile
+    import ropespec
+
+    calculation = registry.default().get("twisted_eye_splice")
+    handle, path = tempfile.mkstemp(suffix=".sqlite")
+    os.close(handle)
+    atexit.register(os.remove, path)
+    specs = ropespec.SpecDatabase(path)
+    # A spec for every 1/16" up to 2", like a full product range
+    specs.add(
+        ropespec.Spec(f"rope {n}", "", calculation.rope_type, "", n / 16, n / 16 * 0.95, None, None, None, 3.5, None)
+        for n in range(2, 33)
+    )
+    calculate = specs.wrap(calculation(None, None)).calculate
+    jobs = [random_arguments(calculation, rng) for _ in range(SIZE)]
+    for arguments in jobs:
+        arguments[1] = rng.randint(2, 32) / 16
+
+    def run():
+        for arguments in jobs:
+            calculate(*arguments)
+    return run, SIZE
+
+
+@benchmark("assembly.catalog")
+def _assembly(rng: random.Random):
+    import assembly
+
+    # A product range: a few sizes of each rope, with a choice of eyes and fittings
+    sizes = [n / 16 for n in range(4, 17)]
+    lines = []
+    for i in range(SIZE // 4):
+        rope_type = rng.choice(["twisted", "hollow_braid"])
+        parts = [
+            {"calculation": "fid_length"},
+            {"calculation": "eye", "radius": rng.choice([1, 1.5, 2, 3])},
+            {"calculation": "chain_splice", "chain_radius": rng.choice([0.375, 0.5, 0.625])},
+        ]
+        if rope_type == "hollow_braid":
+            parts.append({"calculation": "grog_sling", "sling_radius": "@fid_length.half_length", "cut": False})
+        lines.append(json.dumps({
+            "sku": f"SKU{i}", "rope_type": rope_type, "rope_diameter": rng.choice(sizes),
+            "tucks": 5, "length": rng.choice([72, 120, 240]), "parts": parts,
+        }) + "\n")
+    catalog = "".join(lines)
+
+    def run():
+        assembly.run(io.StringIO(catalog), io.StringIO())
+    return run, len(lines)
+
+
+@benchmark("formula.compile")
+def _formula_compile(rng: random.Random):
+    import core
+    import formula
+
+    # Every formula is traced and compiled when core is imported
+    functions = [f.__wrapped__ for f in vars(core).values() if hasattr(f, "formula")]
+
+    def run():
+        for function in functions:
+            formula.formula(function)
+    return run, len(functions)
+
+
+@benchmark("batch.numpy_kernels")
+def _numpy_kernels(rng: random.Random):
+    import batch
+
+    columns = {
+        c: batch.sample_parameters(c, SIZE, rng.randrange(2 ** 32))
+        for c in batch.kernels
+    }
+
+    def run():
+        for calculation, parameters in columns.items():
+            batch.calculate(calculation, **parameters)
+    return run, SIZE * len(columns)
+
+
+@benchmark("batch.inverse_kernels")
+def _inverse_kernels(rng: random.Random):
+    import batch
+    import inverse
+
+    columns = {}
+    for c in inverse.inverses:
+        parameters = batch.sample_parameters(c, SIZE, rng.randrange(2 ** 32))
+        columns[c] = (batch.calculate(c, **parameters)[c.cut_length], parameters)
+
+    def run():
+        for calculation, (lengths, parameters) in columns.items():
+            inverse.largest_radius(calculation, lengths, **parameters)
+    return run, SIZE * len(columns)
+
+
+def run_benchmarks(repeat: int = 5, seed: int = 1234, name_filter: str = None) -> dict:
+    """Runs the benchmarks.
+
+    Args:
+        repeat (int, optional): Timed runs of each benchmark, the fastest is kept.
+            Defaults to 5.
+        seed (int, optional): Seed for the synthetic jobs. Defaults to 1234.
+        name_filter (str, optional): Only run benchmarks with this in their name.
+            Defaults to None.
+
+    Returns:
+        dict: The results, with details of the machine under 'meta' and the
+            nanoseconds per operation of each benchmark under 'results'. Benchmarks
+            that failed have an 'error' instead.
+    """
+    results = {}
+    for name, setup in benchmarks.items():
+        if name_filter and name_filter not in name:
+            continue
+        try:
+            # Every benchmark gets its own generator so adding one doesn't change
+            # the inputs of the others
+            run, operations = setup(random.Random(f"{seed}:{name}"))
+            run()  # Warm up
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                best = min(best, time.perf_counter() - start)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        results[name] = {
+            "ns_per_op": best / operations * 1e9,
+            "ops_per_second": operations / best,
+            "operations": operations,
+        }
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(old: dict, new: dict, threshold: float) -> list[str]:
+    """Finds the benchmarks that got slower.
+
+    Args:
+        old (dict): Earlier results.
+        new (dict): New results.
+        threshold (float): How much slower counts as a regression, eg. 0.1 for 10%.
+
+    Returns:
+        list[str]: A description of each regression, including every benchmark that
+            failed in the new results.
+    """
+    regressions = []
+    for name, result in new["results"].items():
+        if "error" in result:
+            regressions.append(f"{name}: failed ({result['error']})")
+            continue
+        before = old["results"].get(name, {})
+        if "ns_per_op" not in result or "ns_per_op" not in before:
+            continue
+        change = result["ns_per_op"] / before["ns_per_op"] - 1
+        if change > threshold:
+            regressions.append(
+                f"{name}: {before['ns_per_op']:.0f} -> {result['ns_per_op']:.0f} ns/op ({change:+.1%})"
+            )
+    return regressions
+
+
+def main(arguments: dict) -> int:
+    """Runs the benchmarks from the command line.
+
+    Args:
+        arguments (dict): The parsed command line arguments.
+
+    Returns:
+        int: 1 if there were regressions, 0 otherwise.
+    """
+    report = run_benchmarks(int(arguments["--repeat"]), int(arguments["--seed"]), arguments["--filter"])
+    for name, result in report["results"].items():
+        if "error" in result:
+            print(f"{name:<40} ERROR {result['error']}")
+        else:
+            print(f"{name:<40} {result['ns_per_op']:>12.1f} ns/op {result['ops_per_second']:>14,.0f} ops/s")
+
+    if arguments["--output"]:
+        with open(arguments["--output"], "w") as f:
+            json.dump(report, f, indent=2)
+
+    if arguments["--compare"]:
+        with open(arguments["--compare"]) as f:
+            regressions = compare(json.load(f), report, float(arguments["--threshold"]))
+        if regressions:
+            print("\nRegressions:", *regressions, sep="\n  ")
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+
+    sys.exit(main(docopt(__doc__)))
@@ -1,15 +1,28 @@
 #!/usr/bin/env python3
-from prompt_toolkit import PromptSession
-from prompt_toolkit.styles import Style
-from prompt_toolkit.shortcuts import input_dialog, message_dialog
-from math import pi
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import core
+import parser
 import utilities
 import translate as tr
 
+if TYPE_CHECKING:
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.styles import Style
+
 
 class TwistedChainSplice:
     title = "Chain Splice"
+    name = "twisted_chain_splice"
+    aliases = ("chain", "chain_splice")
     rope_type = utilities.RopeType.TWISTED
+    parameters = ("chain_radius", "rope_diameter", "tuck_count")
+    # Spec fields (see ropespec.py) that calculate() takes as keywords
+    multipliers = ("tuck_multiplier",)
+    results = ("total_length", "tuck_length", "loop_length", "lost_length")
+    # Translation keys for the results, in the same order
+    labels = ("total_length", "tuck_length", "loop_length", "lost_length")
+    cut_length = "total_length"
 
     rope_diameter_message = "Enter rope diameter: "
     chain_diameter_message = "Enter chain diameter: "
@@ -30,75 +43,69 @@ class TwistedChainSplice:
         self.session = session
         self.lang = lang
         
-        self.title = tr.chain_splice[lang]
+        self.msg = tr.catalog(lang)
+        self.title = self.msg.chain_splice
     
-    def calculate(self, chain_radius: float, rope_diameter: float, tuck_count: int) -> tuple[float]:
+    def calculate(
+        self, chain_radius: float, rope_diameter: float, tuck_count: int, **multipliers: float
+    ) -> tuple[float]:
         """Calculate length required for the chain splice.
 
         Args:
             chain_radius (float): The radius of the chain link.
             rope_diameter (float): The diameter of the rope.
             tuck_count (int): The number of 'tucks' desired.
+            **multipliers (float): Overrides for its 'multipliers', eg. from the
+                rope's spec (see ropespec.py).
 
         Returns:
             tuple[float]: (total_length, tuck_length, loop_length, lost_length) The
                 various lengths needed to create the splice.
         """
-        # Length required to go through the chain
-        loop_length = 2 * pi * (chain_radius + (rope_diameter / 2))
-        # Length required for the tucks
-        tuck_length = rope_diameter * (3 * tuck_count)
-        total_length = loop_length + tuck_length
-        lost_length = total_length - chain_radius * 4
-
-        return total_length, tuck_length, loop_length, lost_length
+        return core.twisted_chain_splice(chain_radius, rope_diameter, tuck_count, **multipliers)
 
     def text(self):
         """Collects parameters and prints results in a basic text format."""
         # === Collect parameters ===
-        rope_diameter = float(self.session.prompt(tr.rope_diameter_message[self.lang]))
-        chain_radius = float(self.session.prompt(tr.chain_diameter_message[self.lang])) / 2
-        tuck_count = int(self.session.prompt(tr.tuck_count_message[self.lang]))
+        rope_diameter = parser.parse_length(self.session.prompt(self.msg.rope_diameter_message))
+        chain_radius = parser.parse_length(self.session.prompt(self.msg.chain_diameter_message)) / 2
+        tuck_count = int(self.session.prompt(self.msg.tuck_count_message))
 
         total_length, tuck_length, loop_length, lost_length = self.calculate(chain_radius, rope_diameter, tuck_count)
 
         # === Display results ===
-        print(
-            f"{tr.results[self.lang]}\n================",
-            f"{tr.total_length[self.lang]}: {utilities.as_mixed_number(total_length)}",
-            f"{tr.tuck_length[self.lang]}: {utilities.as_mixed_number(tuck_length)}",
-            f"{tr.loop_length[self.lang]}: {utilities.as_mixed_number(loop_length)}",
-            f"{tr.lost_length[self.lang]}: {utilities.as_mixed_number(lost_length)}",
-            sep="\n"
-        )
+        template = self.msg.result_template(*self.labels)
+        print(template(*utilities.as_mixed_numbers((total_length, tuck_length, loop_length, lost_length))))
 
     def dialog(self):
         """Collects parameters and prints results with a console GUI."""
+        from screen import input_dialog, message_dialog
+
         # === Collect parameters ===
         # try/except because when the user hits 'Cancel' on the dialog, it returns None
-        # which causes float() and int() to throw a TypeError
+        # which causes parser.parse_length() and int() to throw a TypeError
         try:
-            rope_diameter = float(input_dialog(
+            rope_diameter = parser.parse_length(input_dialog(
                 title=self.title,
-                text=tr.rope_diameter_message[self.lang],
-                ok_text=tr.ok[self.lang],
-                cancel_text=tr.cancel[self.lang],
+                text=self.msg.rope_diameter_message,
+                ok_text=self.msg.ok,
+                cancel_text=self.msg.cancel,
                 style=self.style
             ).run())
             
-            chain_radius = float(input_dialog(
+            chain_radius = parser.parse_length(input_dialog(
                 title=self.title,
-                text=tr.chain_diameter_message[self.lang],
-                ok_text=tr.ok[self.lang],
-                cancel_text=tr.cancel[self.lang],
+                text=self.msg.chain_diameter_message,
+                ok_text=self.msg.ok,
+                cancel_text=self.msg.cancel,
                 style=self.style
             ).run())
             
             tuck_count = int(input_dialog(
                 title=self.title,
-                text=tr.tuck_count_message[self.lang],
-                ok_text=tr.ok[self.lang],
-                cancel_text=tr.cancel[self.lang],
+                text=self.msg.tuck_count_message,
+                ok_text=self.msg.ok,
+                cancel_text=self.msg.cancel,
                 style=self.style
             ).run())
         except TypeError:
@@ -108,13 +115,11 @@ class TwistedChainSplice:
         total_length, tuck_length, loop_length, lost_length = self.calculate(chain_radius, rope_diameter, tuck_count)
         
         # === Display results ===
+        template = self.msg.result_template(*self.labels, header=False)
         message_dialog(
             title=self.title,
-            text=f"{tr.total_length[self.lang]}: {utilities.as_mixed_number(total_length)}\n" +
-                 f"{tr.tuck_length[self.lang]}: {utilities.as_mixed_number(tuck_length)}\n" +
-                 f"{tr.loop_length[self.lang]}: {utilities.as_mixed_number(loop_length)}\n" +
-                 f"{tr.lost_length[self.lang]}: {utilities.as_mixed_number(lost_length)}",
-            ok_text=tr.ok[self.lang],
+            text=template(*utilities.as_mixed_numbers((total_length, tuck_length, loop_length, lost_length))),
+            ok_text=self.msg.ok,
             style=self.style
         ).run()
 
@@ -122,14 +127,24 @@ class TwistedChainSplice:
         return self.title
 
 class HollowBraidChainSplice:
+    # Default value only, will be overridden by constructor with translation value
     title = "Chain Splice"
+    name = "hollow_braid_chain_splice"
+    aliases = ("chain", "chain_splice")
     rope_type = utilities.RopeType.HOLLOW_BRAID
+    parameters = ("chain_radius", "rope_diameter")
+    # Spec fields (see ropespec.py) that calculate() takes as keywords
+    multipliers = ("bury_multiplier",)
+    results = ("total_length", "bury_length", "loop_length", "lost_length")
+    # Translation keys for the results, in the same order
+    labels = ("total_length", "bury_length", "loop_length", "lost_length")
+    cut_length = "total_length"
 
     rope_diameter_message = "Enter rope diameter: "
     chain_diameter_message = "Enter chain diameter: "
 
     def __init__(
-        self, session: PromptSession, style: Style
+        self, session: PromptSession, style: Style, lang: str = "en"
     ):
         """Class for calculating the length of rope required for a chain splice in
         hollow braid rope (Essentially just a locked brummel with the correct size eye)
@@ -137,67 +152,63 @@ class HollowBraidChainSplice:
         Args:
             session (PromptSession): Ensures consistent formatting in text only mode.
             style (Style): Ensures consistent formatting in dialog mode.
+            lang (str, optional): Language specifer for translations. Defaults to "en".
         """
         self.style = style
         self.session = session
+        self.lang = lang
+
+        self.msg = tr.catalog(lang)
+        self.title = self.msg.chain_splice
     
-    def calculate(self, chain_radius: float, rope_diameter: float) -> tuple[float]:
+    def calculate(self, chain_radius: float, rope_diameter: float, **multipliers: float) -> tuple[float]:
         """Calculate length required for the chain splice.
 
         Args:
             chain_radius (float): The radius of the chain link
             rope_diameter (float): The diameter of the rope
+            **multipliers (float): Overrides for its 'multipliers', eg. from the
+                rope's spec (see ropespec.py).
 
         Returns:
             tuple[float]: (total_length, bury_length, loop_length, lost_length) The
                 various lengths needed to create the chain splice.
         """
-        # Length required to go through the chain
-        loop_length = 2 * pi * (chain_radius + (rope_diameter / 2)) + (rope_diameter * 3)
-        # Length required for the bury
-        bury_length = rope_diameter * 72
-        total_length = loop_length + bury_length
-        lost_length = total_length - chain_radius * 4
-
-        return total_length, bury_length, loop_length, lost_length
+        return core.hollow_braid_chain_splice(chain_radius, rope_diameter, **multipliers)
 
     def text(self):
         """Collects parameters and prints results in a basic text format."""
         # === Collect parameters ===
-        rope_diameter = float(self.session.prompt(tr.rope_diameter_message[self.lang]))
-        chain_radius = float(self.session.prompt(tr.chain_diameter_message[self.lang])) / 2
+        rope_diameter = parser.parse_length(self.session.prompt(self.msg.rope_diameter_message))
+        chain_radius = parser.parse_length(self.session.prompt(self.msg.chain_diameter_message)) / 2
 
         total_length, bury_length, loop_length, lost_length = self.calculate(chain_radius, rope_diameter)
 
         # === Display results ===
-        print(
-            f"{tr.results[self.lang]}\n================",
-            f"{tr.total_length[self.lang]}: {utilities.as_mixed_number(total_length)}",
-            f"{tr.bury_length[self.lang]}: {utilities.as_mixed_number(bury_length)}",
-            f"{tr.loop_length[self.lang]}: {utilities.as_mixed_number(loop_length)}",
-            f"{tr.lost_length[self.lang]}: {utilities.as_mixed_number(lost_length)}",
-            sep="\n"
-        )
+        template = self.msg.result_template(*self.labels)
+        print(template(*utilities.as_mixed_numbers((total_length, bury_length, loop_length, lost_length))))
 
     def dialog(self):
         """Collects parameters and runs calculations with a console GUI."""
+        from screen import input_dialog, message_dialog
+
         # === Collect parameters ===
         # try/except because when the user hits 'Cancel' on the dialog, it returns None
-        # which causes float() to throw a TypeError
+        # which causes parser.parse_length() to throw a TypeError
         try:
-            rope_diameter = float(input_dialog(
+            rope_diameter = parser.parse_length(input_dialog(
                 title=self.title,
-                text=tr.rope_diameter_message[self.lang],
-                ok_text=tr.ok[self.lang],
-                cancel_text=tr.cancel[self.lang],
+                text=self.msg.rope_diameter_message,
+                ok_text=self.msg.ok,
+                cancel_text=self.msg.cancel,
                 style=self.style
             ).run())
             
-            chain_radius = float(input_dialog(
+            chain_radius = parser.parse_length(input_dialog(
                 title=self.title,
-                text=tr.chain_diameter_message[self.lang],
-                ok_text=tr.ok[self.lang],
-                cancel_text=tr.cancel[self.lang],
+                text=self.msg.chain_diameter_message,
+                ok_text=self.msg.ok,
+                cancel_text=self.msg.cancel,
                 style=self.style
             ).run())
         except TypeError:
@@ -207,13 +218,11 @@ class HollowBraidChainSplice:
         total_length, bury_length, loop_length, lost_length = self.calculate(chain_radius, rope_diameter)
         
         # === Display results ===
+        template = self.msg.result_template(*self.labels, header=False)
         message_dialog(
             title=self.title,
-            text=f"{tr.total_length[self.lang]}: {utilities.as_mixed_number(total_length)}\n" +
-                 f"{tr.bury_length[self.lang]}: {utilities.as_mixed_number(bury_length)}\n" +
-                 f"{tr.loop_length[self.lang]}: {utilities.as_mixed_number(loop_length)}\n" +
-                 f"{tr.lost_length[self.lang]}: {utilities.as_mixed_number(lost_length)}",
-            ok_text=tr.ok[self.lang],
+            text=template(*utilities.as_mixed_numbers((total_length, bury_length, loop_length, lost_length))),
+            ok_text=self.msg.ok,
             style=self.style
         ).run()
 
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""A binary file format for big batches of jobs and their results, stored column by
+column so that the calculations can work on them in place, without parsing or
+formatting anything.
+
+A file starts with a fixed prefix (the magic bytes, a format version and the length of
+the header), then a JSON header naming the calculation, the unit the lengths are in,
+the number of rows and the layout of the columns. After that come the columns: one
+per parameter, then one per result, each a packed run of 8 byte values (doubles for
+lengths, 64 bit integers for counts) starting on a 64 byte boundary. Result columns
+are there from the start, filled with zeros until the file is calculated.
+
+Files are read and written through 'mmap', so opening one costs nothing whatever its
+size, a column is a memoryview straight onto the file, and a single job or result can
+be read by its index without touching the rest. calculate() works through a file a
+chunk of rows at a time and writes the results back into their columns.
+
+Usage:
+  columnar.py import <calculation> <output> [--rope-type=<type>] [--unit=<unit>] [--format=<format>]
+  columnar.py calculate <file> [--chunk=<n>]
+  columnar.py export <file> [--format=<format>]
+  columnar.py verify
+  columnar.py --help
+
+Commands:
+  import       Read jobs from stdin, in the batch mode formats, into a new file.
+  calculate    Work out the results of every job in a file.
+  export       Write the results in a file to stdout, in the batch mode formats.
+  verify       Check that a file in every unit exports the same lengths as batch
+               mode gives.
+
+Options:
+  --rope-type=<type>    Rope type, needed when the calculation is an alias shared
+                        between rope types.
+  --unit=<unit>         Unit to store the lengths in, one of in, ft, mm, cm or m.
+                        [default: in]
+  --format=<format>     'jsonl' or 'csv'. Detected from the first line when
+                        importing, JSON lines when exporting if not given.
+  --chunk=<n>           Number of rows to calculate at a time. [default: 65536]
+  -h --help             Show this message.
+"""
+from __future__ import annotations
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from math import isfinite, nan
+from typing import TYPE_CHECKING, Iterator, TextIO
+from length import COUNTS, UNITS, to_nanometres
+import headless
+import records
+import registry
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MAGIC = b"ROPECOLS"
+VERSION = 1
+# Magic bytes, format version, reserved, length of the JSON header
+PREFIX = struct.Struct("<8sHHI")
+# Columns start on a boundary of this many bytes
+ALIGNMENT = 64
+ITEM_SIZE = 8
+
+CHUNK_SIZE = 65536
+
+
+class FormatError(ValueError):
+    """Raised when a file isn't a column file this version can read."""
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _typecode(name: str) -> str:
+    return records.COUNT_TYPECODE if name in COUNTS else records.LENGTH_TYPECODE
+
+
+def create(path: str, calculation: type, rows: int, unit: str = "in") -> ColumnFile:
+    """Creates a file for a number of jobs, with every value zero, and opens it for
+    writing.
+
+    Args:
+        path (str): Where to create it. An existing file is replaced.
+        calculation (type): The calculation class the jobs are for.
+        rows (int): The number of jobs.
+        unit (str, optional): The unit lengths are stored in. Defaults to "in".
+
+    Raises:
+        ValueError: If the unit isn't one of length.UNITS.
+
+    Returns:
+        ColumnFile: The file.
+    """
+    if unit not in UNITS:
+        raise ValueError(f"Unknown unit '{unit}', use one of {', '.join(UNITS)}")
+    columns, offset = [], 0
+    for kind, names in (("parameter", calculation.parameters), ("result", calculation.results)):
+        for name in names:
+            columns.append({"name": name, "kind": kind, "type": _typecode(name), "offset": offset})
+            offset = _align(offset + rows * ITEM_SIZE)
+    header = json.dumps({
+        "calculation": calculation.name,
+        "rope_type": calculation.rope_type.name.lower(),
+        "unit": unit,
+        "rows": rows,
+        "columns": columns,
+    }).encode("utf-8")
+
+    data_start = _align(PREFIX.size + len(header))
+    with open(path, "wb") as file:
+        file.write(PREFIX.pack(MAGIC, VERSION, 0, len(header)))
+        file.write(header)
+        # Sparse where the file system allows it, so creating a big file is quick
+        file.truncate(data_start + offset)
+    return ColumnFile(path, writable=True)
+
+
+def write_batch(path: str, batch: records.Batch, unit: str = "in") -> ColumnFile:
+    """Writes a records.Batch to a new file, results and all, and opens it for writing.
+    The values are written as they are, so they should already be in 'unit'."""
+    columns = create(path, batch.calculation, len(batch), unit)
+    for name, column in (*batch.columns.items(), *batch.result_columns.items()):
+        if len(column) == len(batch):
+            columns.column(name)[:] = column
+    return columns
+
+
+class ColumnFile:
+    def __init__(self, path: str, writable: bool = False):
+        """Opens a column file, see the module docstring. Use it as a context
+        manager, or call close() when done.
+
+        Args:
+            path (str): The file.
+            writable (bool, optional): Open it for writing as well as reading.
+                Defaults to False.
+
+        Raises:
+            FormatError: If it isn't a column file, or is from a newer version.
+        """
+        self.path = path
+        self.writable = writable
+        self._file = open(path, "r+b" if writable else "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+            self._read_header()
+        except (ValueError, OSError, struct.error) as e:
+            self._file.close()
+            raise FormatError(f"{path} is not a column file ({e})") from None
+        self._buffer = memoryview(self._map)
+        self._views: dict[str, memoryview] = {}
+
+    def _read_header(self):
+        magic, version, _, length = PREFIX.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError("wrong magic bytes")
+        if version > VERSION:
+            raise ValueError(f"version {version} is newer than {VERSION}")
+        header = json.loads(bytes(self._map[PREFIX.size:PREFIX.size + length]))
+
+        self.calculation: type = headless.find_calculation(header["calculation"], header["rope_type"])
+        self.unit: str = header["unit"]
+        self.rows: int = header["rows"]
+        data_start = _align(PREFIX.size + length)
+        # name: (typecode, first byte)
+        self.layout = {c["name"]: (c["type"], data_start + c["offset"]) for c in header["columns"]}
+        for name in (*self.calculation.parameters, *self.calculation.results):
+            if name not in self.layout:
+                raise ValueError(f"no '{name}' column")
+        if len(self._map) < max(start for _, start in self.layout.values()) + self.rows * ITEM_SIZE:
+            raise ValueError("the file is cut short")
+
+    def __enter__(self) -> ColumnFile:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def close(self):
+        """Writes any changes out and closes the file. Views from column() stop
+        working, and arrays from numpy() need to be gone first."""
+        for view in self._views.values():
+            view.release()
+        self._views.clear()
+        self._buffer.release()
+        if self.writable:
+            self._map.flush()
+        self._map.close()
+        self._file.close()
+
+    def column(self, name: str) -> memoryview:
+        """Gets a column as a memoryview onto the file, eg. for slicing or handing to
+        array or NumPy. Writing to it (in a writable file) writes to the file."""
+        if name not in self._views:
+            typecode, start = self.layout[name]
+            self._views[name] = self._buffer[start:start + self.rows * ITEM_SIZE].cast(typecode)
+        return self._views[name]
+
+    def numpy(self, name: str) -> np.ndarray:
+        """Gets a column as a NumPy array sharing memory with the file."""
+        import numpy as np
+
+        return np.frombuffer(self.column(name), dtype=self.layout[name][0])
+
+    def job(self, index: int) -> records.Job:
+        """Reads the parameters of one job."""
+        return records.job_type(self.calculation)(*(self.column(p)[index] for p in self.calculation.parameters))
+
+    def result(self, index: int) -> records.Result:
+        """Reads the results of one job, which are zeros until it's calculated."""
+        return records.result_type(self.calculation)(*(self.column(r)[index] for r in self.calculation.results))
+
+    def to_batch(self) -> records.Batch:
+        """Copies the file into a records.Batch, in the file's unit."""
+        batch = records.Batch(self.calculation)
+        for columns in (batch.columns, batch.result_columns):
+            for name in columns:
+                columns[name] = array(_typecode(name))
+                columns[name].frombytes(self.column(name).cast("B"))
+        return batch
+
+    def calculate(self, start: int = 0, stop: int = None, chunk_size: int = CHUNK_SIZE):
+        """Works out the results of a range of jobs and writes them into the result
+        columns, a chunk at a time. Uses the NumPy kernels in batch.py when available.
+
+        Args:
+            start (int, optional): The first job. Defaults to 0.
+            stop (int, optional): The job after the last one. Defaults to the end.
+            chunk_size (int, optional): Jobs per chunk. Defaults to CHUNK_SIZE.
+
+        Raises:
+            PermissionError: If the file isn't open for writing.
+        """
+        if not self.writable:
+            raise PermissionError(f"{self.path} is open read only")
+        stop = self.rows if stop is None else min(stop, self.rows)
+        # Calculations work in inches
+        scale = UNITS[self.unit] / UNITS["in"]
+        batch = headless.batch_module()
+        if batch is not None and self.calculation in batch.kernels:
+            self._calculate_numpy(batch, start, stop, chunk_size, scale)
+            return
+
+        calculate = registry.default().instance(self.calculation).calculate
+        parameters = [(self.column(p), p in COUNTS) for p in self.calculation.parameters]
+        results = [self.column(r) for r in self.calculation.results]
+        for i in range(start, stop):
+            try:
+                values = calculate(*(column[i] if count else column[i] * scale for column, count in parameters))
+            except (ArithmeticError, ValueError):
+                # Marked like the NumPy versions leave it, see iter_records()
+                values = (nan,) * len(results)
+            for column, value in zip(results, values if isinstance(values, tuple) else (values,)):
+                column[i] = value / scale
+
+    def _calculate_numpy(self, batch, start: int, stop: int, chunk_size: int, scale: float):
+        parameters = {p: self.numpy(p) for p in self.calculation.parameters}
+        results = {r: self.numpy(r) for r in self.calculation.results}
+        for chunk in range(start, stop, chunk_size):
+            end = min(chunk + chunk_size, stop)
+            columns = {
+                p: column[chunk:end] if p in COUNTS or scale == 1 else column[chunk:end] * scale
+                for p, column in parameters.items()
+            }
+            values = batch.calculate(self.calculation, **columns)
+            for name, column in results.items():
+                if scale == 1:
+                    column[chunk:end] = values[name]
+                else:
+                    column[chunk:end] = values[name] / scale
+
+    def iter_records(self) -> Iterator[dict]:
+        """Reads the results as batch mode's output records, in inches. Lengths in
+        other units are converted through whole nanometres, so that a length that's a
+        whole number of sixteenths isn't shown 1/16" short for being a hair under after
+        the conversion. Jobs that couldn't be calculated (their results aren't finite,
+        eg. an eye smaller than the rope) get an error record with their row number,
+        counting from 1."""
+        unit, inch = self.unit, UNITS["in"]
+        columns = [self.column(r) for r in self.calculation.results]
+        for row, values in enumerate(zip(*columns), 1):
+            if all(map(isfinite, values)):
+                if unit != "in":
+                    values = tuple(to_nanometres(v, unit) / inch for v in values)
+                yield headless.result_record(self.calculation, values)
+            else:
+                yield {"error": "the job can't be calculated", "line": row}
+
+
+def import_jobs(source: TextIO, path: str, calculation: type, unit: str = "in", input_format: str = None) -> int:
+    """Reads jobs in the batch mode formats into a new file. The jobs' lengths are in
+    inches, like batch mode, and are converted to 'unit'.
+
+    Raises:
+        headless.JobError: If a job can't be read, with its line number.
+
+    Returns:
+        int: The number of jobs.
+    """
+    scale = UNITS["in"] / UNITS[unit]
+    jobs, _ = headless.open_jobs(source, input_format)
+    batch = records.Batch(calculation)
+    counts = [p in COUNTS for p in calculation.parameters]
+    for line_number, job in enumerate(jobs, 1):
+        try:
+            if isinstance(job, headless.JobError):
+                raise job
+            arguments = headless.job_arguments(calculation, job)
+        except headless.JobError as e:
+            raise headless.JobError(f"line {line_number}: {e}") from None
+        batch.append(*(a if count else a * scale for a, count in zip(arguments, counts)))
+    write_batch(path, batch, unit).close()
+    return len(batch)
+
+
+def export(path: str, destination: TextIO, output_format: str = "jsonl", log: TextIO = None) -> int:
+    """Writes the results in a file in the batch mode formats, reporting the jobs
+    that couldn't be calculated like batch mode does.
+
+    Returns:
+        int: The number of jobs that couldn't be calculated.
+    """
+    if log is None:
+        log = sys.stderr
+    failed = 0
+    with ColumnFile(path) as columns:
+        if output_format == "csv":
+            writer = csv.DictWriter(destination, headless.result_columns([columns.calculation]), extrasaction="ignore")
+            writer.writeheader()
+            write = writer.writerow
+        else:
+            def write(record: dict):
+                destination.write(json.dumps(record) + "\n")
+        for record in columns.iter_records():
+            if "error" in record:
+                failed += 1
+                print(f"line {record['line']}: {record['error']}", file=log)
+            write(record)
+    return failed
+
+
+def verify(samples: int = 1000, seed: int = 0):
+    """Checks that jobs imported in each unit, calculated and exported come out with
+    the same mixed numbers as batch mode gives for them, for every calculation.
+
+    Args:
+        samples (int, optional): Number of random jobs to check per calculation.
+            Defaults to 1000.
+        seed (int, optional): Seed for the random jobs. Defaults to 0.
+
+    Raises:
+        ValueError: If any exported text differs from batch mode's.
+    """
+    import io
+    import random
+    import tempfile
+
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "verify.cols")
+        for calculation in registry.default():
+            if not hasattr(calculation, "parameters"):
+                continue
+            # Whole sixteenths, which is where converting back can come out a hair short
+            jobs = "".join(
+                json.dumps({
+                    p: rng.randint(3, 7) if p in COUNTS else rng.randint(2, 32 if p == "rope_diameter" else 96) / 16
+                    for p in calculation.parameters
+                }) + "\n"
+                for _ in range(samples)
+            )
+            expected = io.StringIO()
+            headless.run(io.StringIO(jobs), expected, "jsonl", "jsonl", calculation.name)
+            for unit in UNITS:
+                import_jobs(io.StringIO(jobs), path, calculation, unit, "jsonl")
+                with ColumnFile(path, writable=True) as columns:
+                    columns.calculate()
+                exported = io.StringIO()
+                export(path, exported, "jsonl")
+                rows = zip(expected.getvalue().splitlines(), exported.getvalue().splitlines())
+                for row, (want, got) in enumerate(rows, 1):
+                    want, got = json.loads(want), json.loads(got)
+                    texts = [k for k in want if k.endswith("_text")]
+                    if [want[k] for k in texts] != [got.get(k) for k in texts]:
+                        raise ValueError(f"{calculation.name} in {unit}, job {row}: exported {got}, not {want}")
+
+
+def main(arguments: dict) -> int:
+    """Runs one of the commands in the usage.
+
+    Returns:
+        int: The exit status.
+    """
+    try:
+        if arguments["import"]:
+            calculation = headless.find_calculation(arguments["<calculation>"], arguments["--rope-type"])
+            count = import_jobs(sys.stdin, arguments["<output>"], calculation, arguments["--unit"], arguments["--format"])
+            print(f"{count} jobs", file=sys.stderr)
+        elif arguments["verify"]:
+            verify()
+            print("Every unit exports the same lengths as batch mode.")
+        elif arguments["calculate"]:
+            with ColumnFile(arguments["<file>"], writable=True) as columns:
+                columns.calculate(chunk_size=int(arguments["--chunk"]))
+        elif export(arguments["<file>"], sys.stdout, arguments["--format"] or "jsonl"):
+            return 1
+    except BrokenPipeError:
+        # The reader went away, see headless.main
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (OSError, ValueError, ArithmeticError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+
+    sys.exit(main(docopt(__doc__)))
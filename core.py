@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""The formulas behind every calculation, with nothing to do with the user interface.
+
+This module must only ever import from the standard library (and formula.py, which
+does the same), so that batch jobs and worker processes can use the calculations
+without paying for prompt_toolkit. The calculator classes in the other modules call
+into these functions for their calculate() methods.
+
+Each formula is written once, as an ordinary function, and @formula turns it into an
+expression tree, works out everything that doesn't depend on the parameters (like the
+eye angles, which are the same for every eye), and compiles what's left. The same tree
+gives the vectorized versions in batch.py, eg. 'twisted_eye_splice.formula.vector'.
+Formulas can't use 'if' on their parameters, so they use formula.Piecewise instead.
+"""
+from enum import Enum
+from formula import Piecewise, acos, formula, pi, sin
+
+
+class RopeType(Enum):
+    GENERAL = 0
+    TWISTED = 1
+    HOLLOW_BRAID = 2
+
+    def __str__(self):
+        return self.name.capitalize().replace("_", " ")
+
+
+@formula
+def twisted_eye_splice(
+    eye_radius: float, rope_diameter: float, tuck_count: int, tuck_multiplier: float = 3
+) -> tuple[float]:
+    """Calculates the length required for an eye splice in twisted rope.
+
+    Args:
+        eye_radius (float): The desired eye radius.
+        rope_diameter (float): The diameter of the rope being used.
+        tuck_count (int): The desired number of 'tucks'.
+        tuck_multiplier (float, optional): Rope diameters used by each tuck.
+            Defaults to 3.
+
+    Returns:
+        tuple[float]: (full_length, eye_length, tuck_length, lost_length)
+    """
+    # Correction to account for rope size
+    eye_radius += rope_diameter / 2
+    # Angle between rope axis and the end of the tangent section (90°-alpha)
+    beta = acos(eye_radius / (eye_radius * 3))
+    # Angle between 180° and tangent section
+    alpha = (pi / 2) - beta
+
+    # Arc length of the eye
+    A = ((alpha + pi) / (2 * pi)) * (2 * pi * eye_radius)
+    # Length of the tangent section
+    B = sin(beta) / (eye_radius * 3)
+
+    # Total length of the eye
+    eye_length = A + 2 * B
+    # Length required for the tucks
+    tuck_length = rope_diameter * (tuck_multiplier * tuck_count)
+    # Full length required for the splice (eye + 1 tuck length)
+    full_length = eye_length + tuck_length
+    # Approximate length lost to the splice
+    lost_length = full_length - eye_radius * 4
+
+    return full_length, eye_length, tuck_length, lost_length
+
+
+@formula
+def locked_eye_splice(eye_radius: float, rope_diameter: float, bury_multiplier: float = 72) -> tuple[float]:
+    """Calculates the length required for a locked brummel eye splice in hollow braid
+    rope.
+
+    Args:
+        eye_radius (float): The desired radius of the eye.
+        rope_diameter (float): The diameter of the rope.
+        bury_multiplier (float, optional): Rope diameters used by the bury. Defaults
+            to 72.
+
+    Returns:
+        tuple[float]: (full_length, eye_length, bury_length, lost_length)
+    """
+    # Correction to account for rope diameter
+    eye_radius += rope_diameter / 2
+    # Angle between rope axis and end of tangent section (90°-alpha)
+    beta = acos(eye_radius / (eye_radius * 3))
+    # Angle between 180° and tangent section
+    alpha = (pi / 2) - beta
+    # Arc length of eye
+    A = ((alpha + pi) / (2 * pi)) * (2 * pi * eye_radius)
+    # Length of the tangent section
+    B = sin(beta) / (eye_radius * 3)
+
+    # Total length of the eye
+    eye_length = A + 2 * B + rope_diameter * 3
+    # Length required for the bury
+    bury_length = rope_diameter * bury_multiplier
+    # Full length required for the splice (eye + 1 bury length)
+    full_length = eye_length + bury_length
+    # Approximate length lost to the splice
+    lost_length = full_length - eye_radius * 4
+
+    return full_length, eye_length, bury_length, lost_length
+
+
+@formula
+def twisted_chain_splice(
+    chain_radius: float, rope_diameter: float, tuck_count: int, tuck_multiplier: float = 3
+) -> tuple[float]:
+    """Calculates the length required for a chain splice in twisted rope.
+
+    Args:
+        chain_radius (float): The radius of the chain link.
+        rope_diameter (float): The diameter of the rope.
+        tuck_count (int): The number of 'tucks' desired.
+        tuck_multiplier (float, optional): Rope diameters used by each tuck.
+            Defaults to 3.
+
+    Returns:
+        tuple[float]: (total_length, tuck_length, loop_length, lost_length)
+    """
+    # Length required to go through the chain
+    loop_length = 2 * pi * (chain_radius + (rope_diameter / 2))
+    # Length required for the tucks
+    tuck_length = rope_diameter * (tuck_multiplier * tuck_count)
+    total_length = loop_length + tuck_length
+    lost_length = total_length - chain_radius * 4
+
+    return total_length, tuck_length, loop_length, lost_length
+
+
+@formula
+def hollow_braid_chain_splice(
+    chain_radius: float, rope_diameter: float, bury_multiplier: float = 72
+) -> tuple[float]:
+    """Calculates the length required for a chain splice in hollow braid rope.
+
+    Args:
+        chain_radius (float): The radius of the chain link.
+        rope_diameter (float): The diameter of the rope.
+        bury_multiplier (float, optional): Rope diameters used by the bury. Defaults
+            to 72.
+
+    Returns:
+        tuple[float]: (total_length, bury_length, loop_length, lost_length)
+    """
+    # Length required to go through the chain
+    loop_length = 2 * pi * (chain_radius + (rope_diameter / 2)) + (rope_diameter * 3)
+    # Length required for the bury
+    bury_length = rope_diameter * bury_multiplier
+    total_length = loop_length + bury_length
+    lost_length = total_length - chain_radius * 4
+
+    return total_length, bury_length, loop_length, lost_length
+
+
+@formula
+def back_splice_length(rope_diameter: float, back_splice_multiplier: float = 15) -> float:
+    """Calculates the length required for a back splice, using 15 rope diameters
+    unless told otherwise.
+
+    Args:
+        rope_diameter (float): The rope diameter to calculate for.
+        back_splice_multiplier (float, optional): Rope diameters used by the back
+            splice. Defaults to 15.
+
+    Returns:
+        float: The length needed to tie a back splice.
+    """
+    return rope_diameter * back_splice_multiplier
+
+
+@formula
+def grog_sling_length(rope_diameter: float, sling_radius: float, tail_multiplier: float = 30) -> tuple[float]:
+    """Calculates the lengths required for a grog sling, using a tail length of 30
+    rope diameters unless told otherwise.
+
+    Args:
+        rope_diameter (float): The diameter of rope being used.
+        sling_radius (float): The desired radius of the finished sling.
+        tail_multiplier (float, optional): Rope diameters in each tail. Defaults to
+            30.
+
+    Returns:
+        tuple[float]: (total_length, sling_circumference, tail_length)
+    """
+    sling_circumference = 2 * pi * sling_radius
+    tail_length = rope_diameter * tail_multiplier
+
+    total_length = tail_length * 2 + sling_circumference
+
+    return total_length, sling_circumference, tail_length
+
+
+@formula
+def fid_length(rope_diameter: float) -> tuple[float]:
+    """Calculates the lengths of a fid, accounting for rope diameter when calculating
+    the short section length, based on the Sampson tubular fid specs.
+
+    Args:
+        rope_diameter (float): The diameter of the rope to calculate for.
+
+    Returns:
+        tuple[float]: (short_length, half_length, long_length, full_length)
+    """
+    short_percent = Piecewise(
+        (rope_diameter <= 0.5, 0.375),
+        (rope_diameter <= 0.75, 0.3),
+        default=0.25,
+    )
+
+    full_length = rope_diameter * 21
+    short_length = full_length * short_percent
+    half_length = rope_diameter * 10.5
+    long_length = rope_diameter * 14
+
+    return short_length, half_length, long_length, full_length
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Plans how to cut a batch of splice jobs out of stock spools of rope.
+
+The length each job needs comes from its calculator: calculations that produce a piece
+of rope have a 'cut_length' attribute naming the result to use, eg. 'full_length' for
+the eye splices. The jobs are then packed onto spools with best-fit decreasing (the
+longest piece goes first, onto the spool where it leaves the least rope over), which
+only needs a sorted list of the space left on each spool. An optional improvement pass
+then tries to empty the least used spools into the space left on the others, for as
+long as it is given.
+
+Jobs are read from stdin in the same formats as batch mode (see headless.py), and all
+lengths are in inches unless they say otherwise, eg. '--stock=600ft'.
+
+Usage:
+  cut_list.py [--stock=<length>] [--kerf=<length>] [--improve=<seconds>] [--format=<format>]
+  cut_list.py --help
+
+Options:
+  --stock=<length>      Length of a full spool. [default: 7200]
+  --kerf=<length>       Rope lost to each cut. [default: 0]
+  --improve=<seconds>   Time allowed for the improvement pass. [default: 0]
+  --format=<format>     Input format, 'jsonl' or 'csv'. Detected if not given.
+  -h --help             Show this message.
+"""
+import sys
+import time
+from bisect import bisect_left, insort
+from typing import Iterable, TextIO
+import headless
+import parser
+import utilities
+
+# 600 ft, in inches
+STOCK_LENGTH = 7200
+
+
+class Spool:
+    def __init__(self, stock_length: float):
+        """A single stock spool and the pieces cut from it.
+
+        Args:
+            stock_length (float): The length of the spool before any cuts.
+        """
+        self.stock_length = stock_length
+        # Indexes into the job list, in the order they are cut
+        self.cuts: list[int] = []
+        self.used = 0.0
+
+    @property
+    def remaining(self) -> float:
+        return self.stock_length - self.used
+
+
+class CutPlan:
+    def __init__(self, lengths: list[float], stock_length: float, kerf: float):
+        """The result of planning a batch of cuts.
+
+        Args:
+            lengths (list[float]): The length needed for each job.
+            stock_length (float): The length of a full spool.
+            kerf (float): Rope lost to each cut.
+        """
+        self.lengths = lengths
+        self.stock_length = stock_length
+        self.kerf = kerf
+        self.spools: list[Spool] = []
+        # Jobs that are longer than a full spool
+        self.unplaced: list[int] = []
+
+    @property
+    def waste(self) -> float:
+        """The rope left over on every spool that has been cut into."""
+        return sum(s.remaining for s in self.spools)
+
+    def sequences(self) -> list[list[tuple[int, float]]]:
+        """Gets the cut sequence for each spool.
+
+        Returns:
+            list[list[tuple[int, float]]]: For each spool, the (job index, length) of
+                each piece in cutting order, longest first.
+        """
+        return [
+            sorted(((i, self.lengths[i]) for i in s.cuts), key=lambda c: -c[1])
+            for s in self.spools
+        ]
+
+
+def plan(lengths: list[float], stock_length: float = STOCK_LENGTH, kerf: float = 0, improve: float = 0) -> CutPlan:
+    """Packs pieces onto as few spools as possible.
+
+    Args:
+        lengths (list[float]): The length needed for each job.
+        stock_length (float, optional): The length of a full spool. Defaults to
+            STOCK_LENGTH (600 ft).
+        kerf (float, optional): Rope lost to each cut. Defaults to 0.
+        improve (float, optional): Seconds to spend on the improvement pass, 0 to skip
+            it. Defaults to 0.
+
+    Returns:
+        CutPlan: The spools and the jobs cut from each.
+    """
+    result = CutPlan(lengths, stock_length, kerf)
+    # (space left, spool index), kept sorted so the tightest fit is a bisect away
+    free: list[tuple[float, int]] = []
+
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__, reverse=True):
+        need = lengths[i] + kerf
+        if need > stock_length:
+            result.unplaced.append(i)
+            continue
+
+        position = bisect_left(free, (need, -1))
+        if position == len(free):
+            spool_index = len(result.spools)
+            result.spools.append(Spool(stock_length))
+        else:
+            spool_index = free.pop(position)[1]
+
+        spool = result.spools[spool_index]
+        spool.cuts.append(i)
+        spool.used += need
+        insort(free, (spool.remaining, spool_index))
+
+    if improve > 0:
+        _improve(result, free, time.perf_counter() + improve)
+    return result
+
+
+def _improve(result: CutPlan, free: list[tuple[float, int]], deadline: float):
+    """Tries to empty spools by moving their pieces into the space left on the others,
+    starting with the least used spool, until nothing else can be emptied or the
+    deadline passes. Moves are only kept when a spool is emptied completely.
+
+    Args:
+        result (CutPlan): The plan to improve, changed in place.
+        free (list[tuple[float, int]]): The sorted (space left, spool index) list
+            left over from packing.
+        deadline (float): time.perf_counter() value to stop at.
+    """
+    kerf = result.kerf
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        # Least used first, those are the easiest to empty
+        for remaining, source in sorted(free, reverse=True):
+            if time.perf_counter() >= deadline:
+                break
+            spool = result.spools[source]
+            candidates = [f for f in free if f[1] != source]
+            moves = []
+            for i in sorted(spool.cuts, key=result.lengths.__getitem__, reverse=True):
+                need = result.lengths[i] + kerf
+                position = bisect_left(candidates, (need, -1))
+                if position == len(candidates):
+                    break
+                space, target = candidates.pop(position)
+                insort(candidates, (space - need, target))
+                moves.append((i, target))
+            else:
+                for i, target in moves:
+                    result.spools[target].cuts.append(i)
+                    result.spools[target].used += result.lengths[i] + kerf
+                spool.cuts.clear()
+                spool.used = 0.0
+                free[:] = candidates
+                improved = True
+                break
+
+    # Drop the spools that were emptied
+    result.spools = [s for s in result.spools if s.cuts]
+
+
+def job_lengths(jobs: Iterable[dict], log: TextIO = None) -> tuple[list[float], list[str], list[int], int]:
+    """Works out the length of rope each job needs with its calculator. Jobs that
+    can't be calculated, or don't produce a piece of rope, are reported like batch
+    mode does and left out.
+
+    Args:
+        jobs (Iterable[dict]): Jobs in the same form as batch mode uses.
+        log (TextIO, optional): Where to report the jobs left out. Defaults to
+            sys.stderr.
+
+    Returns:
+        tuple[list[float], list[str], list[int], int]: The length for each job, the
+            name of its calculation and its number in the input, and how many jobs
+            were left out.
+    """
+    if log is None:
+        log = sys.stderr
+    lengths, names, numbers = [], [], []
+    failed = 0
+    for number, job in enumerate(jobs, 1):
+        try:
+            if isinstance(job, headless.JobError):
+                raise job
+            calculation, results = headless.run_job(job)
+            if not hasattr(calculation, "cut_length"):
+                raise headless.JobError(f"'{calculation.name}' doesn't need a piece of rope")
+            length = results[calculation.results.index(calculation.cut_length)]
+        except (ArithmeticError, ValueError, TypeError) as e:
+            # One bad job (eg. an eye too small for the rope) only loses its own line
+            error = str(e) if isinstance(e, headless.JobError) else f"calculation failed ({e})"
+            print(f"line {number}: {error}", file=log)
+            failed += 1
+            continue
+        lengths.append(length)
+        names.append(calculation.name)
+        numbers.append(number)
+    return lengths, names, numbers, failed
+
+
+def main(stock_length: float, kerf: float, improve: float, input_format: str = None) -> int:
+    """Reads jobs from stdin and prints the cut list.
+
+    Args:
+        stock_length (float): The length of a full spool.
+        kerf (float): Rope lost to each cut.
+        improve (float): Seconds to spend on the improvement pass.
+        input_format (str, optional): 'jsonl' or 'csv'. Detected if not given.
+
+    Returns:
+        int: The exit status, 1 if any job was left out or doesn't fit on a spool.
+    """
+    lengths, names, numbers, failed = job_lengths(headless.open_jobs(sys.stdin, input_format)[0])
+    result = plan(lengths, stock_length, kerf, improve)
+    out = []
+    for number, sequence in enumerate(result.sequences(), 1):
+        spool = result.spools[number - 1]
+        out.append(f"Spool {number} ({utilities.as_mixed_number(spool.remaining)} left):")
+        out.extend(f"  job {numbers[i]} {names[i]}: {utilities.as_mixed_number(length)}" for i, length in sequence)
+    for i in result.unplaced:
+        out.append(f"Job {numbers[i]} ({utilities.as_mixed_number(lengths[i])}) is longer than a full spool")
+    out.append(f"Spools: {len(result.spools)}, left over: {utilities.as_mixed_number(result.waste)}")
+    print(*out, sep="\n")
+    return 1 if result.unplaced or failed else 0
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+
+    arguments = docopt(__doc__)
+    sys.exit(main(
+        parser.parse_length(arguments["--stock"]),
+        parser.parse_length(arguments["--kerf"]),
+        float(arguments["--improve"]),
+        arguments["--format"]
+    ))
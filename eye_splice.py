@@ -1,17 +1,30 @@
 #!/usr/bin/env python3
-from math import sin, acos, pi
-from prompt_toolkit import PromptSession
-from prompt_toolkit.styles import Style
-from prompt_toolkit.shortcuts import input_dialog, message_dialog
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import core
+import parser
 import utilities
 import translate as tr
 
+if TYPE_CHECKING:
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.styles import Style
+
 
 class TwistedEyeSplice:
     # Default value only, will be overridden by constructor with translation value
     title = "Eye Splice"
+    name = "twisted_eye_splice"
+    aliases = ("eye", "eye_splice")
     rope_type = utilities.RopeType.TWISTED
     reference = "ABOK #2725"
+    parameters = ("eye_radius", "rope_diameter", "tuck_count")
+    # Spec fields (see ropespec.py) that calculate() takes as keywords
+    multipliers = ("tuck_multiplier",)
+    results = ("full_length", "eye_length", "tuck_length", "lost_length")
+    # Translation keys for the results, in the same order
+    labels = ("total_length", "eye_length", "tuck_length", "lost_length")
+    cut_length = "full_length"
 
     def __init__(
         self, session: PromptSession, style: Style, lang: str = "en"
@@ -28,54 +41,38 @@ class TwistedEyeSplice:
         self.session = session
         self.lang = lang
         
-        self.title = tr.eye_splice[lang]
+        self.msg = tr.catalog(lang)
+        self.title = self.msg.eye_splice
 
-    def calculate(self, eye_radius: float, rope_diameter: float, tuck_count: int) -> tuple[float]:
+    def calculate(
+        self, eye_radius: float, rope_diameter: float, tuck_count: int, **multipliers: float
+    ) -> tuple[float]:
         """Calculates the length required to create the desired eye.
 
         Args:
             eye_radius (float): The desired eye radius.
             rope_diameter (float): The diameter of the rope being used.
             tuck_count (int): The desired number of 'tucks'.
+            **multipliers (float): Overrides for its 'multipliers', eg. from the
+                rope's spec (see ropespec.py).
 
         Returns:
             tuple[float]: (full_length, eye_length, tuck_length, lost_length) The
                 various lengths needed to create the eye.
         """
-        # Correction to account for rope size
-        eye_radius += rope_diameter / 2
-        # Angle between rope axis and the end of the tangent section (90°-alpha)
-        beta = acos(eye_radius / (eye_radius * 3))
-        # Angle between 180° and tangent section
-        alpha = (pi / 2) - beta
-
-        # Arc length of the eye
-        A = ((alpha + pi) / (2 * pi)) * (2 * pi * eye_radius)
-        # Length of the tangent section
-        B = sin(beta) / (eye_radius * 3)
-
-        # Total length of the eye
-        eye_length = A + 2 * B
-        # Length required for the tucks
-        tuck_length = rope_diameter * (3 * tuck_count)
-        # Full length required for the splice (eye + 1 tuck length)
-        full_length = eye_length + tuck_length
-        # Approximate length lost to the splice
-        lost_length = full_length - eye_radius * 4
-
-        return full_length, eye_length, tuck_length, lost_length
+        return core.twisted_eye_splice(eye_radius, rope_diameter, tuck_count, **multipliers)
 
     def text(self):
         """Collects parameters and prints results in a basic text format."""
         # === Collect parameters ===
         # Eye radius/diameter
-        eye_radius = utilities.radius_or_diameter_text(self.session, tr.eye[self.lang])
+        eye_radius = utilities.radius_or_diameter_text(self.session, self.msg.eye)
 
         # Rope diameter
-        rope_diameter = float(self.session.prompt(tr.rope_diameter_message[self.lang]))
+        rope_diameter = parser.parse_length(self.session.prompt(self.msg.rope_diameter_message))
 
         # No. of tucks
-        tuck_count = int(self.session.prompt(tr.tuck_count_message[self.lang]))
+        tuck_count = int(self.session.prompt(self.msg.tuck_count_message))
 
         # === Run calculations ===
         full_length, eye_length, tuck_length, lost_length = self.calculate(
@@ -83,30 +80,26 @@ class TwistedEyeSplice:
         )
 
         # Print to screen
-        print(
-            f"{tr.results[self.lang]}\n================",
-            f"{tr.total_length[self.lang]}: {utilities.as_mixed_number(full_length)}",
-            f"{tr.eye_length[self.lang]}: {utilities.as_mixed_number(eye_length)}",
-            f"{tr.tuck_length[self.lang]}: {utilities.as_mixed_number(tuck_length)}",
-            f"{tr.lost_length[self.lang]}: {utilities.as_mixed_number(lost_length)}",
-            sep="\n"
-        )
+        template = self.msg.result_template(*self.labels)
+        print(template(*utilities.as_mixed_numbers((full_length, eye_length, tuck_length, lost_length))))
 
     def dialog(self):
         """Collects parameters and prints results with a console GUI"""
+        from screen import input_dialog, message_dialog
+
         # === Collect parameters ===
         # try/except because when the user hits 'Cancel' on the dialog, it returns None
-        # which causes float() and int() to throw a TypeError
+        # which causes parser.parse_length() and int() to throw a TypeError
         try:
             eye_radius = utilities.radius_or_diameter_dialog(self.style, self.title, "eye")
-            rope_diameter = float(input_dialog(
+            rope_diameter = parser.parse_length(input_dialog(
                 title=self.title,
-                text=tr.rope_diameter_message[self.lang],
+                text=self.msg.rope_diameter_message,
                 style=self.style
             ).run())
             tuck_count = int(input_dialog(
                 title=self.title,
-                text=tr.tuck_count_message[self.lang],
+                text=self.msg.tuck_count_message,
                 style=self.style
             ).run())
         except TypeError:
@@ -118,13 +111,11 @@ class TwistedEyeSplice:
         )
 
         # === Show results ===
+        template = self.msg.result_template(*self.labels, header=False)
         message_dialog(
-            title=tr.results[self.lang],
-            text=f"{tr.total_length[self.lang]}: {utilities.as_mixed_number(total_length)}\n" +
-                 f"{tr.eye_length[self.lang]}: {utilities.as_mixed_number(eye_length)}\n" +
-                 f"{tr.tuck_length[self.lang]}: {utilities.as_mixed_number(tuck_length)}\n" +
-                 f"{tr.lost_length[self.lang]}: {utilities.as_mixed_number(lost_length)}",
-            ok_text=tr.ok[self.lang],
+            title=self.msg.results,
+            text=template(*utilities.as_mixed_numbers((total_length, eye_length, tuck_length, lost_length))),
+            ok_text=self.msg.ok,
             style=self.style
         ).run()
 
@@ -135,7 +126,16 @@ class TwistedEyeSplice:
 class HollowBraidLockedEyeSplice:
     # Default value only, will be overridden by constructor with translation value
     title = "Locked Brummel Eye Splice"
+    name = "locked_eye_splice"
+    aliases = ("eye", "eye_splice", "locked_eye", "brummel")
     rope_type = utilities.RopeType.HOLLOW_BRAID
+    parameters = ("eye_radius", "rope_diameter")
+    # Spec fields (see ropespec.py) that calculate() takes as keywords
+    multipliers = ("bury_multiplier",)
+    results = ("full_length", "eye_length", "bury_length", "lost_length")
+    # Translation keys for the results, in the same order
+    labels = ("total_length", "eye_length", "bury_length", "lost_length")
+    cut_length = "full_length"
 
     def __init__(
         self, session: PromptSession, style: Style, lang: str = "en"
@@ -151,42 +151,24 @@ class HollowBraidLockedEyeSplice:
         self.session = session
         self.lang = lang
         
+        self.msg = tr.catalog(lang)
         # Get the translated title
-        self.title = tr.locked_eye_splice[self.lang]
+        self.title = self.msg.locked_eye_splice
 
-    def calculate(self, eye_radius: float, rope_diameter: float) -> tuple[float]:
+    def calculate(self, eye_radius: float, rope_diameter: float, **multipliers: float) -> tuple[float]:
         """Calculate length required for the eye splice.
 
         Args:
             eye_radius (float): The desired radius of the eye.
             rope_diameter (float): The diameter of the rope.
+            **multipliers (float): Overrides for its 'multipliers', eg. from the
+                rope's spec (see ropespec.py).
 
         Returns:
             tuple[float]: (full_length, eye_length, bury_length, lost_length) The
                 various lengths needed to create the eye splice. 
         """
-        # === Run calculations ===
-        # Correction to account for rope diameter
-        eye_radius += rope_diameter / 2
-        # Angle between rope axis and end of tangent section (90°-alpha)
-        beta = acos(eye_radius / (eye_radius * 3))
-        # Angle between 180° and tangent section
-        alpha = (pi / 2) - beta
-        # Arc length of eye
-        A = ((alpha + pi) / (2 * pi)) * (2 * pi * eye_radius)
-        # Length of the tangent section
-        B = sin(beta) / (eye_radius * 3)
-
-        # Total length of the eye
-        eye_length = A + 2 * B + rope_diameter * 3
-        # Length required for the bury
-        bury_length = rope_diameter * 72
-        # Full length required for the splice (eye + 1 bury length)
-        full_length = eye_length + bury_length
-        # Approximate length lost to the splice
-        lost_length = full_length - eye_radius * 4
-
-        return full_length, eye_length, bury_length, lost_length
+        return core.locked_eye_splice(eye_radius, rope_diameter, **multipliers)
 
     def text(self):
         """Collects parameters and prints results in text only mode."""
@@ -194,12 +176,12 @@ class HollowBraidLockedEyeSplice:
         # Eye radius/diameter
         eye_radius = utilities.radius_or_diameter_text(
             self.session,
-            tr.eye[self.lang],
+            self.msg.eye,
             self.lang
         )
 
         # Rope diameter
-        rope_diameter = float(self.session.prompt(tr.rope_diameter_message[self.lang]))
+        rope_diameter = parser.parse_length(self.session.prompt(self.msg.rope_diameter_message))
 
         # === Run calculations ===
         total_length, eye_length, bury_length, lost_length = self.calculate(
@@ -207,34 +189,30 @@ class HollowBraidLockedEyeSplice:
         )
 
         # Print to screen
-        print(
-            f"{tr.results[self.lang]}\n================",
-            f"{tr.full_length[self.lang]}: {utilities.as_mixed_number(total_length)}",
-            f"{tr.eye_length[self.lang]}: {utilities.as_mixed_number(eye_length)}",
-			f"{tr.bury_length[self.lang]}: {utilities.as_mixed_number(bury_length)}",
-			f"{tr.lost_length[self.lang]}: {utilities.as_mixed_number(lost_length)}",
-            sep="\n"
-        )
+        template = self.msg.result_template(*self.labels)
+        print(template(*utilities.as_mixed_numbers((total_length, eye_length, bury_length, lost_length))))
 
     def dialog(self):
         """Collects parameters and prints results in dialog mode."""
+        from screen import input_dialog, message_dialog
+
         # === Collect parameter ===
         # try/except because when the user hits 'Cancel' on the dialog, it returns None
-        # which causes float() to throw a TypeError
+        # which causes parser.parse_length() to throw a TypeError
         try:
             eye_radius = utilities.radius_or_diameter_dialog(
                 self.style, 
                 self.title,
-                tr.eye[self.lang],
+                self.msg.eye,
                 self.lang
             )
 
-            rope_diameter = float(
+            rope_diameter = parser.parse_length(
                 input_dialog(
                     title=self.title,
-                    text=tr.rope_diameter_message[self.lang],
-                    ok_text=tr.ok[self.lang],
-                    cancel_text=tr.cancel[self.lang],
+                    text=self.msg.rope_diameter_message,
+                    ok_text=self.msg.ok,
+                    cancel_text=self.msg.cancel,
                     style=self.style
                 ).run()
             )
@@ -247,13 +225,11 @@ class HollowBraidLockedEyeSplice:
         )
 
         # === Show results ===
+        template = self.msg.result_template(*self.labels, header=False)
         message_dialog(
-            title=tr.results[self.lang],
-            text=f"{tr.total_length[self.lang]}: {utilities.as_mixed_number(total_length)}\n" +
-                 f"{tr.eye_length[self.lang]}: {utilities.as_mixed_number(eye_length)}\n" +
-                 f"{tr.bury_length[self.lang]}: {utilities.as_mixed_number(bury_length)}\n" +
-                 f"{tr.lost_length[self.lang]}: {utilities.as_mixed_number(lost_length)}",
-            ok_text=tr.ok[self.lang],
+            title=self.msg.results,
+            text=template(*utilities.as_mixed_numbers((total_length, eye_length, bury_length, lost_length))),
+            ok_text=self.msg.ok,
             style=self.style
         ).run()
 
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""Formulas as expression trees, compiled into plain Python functions.
+
+The formulas in core.py are written as ordinary functions of their parameters, and
+@formula runs each one once on symbols instead of numbers, which records every
+operation as a tree of Expr nodes. The trees are simplified as they are built:
+
+- Constant folding: anything that only depends on constants is worked out there and
+  then, eg. 'acos(r / (r * 3))' becomes the number acos(1/3), and '(alpha + pi) /
+  (2 * pi) * (2 * pi * r)' becomes a single multiplication.
+- Common subexpression elimination: identical subtrees are the same node, and a
+  node that's used more than once is worked out once, into a local variable.
+
+The tree is then turned into Python source and compiled: a scalar function using
+'math', which replaces the original function, and a vectorized one using NumPy for
+whole arrays of jobs (see batch.py), built the first time it's asked for. Both come
+from the same tree, so they can't disagree about the formula.
+
+Conditions don't work on symbols, so a formula that depends on one (eg. the fid length
+percentages) uses Piecewise instead of 'if'.
+
+Like core.py, this module only uses the standard library. NumPy is only imported for
+the vectorized functions.
+"""
+from __future__ import annotations
+import math
+from collections.abc import Callable
+from operator import add, mul, neg, sub, truediv
+from operator import ge, gt, le, lt
+
+# Operators: (how to work it out on constants, its source template)
+OPERATORS = {
+    "+": (add, "({} + {})"),
+    "-": (sub, "({} - {})"),
+    "*": (mul, "({} * {})"),
+    "/": (truediv, "({} / {})"),
+    "neg": (neg, "(-{})"),
+    "<=": (le, "({} <= {})"),
+    "<": (lt, "({} < {})"),
+    ">=": (ge, "({} >= {})"),
+    ">": (gt, "({} > {})"),
+}
+
+# Functions: the name in math, the name in NumPy
+FUNCTIONS = {
+    "acos": ("acos", "arccos"),
+    "asin": ("asin", "arcsin"),
+    "cos": ("cos", "cos"),
+    "sin": ("sin", "sin"),
+    "sqrt": ("sqrt", "sqrt"),
+}
+
+
+class Expr:
+    __slots__ = ("op", "args", "key")
+
+    def __init__(self, op: str, args: tuple):
+        """A node in a formula. Build them with the operators, the functions in this
+        module and Piecewise rather than directly, so they get simplified.
+
+        Args:
+            op (str): 'const', 'var', 'piecewise', or one of OPERATORS or FUNCTIONS.
+            args (tuple): The value for 'const', the name for 'var', otherwise the
+                operands.
+        """
+        self.op = op
+        self.args = args
+        # Identifies the node by what it works out, for finding duplicates
+        self.key = (op, *(a.key if isinstance(a, Expr) else a for a in args))
+
+    @property
+    def constant(self) -> bool:
+        return self.op == "const"
+
+    @property
+    def value(self):
+        return self.args[0]
+
+    def __add__(self, other) -> Expr:
+        return _make("+", self, other)
+
+    def __radd__(self, other) -> Expr:
+        return _make("+", other, self)
+
+    def __sub__(self, other) -> Expr:
+        return _make("-", self, other)
+
+    def __rsub__(self, other) -> Expr:
+        return _make("-", other, self)
+
+    def __mul__(self, other) -> Expr:
+        return _make("*", self, other)
+
+    def __rmul__(self, other) -> Expr:
+        return _make("*", other, self)
+
+    def __truediv__(self, other) -> Expr:
+        return _make("/", self, other)
+
+    def __rtruediv__(self, other) -> Expr:
+        return _make("/", other, self)
+
+    def __neg__(self) -> Expr:
+        return _make("neg", self)
+
+    def __pos__(self) -> Expr:
+        return self
+
+    def __le__(self, other) -> Expr:
+        return _make("<=", self, other)
+
+    def __lt__(self, other) -> Expr:
+        return _make("<", self, other)
+
+    def __ge__(self, other) -> Expr:
+        return _make(">=", self, other)
+
+    def __gt__(self, other) -> Expr:
+        return _make(">", self, other)
+
+    def __bool__(self):
+        raise TypeError("A formula can't branch on its parameters, use Piecewise")
+
+    def __repr__(self) -> str:
+        return _text(self, {}, False)
+
+
+def const(value: float) -> Expr:
+    return Expr("const", (value,))
+
+
+def var(name: str) -> Expr:
+    return Expr("var", (name,))
+
+
+def _expr(value) -> Expr:
+    if isinstance(value, Expr):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return const(value)
+    raise TypeError(f"Can't use {value!r} in a formula")
+
+
+def _is(node: Expr, value: float) -> bool:
+    return node.constant and node.value == value
+
+
+def _make(op: str, *args) -> Expr:
+    """Builds a node, folding constants and applying a few identities that hold for
+    every finite value."""
+    args = tuple(_expr(a) for a in args)
+    if all(a.constant for a in args):
+        return const(OPERATORS[op][0](*(a.value for a in args)))
+
+    if op == "+":
+        left, right = args
+        if _is(right, 0):
+            return left
+        if _is(left, 0):
+            return right
+    elif op == "-":
+        left, right = args
+        if _is(right, 0):
+            return left
+        if left.key == right.key:
+            return const(0)
+    elif op == "*":
+        left, right = args
+        # Constants go on the left, so they can be gathered up
+        if right.constant:
+            left, right = right, left
+        if left.constant:
+            if left.value == 1:
+                return right
+            if right.op == "*" and right.args[0].constant:
+                # c1 * (c2 * x) = (c1 * c2) * x
+                return _make("*", left.value * right.args[0].value, right.args[1])
+            if right.op == "/" and right.args[0].constant:
+                # c1 * (c2 / x) = (c1 * c2) / x
+                return _make("/", left.value * right.args[0].value, right.args[1])
+        args = (left, right)
+    elif op == "/":
+        left, right = args
+        if _is(right, 1):
+            return left
+        if left.key == right.key:
+            return const(1)
+        if right.op == "*" and right.args[0].constant:
+            c, x = right.args
+            if left.key == x.key:
+                # x / (c * x) = 1 / c
+                return const(1 / c.value)
+            if left.constant:
+                # c1 / (c2 * x) = (c1 / c2) / x
+                return _make("/", left.value / c.value, x)
+        if left.op == "*" and left.args[0].constant and left.args[1].key == right.key:
+            # (c * x) / x = c
+            return left.args[0]
+    elif op == "neg" and args[0].op == "neg":
+        return args[0].args[0]
+    return Expr(op, args)
+
+
+def _function(name: str) -> Callable[[Expr], Expr]:
+    scalar = getattr(math, FUNCTIONS[name][0])
+
+    def function(x):
+        x = _expr(x)
+        return const(scalar(x.value)) if x.constant else Expr(name, (x,))
+    function.__name__ = name
+    function.__doc__ = f"math.{FUNCTIONS[name][0]} for formulas."
+    return function
+
+
+acos = _function("acos")
+asin = _function("asin")
+cos = _function("cos")
+sin = _function("sin")
+sqrt = _function("sqrt")
+pi = const(math.pi)
+
+
+def Piecewise(*cases: tuple[Expr, float | Expr], default: float | Expr) -> Expr:
+    """The value of the first case whose condition holds, or 'default' if none do,
+    like an if/elif/else.
+
+    Args:
+        cases (tuple[Expr, float | Expr]): (condition, value) pairs, eg.
+            (rope_diameter <= 0.5, 0.375).
+        default (float | Expr): The value if no condition holds.
+    """
+    args = []
+    for condition, value in cases:
+        condition = _expr(condition)
+        if condition.constant:
+            if condition.value:
+                # Always true, so nothing after it matters
+                default = value
+                break
+            continue
+        args += [condition, _expr(value)]
+    default = _expr(default)
+    if not args or all(v.key == default.key for v in args[1::2]):
+        return default
+    return Expr("piecewise", (*args, default))
+
+
+class Formula:
+    def __init__(
+        self,
+        name: str,
+        parameters: tuple[str],
+        results: Expr | tuple[Expr],
+        doc: str = None,
+        counts: tuple[str] = (),
+        defaults: dict[str, float] = None,
+    ):
+        """A formula, ready to be compiled.
+
+        Args:
+            name (str): The name of the generated functions.
+            parameters (tuple[str]): Their parameters, in order.
+            results (Expr | tuple[Expr]): What they return, a single value or a tuple.
+            doc (str, optional): Their docstring. Defaults to None.
+            counts (tuple[str], optional): The parameters that are whole numbers,
+                which the vectorized function leaves as integers. Defaults to ().
+            defaults (dict[str, float], optional): Default values for the last
+                parameters, eg. multipliers that can be overridden. Defaults to None.
+        """
+        self.name = name
+        self.parameters = tuple(parameters)
+        self.counts = tuple(counts)
+        self.defaults = defaults or {}
+        self.single = not isinstance(results, tuple)
+        self.results = (_expr(results),) if self.single else tuple(_expr(r) for r in results)
+        self.doc = doc
+        self._scalar: Callable = None
+        self._vector: Callable = None
+
+    @property
+    def scalar(self) -> Callable:
+        """The function for single values, using 'math'."""
+        if self._scalar is None:
+            self._scalar = self._compile(False)
+        return self._scalar
+
+    @property
+    def vector(self) -> Callable:
+        """The function for NumPy arrays (or anything that can be broadcast into
+        one). It returns a tuple of arrays, or a single array."""
+        if self._vector is None:
+            self._vector = self._compile(True)
+        return self._vector
+
+    def source(self, vector: bool = False) -> str:
+        """Generates the source of the scalar or vectorized function."""
+        # How many times each node is used, to find the shared ones
+        uses: dict[tuple, int] = {}
+
+        def count(node: Expr):
+            uses[node.key] = uses.get(node.key, 0) + 1
+            if uses[node.key] == 1 and node.op not in ("const", "var"):
+                for arg in node.args:
+                    count(arg)
+
+        for result in self.results:
+            count(result)
+
+        signature = ", ".join(f"{p}={self.defaults[p]!r}" if p in self.defaults else p for p in self.parameters)
+        lines = [f"def {self.name}({signature}):"]
+        if vector:
+            lines += [
+                f"    {p} = asarray({p})" if p in self.counts else f"    {p} = asarray({p}, dtype=float64)"
+                for p in self.parameters
+            ]
+        names: dict[tuple, str] = {}
+
+        def emit(node: Expr) -> str:
+            if node.key in names:
+                return names[node.key]
+            if node.op not in ("const", "var"):
+                for arg in node.args:
+                    emit(arg)
+            text = _text(node, names, vector)
+            if uses.get(node.key, 0) > 1 and node.op not in ("const", "var"):
+                names[node.key] = f"t{len(names)}"
+                lines.append(f"    {names[node.key]} = {text}")
+                return names[node.key]
+            return text
+
+        returned = []
+        for result in self.results:
+            text = emit(result)
+            if vector and result.constant:
+                # A plain number, but it still needs to be the shape of the input
+                shapes = ", ".join(f"shape({p})" for p in self.parameters)
+                text = f"full(broadcast_shapes({shapes}), {text})"
+            returned.append(text)
+        lines.append(f"    return {returned[0] if self.single else '(' + ', '.join(returned) + ',)'}")
+        return "\n".join(lines) + "\n"
+
+    def _compile(self, vector: bool) -> Callable:
+        source = self.source(vector)
+        filename = f"<formula {self.name}{' (vector)' if vector else ''}>"
+        if vector:
+            import numpy as np
+
+            names = ("asarray", "float64", "select", "full", "shape", "broadcast_shapes")
+            namespace = {name: getattr(np, name) for name in names}
+            namespace.update({f: getattr(np, f) for _, f in FUNCTIONS.values()})
+        else:
+            namespace = {f: getattr(math, f) for f, _ in FUNCTIONS.values()}
+        exec(compile(source, filename, "exec"), namespace)
+        function = namespace[self.name]
+        function.__doc__ = self.doc
+        return function
+
+
+def _text(node: Expr, names: dict[tuple, str], vector: bool) -> str:
+    """Writes a node as source, using the names of any shared nodes already assigned."""
+    if node.key in names:
+        return names[node.key]
+    if node.op == "const":
+        return repr(node.value) if node.value >= 0 else f"({node.value!r})"
+    if node.op == "var":
+        return node.value
+    args = [_text(a, names, vector) for a in node.args]
+    if node.op in FUNCTIONS:
+        return f"{FUNCTIONS[node.op][vector]}({args[0]})"
+    if node.op == "piecewise":
+        conditions, values, default = args[:-1:2], args[1:-1:2], args[-1]
+        if vector:
+            return f"select([{', '.join(conditions)}], [{', '.join(values)}], {default})"
+        text = default
+        for condition, value in reversed(list(zip(conditions, values))):
+            text = f"({value} if {condition} else {text})"
+        return text
+    return OPERATORS[node.op][1].format(*args)
+
+
+def formula(function: Callable) -> Callable:
+    """Decorator that turns a function written with ordinary arithmetic into a
+    Formula, and replaces it with the compiled scalar function. The Formula is kept as
+    its 'formula' attribute, eg. for 'twisted_eye_splice.formula.vector'. Parameters
+    annotated as 'int' are counts, and parameters with defaults keep them. The original
+    function is kept as '__wrapped__', for its signature, but it only works on symbols.
+    """
+    code = function.__code__
+    parameters = code.co_varnames[:code.co_argcount]
+    counts = [p for p in parameters if function.__annotations__.get(p) in (int, "int")]
+    values = function.__defaults__ or ()
+    defaults = dict(zip(parameters[len(parameters) - len(values):], values))
+    results = function(*map(var, parameters))
+    compiled = Formula(function.__name__, parameters, results, function.__doc__, counts, defaults)
+    scalar = compiled.scalar
+    scalar.__module__ = function.__module__
+    scalar.__qualname__ = function.__qualname__
+    scalar.__annotations__ = function.__annotations__
+    scalar.__wrapped__ = function
+    scalar.formula = compiled
+    return scalar
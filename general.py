@@ -1,15 +1,27 @@
 #!/usr/bin/env python3
-from prompt_toolkit import PromptSession
-from prompt_toolkit.styles import Style
-from prompt_toolkit.shortcuts import input_dialog, message_dialog
+from __future__ import annotations
+from typing import TYPE_CHECKING, Iterator
+import core
+import parser
 import utilities
 import translate as tr
 
+if TYPE_CHECKING:
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.styles import Style
+
 
 class FidLengthCalculate:
     # Default value only, will be overridden by constructor with translation value
     title = "Fid Length Calculator"
+    name = "fid_length"
+    aliases = ("fid",)
     rope_type = utilities.RopeType.GENERAL
+    parameters = ("rope_diameter",)
+    multipliers = ()
+    results = ("short_length", "half_length", "long_length", "full_length")
+    # Translation keys for the results, in the same order
+    labels = ("short_fid", "half_fid", "long_fid", "full_fid")
 
     def __init__(
         self, session: PromptSession, style: Style, lang: str = "en"
@@ -25,7 +37,8 @@ class FidLengthCalculate:
         self.session = session
         self.lang = lang
         
-        self.title = tr.fid_length_calculate[lang]
+        self.msg = tr.catalog(lang)
+        self.title = self.msg.fid_length_calculate
     
     def calculate(self, rope_diameter: float) -> tuple[float]:
         """Calculate length of a fid, accouting for rope diameter when calculating the
@@ -38,47 +51,32 @@ class FidLengthCalculate:
             tuple[float]: (short_length, half_length, long_length, full_length) The
                 various fid lengths.
         """
-        if rope_diameter <= 0.5:
-            short_percent = 0.375
-        elif 0.5 < rope_diameter <= 0.75:
-            short_percent = 0.3
-        else:
-            short_percent = 0.25
-        
-        full_length = rope_diameter * 21
-        short_length = full_length * short_percent
-        half_length = rope_diameter * 10.5
-        long_length = rope_diameter * 14
-        
-        return short_length, half_length, long_length, full_length
+        return core.fid_length(rope_diameter)
 
     def text(self):
         """Collects parameters and prints results in a basic text format."""
         # === Collect parameters ===
-        rope_diameter = float(self.session.prompt(tr.rope_diameter_message[self.lang]))
+        rope_diameter = parser.parse_length(self.session.prompt(self.msg.rope_diameter_message))
 
         # === Calculations ===
         short_length, half_length, long_length, full_length = self.calculate(rope_diameter)
 
-        print(f"{tr.results[self.lang]}\n================",
-            f"{tr.short_fid[self.lang]}: {utilities.as_mixed_number(short_length)}",
-            f"{tr.half_fid[self.lang]}: {utilities.as_mixed_number(half_length)}",
-            f"{tr.long_fid[self.lang]}: {utilities.as_mixed_number(long_length)}",
-            f"{tr.full_fid[self.lang]}: {utilities.as_mixed_number(full_length)}",
-            sep="\n"
-        )
+        template = self.msg.result_template(*self.labels)
+        print(template(*utilities.as_mixed_numbers((short_length, half_length, long_length, full_length))))
 
     def dialog(self):
         """Collects parameters and prints results with a console GUI."""
+        from screen import input_dialog, message_dialog
+
         # === Collect parameters ===
         # try/except because when the user hits 'Cancel' on the dialog, it returns None
-        # which causes float() to throw a TypeError
+        # which causes parser.parse_length() to throw a TypeError
         try:
-            rope_diameter = float(input_dialog(
+            rope_diameter = parser.parse_length(input_dialog(
                 title=self.title,
-                text=tr.rope_diameter_message[self.lang],
-                ok_text=tr.ok[self.lang],
-                cancel_text=tr.cancel[self.lang],
+                text=self.msg.rope_diameter_message,
+                ok_text=self.msg.ok,
+                cancel_text=self.msg.cancel,
                 style=self.style
             ).run())
         except TypeError:
@@ -88,13 +86,11 @@ class FidLengthCalculate:
         short_length, half_length, long_length, full_length = self.calculate(rope_diameter)
         
         # === Display results ===
+        template = self.msg.result_template(*self.labels, header=False)
         message_dialog(
             title=self.title,
-            text=f"{tr.short_fid[self.lang]}: {utilities.as_mixed_number(short_length)}\n" +
-                 f"{tr.half_fid[self.lang]}: {utilities.as_mixed_number(half_length)}\n" +
-                 f"{tr.long_fid[self.lang]}: {utilities.as_mixed_number(long_length)}\n" +
-                 f"{tr.full_fid[self.lang]}: {utilities.as_mixed_number(full_length)}",
-            ok_text=tr.ok[self.lang],
+            text=template(*utilities.as_mixed_numbers((short_length, half_length, long_length, full_length))),
+            ok_text=self.msg.ok,
             style=self.style
         ).run()
     
@@ -104,6 +100,8 @@ class FidLengthCalculate:
 class FidLengthTable:
     # Default value only, will be overridden by constructor with translation value
     title = "Fid Length Table"
+    name = "fid_table"
+    aliases = ("table", "fid_length_table")
     rope_type = utilities.RopeType.GENERAL
     
     fid_table = (
@@ -115,7 +113,7 @@ class FidLengthTable:
         ("3/8", "3", "5-1/4", "7-7/8"),
         ("7/16", "3-1/2", "6-1/8", "9-3/16"),
         ("1/2", "4", "7", "10-1/2"),
-        ("9-16", "4-1/4", "7-7/8", "12"),
+        ("9/16", "4-1/4", "7-7/8", "12"),
         ("5/8", "4-1/2", "8-3/4", "13-1/8"),
         ("11/16", "4-13/16", "9-5/8", "14-7/16"),
         ("3/4", "4-3/4", "10-1/2", "15-3/4"),
@@ -130,6 +128,10 @@ class FidLengthTable:
         ("2", "10-1/2", "28", "42")
     )
 
+    # Shared between instances, by language, and by (language, rows per page)
+    _layouts: dict[str, tuple[str, str, str, str]] = {}
+    _rendered: dict[tuple[str, int], tuple[str]] = {}
+
     def __init__(self, session: PromptSession, style: Style, lang: str = "en"):
         """Class which displays a table showing pre-calculated fid lengths. Table source:
         https://atlanticbraids.com/fid-lengths/
@@ -143,67 +145,66 @@ class FidLengthTable:
         self.session = session
         self.lang = lang
         
-        self.title = tr.fid_length_table[lang]
-        self.fid_table_headers = tr.fid_table_headers[self.lang]
+        self.msg = tr.catalog(lang)
+        self.title = self.msg.fid_length_table
+        self.fid_table_headers = self.msg.fid_table_headers
     
-    def build_table(self, rows: int=len(fid_table)) -> list[str]:
-        """Builds out the table that will be printed to the screen.
+    def build_table(self, rows: int=len(fid_table)) -> tuple[str]:
+        """Builds out the table that will be printed to the screen. Tables are only
+        built once for each language and page size, after that the same strings are
+        handed back.
 
         Args:
             rows (int, optional): The number of rows in each table. Defaults to
                 len(fid_table) (Generates a single table with all rows).
 
         Returns:
-            list[str]: The generated tables, each as a single string.
+            tuple[str]: The generated tables, each as a single string.
         """
-        # calculate the widths for each column
-        col_widths = [len(h) for h in self.fid_table_headers]
-        
-        # Build out the header
-        header = "+" + "+".join(["-"*cw for cw in col_widths]) + "+\n"
-        header += "|" + "|".join(self.fid_table_headers) + "|\n"
-        header += "+" + "+".join(["="*cw for cw in col_widths]) + "+\n"
-        
-        # Build out the individual rows
-        print(len(self.fid_table))
-        row_sets: list[tuple[str]] = []
-        for s in range(0, len(self.fid_table), rows):
-            lower = s
-            if (s+rows) > len(self.fid_table):
-                upper = len(self.fid_table)
-            else:
-                upper = s + rows
-            row_sets.append(self.fid_table[lower:upper])
-        row_strings_sets: list[list[str]] = []
-        for row_set in row_sets:
-            row_strings: list[str] = []
-            for row in row_set:
-                row_string = "|"
-                for i in range(len(row)):
-                    row_string += f"{row[i]:{col_widths[i]}}|"
-                row_strings.append(row_string + "\n")
-            row_strings_sets.append(row_strings)
-        
-        # Build out the row separators
-        row_divider_string = "+" + "+".join(["-"*cw for cw in col_widths]) + "+\n"
-        
-        # Create the table bodies
-        table_bodies: list[str] = []
-        for row_strings in row_strings_sets:
-            # Join each individual row into the body
-            table_body = row_divider_string.join(row_strings)
-            
-            # Add a bottom line
-            table_body += "+" + "+".join(["-"*cw for cw in col_widths]) + "+\n"
-            
-            # Credit Atlantic Braids
-            table_body += f"{tr[self.lang]}: https://atlanticbraids.com/fid-lengths/"
-            
-            table_bodies.append(table_body)
-        
-        output_strings: list[str] = [header + tb for tb in table_bodies]
-        
-        return output_strings
+        key = (self.lang, rows)
+        if key not in self._rendered:
+            self._rendered[key] = tuple(self.iter_tables(rows))
+        return self._rendered[key]
+
+    def iter_tables(self, rows: int=len(fid_table)) -> Iterator[str]:
+        """Builds the tables one at a time, as they are needed.
+
+        Args:
+            rows (int, optional): The number of rows in each table. Defaults to
+                len(fid_table) (Generates a single table with all rows).
+
+        Yields:
+            str: Each table, as a single string.
+        """
+        if rows < 1:
+            raise ValueError(f"Tables need at least one row, not {rows}")
+        header, divider, footer, row_format = self._layout()
+        for start in range(0, len(self.fid_table), rows):
+            body = divider.join([row_format.format(*row) for row in self.fid_table[start:start + rows]])
+            yield "".join((header, body, footer))
+
+    def _layout(self) -> tuple[str, str, str, str]:
+        """Gets the parts of the table that only depend on the language.
+
+        Returns:
+            tuple[str, str, str, str]: (header, divider, footer, row_format) The lines
+                above the first row, the line between rows, the lines after the last
+                row, and the format string for a single row.
+        """
+        if self.lang not in self._layouts:
+            # The columns are as wide as their headers
+            col_widths = [len(h) for h in self.fid_table_headers]
+            divider = "+" + "+".join(["-"*cw for cw in col_widths]) + "+\n"
+            header = "".join((
+                divider,
+                "|" + "|".join(self.fid_table_headers) + "|\n",
+                "+" + "+".join(["="*cw for cw in col_widths]) + "+\n"
+            ))
+            # Bottom line, and credit Atlantic Braids
+            footer = f"{divider}{self.msg.source}: https://atlanticbraids.com/fid-lengths/"
+            row_format = "|" + "".join(f"{{:{cw}}}|" for cw in col_widths) + "\n"
+            self._layouts[self.lang] = (header, divider, footer, row_format)
+        return self._layouts[self.lang]
 
     def text(self):
         """Print out the table in text only mode"""
@@ -213,11 +214,13 @@ class FidLengthTable:
         """Print out the table using console GUIs. Separates it into multiple shorter
         tables because prompt_toolkit provides no indication to the user that the text
         has been truncated."""
-        tables: list[str] = self.build_table(int(len(self.fid_table)/3))
+        from screen import message_dialog
+
+        tables = self.build_table(int(len(self.fid_table)/3))
         [message_dialog(
             title=self.title,
             text=table,
-            ok_text=tr.continue_btn[self.lang],
+            ok_text=self.msg.continue_btn,
             style=self.style
         ).run() for table in tables]
     
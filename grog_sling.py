@@ -1,16 +1,29 @@
 #!/usr/bin/env python3
-from math import pi
-from prompt_toolkit import PromptSession
-from prompt_toolkit.styles import Style
-from prompt_toolkit.shortcuts import input_dialog, message_dialog
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import core
+import parser
 import utilities
 import translate as tr
 
+if TYPE_CHECKING:
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.styles import Style
+
 
 class GrogSling:
     # Default value only, will be overridden by constructor with translation value
     title = "Grog sling"
+    name = "grog_sling"
+    aliases = ("grog", "sling")
     rope_type = utilities.RopeType.HOLLOW_BRAID
+    parameters = ("rope_diameter", "sling_radius")
+    # Spec fields (see ropespec.py) that calculate() takes as keywords
+    multipliers = ("tail_multiplier",)
+    results = ("total_length", "sling_circumference", "tail_length")
+    # Translation keys for the results, in the same order
+    labels = ("total_length", "sling_circumference", "tail_length")
+    cut_length = "total_length"
     
     def __init__(
         self, session: PromptSession, style: Style, lang: str = "en"
@@ -27,58 +40,54 @@ class GrogSling:
         self.session = session
         self.lang = lang
         
-        self.title = tr.grog_sling[lang]
+        self.msg = tr.catalog(lang)
+        self.title = self.msg.grog_sling
     
-    def calculate(self, rope_diameter: float, sling_radius: float) -> tuple[float]:
+    def calculate(self, rope_diameter: float, sling_radius: float, **multipliers: float) -> tuple[float]:
         """Calculates the lengths required to create the grog sling. Uses a tail length
         of 30 rope diameters (+3 to account for the locking part).
 
         Args:
             rope_diameter (float): The diameter of rope being used.
             sling_radius (float): The desired radius of the finished sling.
+            **multipliers (float): Overrides for its 'multipliers', eg. from the
+                rope's spec (see ropespec.py).
 
         Returns:
             tuple[float]: (total_length, sling_circumference, tail_length) The various
                 lengths needed to create the grog sling. 
         """
-        sling_circumference = 2 * pi * sling_radius
-        tail_length = rope_diameter * 30
-        
-        total_length = tail_length * 2 + sling_circumference
-        
-        return total_length, sling_circumference, tail_length
+        return core.grog_sling_length(rope_diameter, sling_radius, **multipliers)
 
     def text(self):
         """Collects parameters and prints results in a basic text format."""
         # === Collect parameters ===
-        rope_diameter = float(self.session.prompt(tr.rope_diameter_message[self.lang]))
-        sling_radius = utilities.radius_or_diameter_text(self.session, tr.sling[self.lang], self.lang)
+        rope_diameter = parser.parse_length(self.session.prompt(self.msg.rope_diameter_message))
+        sling_radius = utilities.radius_or_diameter_text(self.session, self.msg.sling, self.lang)
     
         # === Run calculations ===
         total_length, sling_circumference, tail_length = self.calculate(rope_diameter, sling_radius)
         
         # === Display results ===
-        print(f"{tr.results[self.lang]}\n================", 
-            f"{tr.total_length[self.lang]}: {utilities.as_mixed_number(total_length)}", 
-            f"{tr.sling_circumference[self.lang]}: {utilities.as_mixed_number(sling_circumference)}", 
-            f"{tr.tail_length[self.lang]}: {utilities.as_mixed_number(tail_length)}",
-            sep="\n"
-        )
+        template = self.msg.result_template(*self.labels)
+        print(template(*utilities.as_mixed_numbers((total_length, sling_circumference, tail_length))))
     
     def dialog(self):
         """Collects parameters and prints results with a console GUI."""
+        from screen import input_dialog, message_dialog
+
         # === Collect parameters ===
         # try/except because when the user hits 'Cancel' on the dialog, it returns None
-        # which causes float() and int() to throw a TypeError
+        # which causes parser.parse_length() and int() to throw a TypeError
         try:
-            rope_diameter = float(input_dialog(
+            rope_diameter = parser.parse_length(input_dialog(
                 title=self.title,
-                text=tr.rope_diameter_message[self.lang],
-                ok_text=tr.ok[self.lang],
-                cancel_text=tr.cancel[self.lang],
+                text=self.msg.rope_diameter_message,
+                ok_text=self.msg.ok,
+                cancel_text=self.msg.cancel,
                 style=self.style
             ).run())
-            sling_radius = utilities.radius_or_diameter_dialog(self.style, self.title, tr.sling[self.lang], self.lang)
+            sling_radius = utilities.radius_or_diameter_dialog(self.style, self.title, self.msg.sling, self.lang)
         except TypeError:
             return
         
@@ -86,12 +95,11 @@ class GrogSling:
         total_length, sling_circumference, tail_length = self.calculate(rope_diameter, sling_radius)
         
         # === Display results ===
+        template = self.msg.result_template(*self.labels, header=False)
         message_dialog(
             title=self.title,
-            text=f"{tr.total_length[self.lang]}: {utilities.as_mixed_number(total_length)}\n" +
-                 f"{tr.sling_circumference[self.lang]}: {utilities.as_mixed_number(sling_circumference)}\n" +
-                 f"{tr.tail_length[self.lang]}: {utilities.as_mixed_number(tail_length)}",
-            ok_text=tr.ok[self.lang],
+            text=template(*utilities.as_mixed_numbers((total_length, sling_circumference, tail_length))),
+            ok_text=self.msg.ok,
             style=self.style
         ).run()
     
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""Non-interactive mode for running calculations from other programs or shell
+pipelines. Reads one job per line from an input stream (JSON lines or CSV with a header
+row) and writes one result per line to an output stream, in the same format and in the
+same order as the jobs came in.
+
+A job names the calculation (by name, or by alias together with a 'rope_type') and
+gives its parameters, eg.
+    {"calculation": "twisted_eye_splice", "rope_diameter": 0.625, "radius": 1, "tucks": 5}
+or, as CSV,
+    calculation,rope_diameter,diameter,tucks
+    twisted_eye_splice,0.625,2,5
+
+The eye, chain link or sling can be given as 'radius' or 'diameter' (like the 'd'
+option in the interactive prompts), or by the calculator's own parameter name, eg.
+'eye_radius'. 'tucks' is accepted for 'tuck_count'.
+"""
+import csv
+import json
+import os
+import sys
+from functools import cache
+from typing import Iterable, TextIO
+from core import RopeType
+from length import COUNTS
+import parser
+import registry
+import utilities
+import translate as tr
+
+# How many output lines are held before being handed to the output stream
+WRITE_BATCH = 256
+
+
+class JobError(ValueError):
+    """Raised when a line of input can't be turned into a calculation."""
+
+
+def job_arguments(calculator: type, job: dict) -> list:
+    """Pulls the arguments for a calculator's calculate() method out of a job.
+
+    Args:
+        calculator (type): The calculator class the job is for.
+        job (dict): The job, as read from the input.
+
+    Raises:
+        JobError: If a parameter is missing or isn't a number.
+
+    Returns:
+        list: The arguments, in the order calculate() takes them.
+    """
+    arguments = []
+    for p in calculator.parameters:
+        raw, scale = job.get(p), 1
+        if raw in (None, "") and p.endswith("_radius"):
+            raw = job.get("radius")
+            if raw in (None, ""):
+                raw, scale = job.get("diameter"), 0.5
+        elif raw in (None, "") and p == "tuck_count":
+            raw = job.get("tucks")
+
+        if raw in (None, ""):
+            raise JobError(f"missing parameter '{p}'")
+        if p in COUNTS:
+            try:
+                value = parser.parse_count(raw)
+            except (TypeError, ValueError):
+                raise JobError(f"parameter '{p}' must be a whole number") from None
+        else:
+            try:
+                value = parser.parse_length(raw) * scale
+            except (TypeError, ValueError):
+                raise JobError(f"parameter '{p}' is not a number") from None
+        arguments.append(value)
+    return arguments
+
+
+def find_calculation(name: str, rope_type: str = None) -> type:
+    """Looks up the calculation for a job in the default registry.
+
+    Args:
+        name (str): The name or an alias of the calculation.
+        rope_type (str, optional): The rope type, eg. 'twisted' or 'hollow_braid'.
+            Only needed for aliases shared between rope types. Defaults to None.
+
+    Raises:
+        JobError: If there is no such calculation, or it can't be run without a user.
+
+    Returns:
+        type: The calculation class.
+    """
+    if not isinstance(name, str):
+        raise JobError("'calculation' must be a name")
+    if rope_type is not None and not isinstance(rope_type, str):
+        raise JobError("'rope_type' must be a name")
+    try:
+        if rope_type:
+            rope_type = RopeType[rope_type.strip().upper().replace(" ", "_")]
+        calculation = registry.default().get(name, rope_type or None)
+    except KeyError:
+        raise JobError(f"unknown rope type '{rope_type}'") from None
+    except LookupError as e:
+        raise JobError(str(e)) from None
+    if not hasattr(calculation, "parameters"):
+        raise JobError(f"'{name}' has nothing to calculate")
+    return calculation
+
+
+def run_job(job: dict, default_calculation: str = None) -> tuple[type, tuple[float]]:
+    """Runs a single job through the matching calculator.
+
+    Args:
+        job (dict): The job, as read from the input.
+        default_calculation (str, optional): The calculation to use if the job
+            doesn't name one. Defaults to None.
+
+    Raises:
+        JobError: If the job can't be calculated.
+
+    Returns:
+        tuple[type, tuple[float]]: The calculation class and its results.
+    """
+    name = job.get("calculation") or default_calculation
+    if not name:
+        raise JobError("no calculation given")
+    calculation = find_calculation(name, job.get("rope_type"))
+    results = registry.default().instance(calculation).calculate(*job_arguments(calculation, job))
+    if not isinstance(results, tuple):
+        results = (results,)
+    return calculation, results
+
+
+def result_record(calculation: type, results: tuple[float]) -> dict:
+    """Builds the output record for a job's results, with a plain number and a mixed
+    number ('_text') entry for each result.
+
+    Args:
+        calculation (type): The calculation class.
+        results (tuple[float]): The results, in the order of the class's 'results'.
+
+    Returns:
+        dict: The record, starting with the calculation's name.
+    """
+    record = {"calculation": calculation.name}
+    for name, value, text in zip(calculation.results, results, utilities.as_mixed_numbers(results)):
+        record[name] = value
+        record[f"{name}_text"] = text
+    return record
+
+
+@cache
+def batch_module():
+    """Gets the batch module, or None if NumPy isn't installed. Imported on first use
+    because NumPy is slow to load."""
+    try:
+        import batch
+    except ImportError:
+        return None
+    return batch
+
+
+def calculate_many(calculation: type, jobs: list[list]) -> list[tuple[float]]:
+    """Calculates a list of jobs, all at once when NumPy is available.
+
+    Args:
+        calculation (type): The calculation class.
+        jobs (list[list]): The arguments for each job.
+
+    Returns:
+        list[tuple[float]]: The results for each job. Jobs that can't be calculated
+            (eg. an eye smaller than the rope) raise an exception when they're
+            calculated one at a time, but come out infinite or NaN from NumPy.
+    """
+    batch = batch_module()
+    if batch is not None and calculation in batch.kernels and len(jobs) > 1:
+        import numpy as np
+
+        columns = dict(zip(calculation.parameters, zip(*jobs)))
+        # Without NumPy's warnings, as the callers report those jobs themselves
+        with np.errstate(all="ignore"):
+            return batch.calculate(calculation, **columns).tolist()
+
+    calculator = registry.default().instance(calculation)
+    results = []
+    for arguments in jobs:
+        result = calculator.calculate(*arguments)
+        results.append(result if isinstance(result, tuple) else (result,))
+    return results
+
+
+def read_jobs(lines: Iterable[str], input_format: str) -> Iterable[dict]:
+    """Reads jobs from lines of input, one at a time.
+
+    Args:
+        lines (Iterable[str]): The lines of input, eg. an open file.
+        input_format (str): 'jsonl' or 'csv'.
+
+    Yields:
+        dict | JobError: Each job, or the error for a line that couldn't be read.
+    """
+    if input_format == "csv":
+        yield from csv.DictReader(lines)
+        return
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield JobError(f"invalid JSON ({e.msg})")
+            continue
+        yield job if isinstance(job, dict) else JobError("job is not a JSON object")
+
+
+def open_jobs(source: TextIO, input_format: str = None) -> tuple[Iterable[dict], str]:
+    """Starts reading jobs from a stream, working out the format from the first line
+    if it isn't given.
+
+    Args:
+        source (TextIO): The stream to read jobs from.
+        input_format (str, optional): 'jsonl' or 'csv'. Defaults to None.
+
+    Returns:
+        tuple[Iterable[dict], str]: The jobs (see 'read_jobs') and the input format.
+    """
+    first = source.readline()
+    if input_format is None:
+        input_format = "jsonl" if first.lstrip().startswith("{") else "csv"
+    return read_jobs(_chain_line(first, source), input_format), input_format
+
+
+def _chain_line(first: str, stream: TextIO) -> Iterable[str]:
+    """Puts a line that has already been read back in front of the rest of a stream."""
+    if first:
+        yield first
+    yield from stream
+
+
+def result_columns(calculations: Iterable[type]) -> list[str]:
+    """Works out the CSV output columns for a set of calculations. Each result gets a
+    plain number column and a '_text' column holding the mixed number.
+
+    Args:
+        calculations (Iterable[type]): The calculation classes that may appear.
+
+    Returns:
+        list[str]: The column names, in output order.
+    """
+    columns = ["calculation"]
+    for calculation in calculations:
+        for r in getattr(calculation, "results", ()):
+            if r not in columns:
+                columns += [r, f"{r}_text"]
+    return columns + ["error"]
+
+
+def run(
+    source: TextIO,
+    destination: TextIO,
+    input_format: str = None,
+    output_format: str = None,
+    calculation: str = None,
+    first_line: int = 1,
+    log: TextIO = None,
+) -> int:
+    """Streams jobs from 'source' through the calculators and writes the results to
+    'destination'. Only a small, fixed number of results are held in memory at once.
+
+    Args:
+        source (TextIO): The stream to read jobs from.
+        destination (TextIO): The stream to write results to.
+        input_format (str, optional): 'jsonl' or 'csv'. Detected from the first line
+            if not given. Defaults to None.
+        output_format (str, optional): 'jsonl' or 'csv'. Defaults to the input format.
+        calculation (str, optional): Calculation to use for jobs that don't name one.
+            Defaults to None.
+        first_line (int, optional): Number of the first job, for error messages when
+            'source' is part of a larger input. Defaults to 1.
+        log (TextIO, optional): Where to report errors. Defaults to sys.stderr.
+
+    Returns:
+        int: 0 if every job succeeded, 1 if any of them failed.
+    """
+    if log is None:
+        log = sys.stderr
+    # The calculations that can show up, for the CSV columns
+    calculations = registry.default()
+    if calculation is not None:
+        try:
+            calculations = [find_calculation(calculation)]
+        except JobError as e:
+            print(f"{e}. Options are: {', '.join(registry.default().names())}", file=log)
+            return 2
+
+    jobs, input_format = open_jobs(source, input_format)
+    if output_format is None:
+        output_format = input_format
+    failed = False
+    pending: list[str] = []
+
+    if output_format == "csv":
+        columns = result_columns(calculations)
+        writer = csv.DictWriter(_PendingLines(pending), columns, extrasaction="ignore")
+        writer.writeheader()
+
+    for line_number, job in enumerate(jobs, first_line):
+        try:
+            if isinstance(job, JobError):
+                raise job
+            row = result_record(*run_job(job, calculation))
+        except (ArithmeticError, ValueError, TypeError) as e:
+            # One bad job (eg. an eye too small for the rope) only fails its own line
+            error = str(e) if isinstance(e, JobError) else f"calculation failed ({e})"
+            failed = True
+            print(f"line {line_number}: {error}", file=log)
+            if output_format == "csv":
+                name = job.get("calculation", "") if isinstance(job, dict) else ""
+                writer.writerow({"calculation": name, "error": error})
+            else:
+                pending.append(json.dumps({"error": error, "line": line_number}) + "\n")
+        else:
+            if output_format == "csv":
+                writer.writerow(row)
+            else:
+                pending.append(json.dumps(row) + "\n")
+
+        if len(pending) >= WRITE_BATCH:
+            destination.write("".join(pending))
+            pending.clear()
+
+    destination.write("".join(pending))
+    destination.flush()
+    return 1 if failed else 0
+
+
+class _PendingLines:
+    """File-like object that lets csv.writer add its lines to the pending list."""
+    def __init__(self, pending: list[str]):
+        self.pending = pending
+
+    def write(self, line: str):
+        self.pending.append(line)
+
+
+def main(input_format: str = None, output_format: str = None, calculation: str = None) -> int:
+    """Runs headless mode on stdin/stdout. The disclaimer is printed to stderr so that
+    it doesn't end up mixed in with the results.
+
+    Args:
+        input_format (str, optional): 'jsonl' or 'csv'. Detected if not given.
+        output_format (str, optional): 'jsonl' or 'csv'. Defaults to the input format.
+        calculation (str, optional): Calculation to use for jobs that don't name one.
+
+    Returns:
+        int: The exit status.
+    """
+    msg = tr.catalog()
+    print(f"{msg.disclaimer_title}\n{msg.disclaimer_body}\n", file=sys.stderr)
+    try:
+        return run(sys.stdin, sys.stdout, input_format, output_format, calculation)
+    except BrokenPipeError:
+        # The reader went away (eg. piped into 'head'). Point stdout at devnull so that
+        # Python doesn't complain again when it flushes on exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
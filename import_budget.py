@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Checks how long the tool's modules take to import, using 'python -X importtime',
+against a budget for each one. The calculations are meant to be usable by batch jobs
+and worker processes without loading any of the user interface, so this also checks
+that none of the UI-free entries pull in prompt_toolkit or docopt.
+
+Usage:
+  import_budget.py [--runs=<n>]
+
+Options:
+  --runs=<n>  Number of times to measure each entry, the median is used. [default: 5]
+"""
+import os
+import re
+import subprocess
+import sys
+from statistics import median
+
+# name: (import statement, budget in milliseconds, whether the UI is allowed)
+BUDGETS = {
+    "core": ("import core", 15, False),
+    "calculators": ("import eye_splice, back_splice, chain_splice, grog_sling, general", 40, False),
+    "headless": ("import headless", 50, False),
+    "cli": ("import rope_tools", 50, False),
+    "cli+ui": ("import rope_tools, docopt, prompt_toolkit.shortcuts", 250, True),
+}
+
+UI_MODULES = ("prompt_toolkit", "docopt")
+
+_line = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def _importtime(statement: str) -> dict[str, int]:
+    """Runs a statement in a fresh interpreter with -X importtime.
+
+    Args:
+        statement (str): The statement to run.
+
+    Returns:
+        dict[str, int]: The cumulative import time, in microseconds, of each top level
+            import, by module name.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=here, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = _line.match(line)
+        if match and not match.group(3):
+            times[match.group(4)] = int(match.group(2))
+    return times
+
+
+def measure(statement: str) -> tuple[float, set[str]]:
+    """Measures the import time of a statement, not counting interpreter startup.
+
+    Args:
+        statement (str): The import statement to measure.
+
+    Returns:
+        tuple[float, set[str]]: The time taken in milliseconds, and the names of every
+            top level module it loaded.
+    """
+    startup = _importtime("pass")
+    times = _importtime(statement)
+    loaded = {name for name in times if name not in startup}
+    return sum(times[name] for name in loaded) / 1000, loaded
+
+
+def loads_ui(statement: str) -> list[str]:
+    """Lists the UI modules that end up loaded after running a statement.
+
+    Args:
+        statement (str): The import statement to check.
+
+    Returns:
+        list[str]: The names of any prompt_toolkit or docopt modules that were loaded.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    check = f"{statement}\nimport sys\nprint(*[m for m in sys.modules if m.split('.')[0] in {UI_MODULES!r}])"
+    result = subprocess.run([sys.executable, "-c", check], cwd=here, capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def main(runs: int = 5) -> int:
+    """Measures every entry in BUDGETS and prints a report.
+
+    Args:
+        runs (int, optional): Number of measurements per entry. Defaults to 5.
+
+    Returns:
+        int: 0 if everything is within budget, 1 otherwise.
+    """
+    failed = False
+    print(f"{'entry':<12} {'median (ms)':>11} {'budget (ms)':>11}  status")
+    for name, (statement, budget, ui_allowed) in BUDGETS.items():
+        taken = median(measure(statement)[0] for _ in range(runs))
+        status = "ok"
+        if taken > budget:
+            status = "OVER BUDGET"
+        if not ui_allowed and loads_ui(statement):
+            status = "LOADS UI"
+        failed = failed or status != "ok"
+        print(f"{name:<12} {taken:>11.1f} {budget:>11}  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+
+    arguments = docopt(__doc__)
+    sys.exit(main(int(arguments["--runs"])))
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""Inverse versions of the calculations, for working backwards from a piece of rope:
+given a remnant of a certain length, what is the biggest eye, chain link or sling it
+can still make?
+
+Each function takes NumPy arrays (or anything that can be broadcast into one) of the
+available lengths and the other parameters of the calculation, and returns the largest
+radius that fits, with NaN wherever the rope is too short to make one at all. They all
+use closed forms:
+
+- The chain splices and the grog sling are linear in the radius.
+- In the eye splices the angle beta = acos(R / 3R) doesn't depend on the radius, so
+  the eye length is k*R + c/R, and the largest radius is the larger root of a
+  quadratic.
+
+Like the batch functions, they take the calculator's 'multipliers' as keywords, eg.
+from a rope spec (see ropespec.py), with the same defaults as the formulas in core.py.
+
+verify() (or running this file directly) checks every inverse against its batch
+calculation, and the eyes against a plain bisection search as well.
+"""
+from math import acos, pi, sin, sqrt
+import numpy as np
+from ropespec import DEFAULTS
+import batch
+import chain_splice, eye_splice, grog_sling
+
+# Eye geometry shared by both eye splices, see core.twisted_eye_splice. The eye length
+# for an effective radius R (eye radius + half the rope diameter) is
+# EYE_K * R + EYE_C / R.
+EYE_BETA = acos(1 / 3)
+EYE_K = (pi / 2) - EYE_BETA + pi
+EYE_C = 2 * sin(EYE_BETA) / 3
+# Below this effective radius the eye length gets longer again as the eye shrinks,
+# so it's the smallest eye the formula makes sense for.
+EYE_MIN_RADIUS = sqrt(EYE_C / EYE_K)
+
+
+def _eye_radius(eye_length: np.ndarray, rope_diameter: np.ndarray) -> np.ndarray:
+    """Solves EYE_K * R + EYE_C / R = eye_length for the larger root, and takes off the
+    rope diameter correction."""
+    with np.errstate(invalid="ignore"):
+        radius = (eye_length + np.sqrt(eye_length ** 2 - 4 * EYE_K * EYE_C)) / (2 * EYE_K)
+    radius = radius - rope_diameter / 2
+    return np.where(radius >= 0, radius, np.nan)
+
+
+def _non_negative(radius: np.ndarray) -> np.ndarray:
+    return np.where(radius >= 0, radius, np.nan)
+
+
+def twisted_eye_splice(
+    full_length, rope_diameter, tuck_count, tuck_multiplier=DEFAULTS["tuck_multiplier"]
+) -> np.ndarray:
+    """Inverse of 'eye_splice.TwistedEyeSplice.calculate'.
+
+    Args:
+        full_length (ArrayLike): The lengths of rope available.
+        rope_diameter (ArrayLike): The diameters of the rope.
+        tuck_count (ArrayLike): The desired numbers of 'tucks'.
+        tuck_multiplier (ArrayLike, optional): Rope diameters used by each tuck.
+            Defaults to the formula's.
+
+    Returns:
+        np.ndarray: The largest eye radius each length can make, or NaN.
+    """
+    rope_diameter = np.asarray(rope_diameter, dtype=np.float64)
+    tucks = np.asarray(tuck_multiplier) * np.asarray(tuck_count)
+    eye_length = np.asarray(full_length, dtype=np.float64) - rope_diameter * tucks
+    return _eye_radius(eye_length, rope_diameter)
+
+
+def locked_eye_splice(full_length, rope_diameter, bury_multiplier=DEFAULTS["bury_multiplier"]) -> np.ndarray:
+    """Inverse of 'eye_splice.HollowBraidLockedEyeSplice.calculate'.
+
+    Args:
+        full_length (ArrayLike): The lengths of rope available.
+        rope_diameter (ArrayLike): The diameters of the rope.
+        bury_multiplier (ArrayLike, optional): Rope diameters used by the bury.
+            Defaults to the formula's.
+
+    Returns:
+        np.ndarray: The largest eye radius each length can make, or NaN.
+    """
+    rope_diameter = np.asarray(rope_diameter, dtype=np.float64)
+    # Take off the bury and the extra 3 diameters in the eye
+    eye_length = np.asarray(full_length, dtype=np.float64) - rope_diameter * (np.asarray(bury_multiplier) + 3)
+    return _eye_radius(eye_length, rope_diameter)
+
+
+def twisted_chain_splice(
+    total_length, rope_diameter, tuck_count, tuck_multiplier=DEFAULTS["tuck_multiplier"]
+) -> np.ndarray:
+    """Inverse of 'chain_splice.TwistedChainSplice.calculate'.
+
+    Args:
+        total_length (ArrayLike): The lengths of rope available.
+        rope_diameter (ArrayLike): The diameters of the rope.
+        tuck_count (ArrayLike): The desired numbers of 'tucks'.
+        tuck_multiplier (ArrayLike, optional): Rope diameters used by each tuck.
+            Defaults to the formula's.
+
+    Returns:
+        np.ndarray: The largest chain link radius each length can go through, or NaN.
+    """
+    rope_diameter = np.asarray(rope_diameter, dtype=np.float64)
+    tucks = np.asarray(tuck_multiplier) * np.asarray(tuck_count)
+    loop_length = np.asarray(total_length, dtype=np.float64) - rope_diameter * tucks
+    return _non_negative(loop_length / (2 * pi) - rope_diameter / 2)
+
+
+def hollow_braid_chain_splice(
+    total_length, rope_diameter, bury_multiplier=DEFAULTS["bury_multiplier"]
+) -> np.ndarray:
+    """Inverse of 'chain_splice.HollowBraidChainSplice.calculate'.
+
+    Args:
+        total_length (ArrayLike): The lengths of rope available.
+        rope_diameter (ArrayLike): The diameters of the rope.
+        bury_multiplier (ArrayLike, optional): Rope diameters used by the bury.
+            Defaults to the formula's.
+
+    Returns:
+        np.ndarray: The largest chain link radius each length can go through, or NaN.
+    """
+    rope_diameter = np.asarray(rope_diameter, dtype=np.float64)
+    # Take off the bury and the extra 3 diameters in the loop
+    loop_length = np.asarray(total_length, dtype=np.float64) - rope_diameter * (np.asarray(bury_multiplier) + 3)
+    return _non_negative(loop_length / (2 * pi) - rope_diameter / 2)
+
+
+def grog_sling_radius(total_length, rope_diameter, tail_multiplier=DEFAULTS["tail_multiplier"]) -> np.ndarray:
+    """Inverse of 'grog_sling.GrogSling.calculate'.
+
+    Args:
+        total_length (ArrayLike): The lengths of rope available.
+        rope_diameter (ArrayLike): The diameters of rope.
+        tail_multiplier (ArrayLike, optional): Rope diameters in each tail. Defaults
+            to the formula's.
+
+    Returns:
+        np.ndarray: The largest sling radius each length can make, or NaN.
+    """
+    tail_length = np.asarray(rope_diameter, dtype=np.float64) * np.asarray(tail_multiplier)
+    sling_circumference = np.asarray(total_length, dtype=np.float64) - tail_length * 2
+    return _non_negative(sling_circumference / (2 * pi))
+
+
+# calculator class: (inverse function, the radius parameter it solves for). Arguments
+# are the calculator's 'cut_length' followed by the rest of its 'parameters' in order,
+# and its 'multipliers' as keywords.
+inverses = {
+    eye_splice.TwistedEyeSplice: (twisted_eye_splice, "eye_radius"),
+    eye_splice.HollowBraidLockedEyeSplice: (locked_eye_splice, "eye_radius"),
+    chain_splice.TwistedChainSplice: (twisted_chain_splice, "chain_radius"),
+    chain_splice.HollowBraidChainSplice: (hollow_braid_chain_splice, "chain_radius"),
+    grog_sling.GrogSling: (grog_sling_radius, "sling_radius"),
+}
+
+
+def largest_radius(calculator: type, lengths, **columns) -> np.ndarray:
+    """Works out the largest radius each piece of rope can make with a calculation.
+
+    Args:
+        calculator (type): The calculator class, eg. 'eye_splice.TwistedEyeSplice'.
+        lengths (ArrayLike): The lengths of rope available.
+        **columns (ArrayLike): One array per name in the calculator's 'parameters',
+            apart from the radius, and optionally per name in its 'multipliers'.
+
+    Raises:
+        KeyError: If the calculator has no inverse.
+
+    Returns:
+        np.ndarray: The largest radius for each length, or NaN where it's too short.
+    """
+    function, radius = inverses[calculator]
+    return function(
+        lengths,
+        *[columns[p] for p in calculator.parameters if p != radius],
+        **{m: columns[m] for m in calculator.multipliers if m in columns}
+    )
+
+
+def fits(calculator: type, lengths, radius, **columns) -> np.ndarray:
+    """Finds the pieces of rope that can make a given radius, eg. to pick a remnant
+    out of the bin for a job.
+
+    Args:
+        calculator (type): The calculator class.
+        lengths (ArrayLike): The lengths of rope available.
+        radius (ArrayLike): The radius needed.
+        **columns (ArrayLike): One array per name in the calculator's 'parameters',
+            apart from the radius, and optionally per name in its 'multipliers'.
+
+    Returns:
+        np.ndarray: Indexes into 'lengths' of every piece that is long enough,
+            shortest (least waste) first.
+    """
+    lengths = np.asarray(lengths, dtype=np.float64)
+    largest = largest_radius(calculator, lengths, **columns)
+    candidates = np.flatnonzero(largest >= radius)
+    return candidates[np.argsort(lengths[candidates], kind="stable")]
+
+
+def bisect(function, target: np.ndarray, low: np.ndarray, high: np.ndarray, iterations: int = 100) -> np.ndarray:
+    """Vectorized bisection search, for when there is no closed form. Finds x in
+    [low, high] where function(x) == target, for a function that increases over that
+    range.
+
+    Args:
+        function (Callable[[np.ndarray], np.ndarray]): The function to invert.
+        target (np.ndarray): The values to find.
+        low (np.ndarray): Lower bounds of the search.
+        high (np.ndarray): Upper bounds of the search.
+        iterations (int, optional): Number of halvings. Defaults to 100, which is
+            more than enough for float64.
+
+    Returns:
+        np.ndarray: The solutions.
+    """
+    target, low, high = np.broadcast_arrays(*[np.asarray(a, dtype=np.float64) for a in (target, low, high)])
+    low, high = low.copy(), high.copy()
+    for _ in range(iterations):
+        middle = (low + high) / 2
+        below = function(middle) < target
+        low = np.where(below, middle, low)
+        high = np.where(below, high, middle)
+    return (low + high) / 2
+
+
+def verify(samples: int = 1000, seed: int = 0):
+    """Checks that running each calculation forward on the inverse's answer gives back
+    the length that went in, and that the eye solutions agree with bisection, with the
+    default multipliers and with random ones.
+
+    Args:
+        samples (int, optional): Number of random jobs to check per calculator.
+            Defaults to 1000.
+        seed (int, optional): Seed for the random parameters. Defaults to 0.
+
+    Raises:
+        ValueError: If any inverse doesn't round trip.
+    """
+    rng = np.random.default_rng(seed)
+    checks = []
+    for calculator in inverses:
+        columns = batch.sample_parameters(calculator, samples, seed)
+        multipliers = {m: DEFAULTS[m] * rng.uniform(0.5, 2, samples) for m in calculator.multipliers}
+        checks += [(calculator, columns), (calculator, {**columns, **multipliers})]
+
+    for calculator, columns in checks:
+        radius = inverses[calculator][1]
+        lengths = batch.calculate(calculator, **columns)[calculator.cut_length]
+
+        found = largest_radius(calculator, lengths, **columns)
+        again = batch.calculate(calculator, **{**columns, radius: found})[calculator.cut_length]
+        if not np.allclose(again, lengths, rtol=1e-9, atol=0):
+            worst = np.nanargmax(np.abs(again - lengths))
+            raise ValueError(
+                f"{calculator.__name__}: radius {found[worst]} gives a length of {again[worst]}, "
+                f"not {lengths[worst]}"
+            )
+        # Anything shorter than the smallest eye or link can't make one
+        if not np.isnan(largest_radius(calculator, np.zeros(samples), **columns)).all():
+            raise ValueError(f"{calculator.__name__}: found a radius for a length of 0")
+
+        if radius == "eye_radius":
+            def eye_length(r):
+                return batch.calculate(calculator, **{**columns, radius: r})[calculator.cut_length]
+
+            searched = bisect(eye_length, lengths, np.maximum(EYE_MIN_RADIUS - columns["rope_diameter"] / 2, 0), 1000)
+            if not np.allclose(searched, found, rtol=1e-9, atol=1e-12):
+                raise ValueError(f"{calculator.__name__}: closed form doesn't agree with bisection")
+
+
+if __name__ == "__main__":
+    verify()
+    print(f"All {len(inverses)} inverse calculations round trip.")
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""Fixed point lengths, for when floats in inches aren't good enough, eg. adding up
+thousands of rounded lengths for an order without the total drifting.
+
+A Length is a whole number of nanometres. An inch is exactly 25,400,000 nm, so every
+inch fraction down to 1/64" and every whole micrometre is stored exactly, and sums of
+lengths are always exact. LengthArray keeps many lengths in a compact 'array' of 64 bit
+integers, which can be handed to NumPy without copying.
+
+Like core.py, this module only uses the standard library.
+"""
+from __future__ import annotations
+from array import array
+from enum import Enum
+from functools import total_ordering
+from math import ceil, floor
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from fractions import Fraction
+
+# Nanometres in each unit
+UNITS = {
+    "in": 25_400_000,
+    "ft": 304_800_000,
+    "mm": 1_000_000,
+    "cm": 10_000_000,
+    "m": 1_000_000_000,
+}
+METRIC_UNITS = ("mm", "cm", "m")
+
+# Calculation parameters that are counts, not lengths
+COUNTS = {"tuck_count"}
+
+
+class Rounding(Enum):
+    # Towards negative infinity, which is what the tool has always done
+    DOWN = "down"
+    # Towards positive infinity, eg. so a piece is never cut short
+    UP = "up"
+    # To the closest step, halves go up
+    NEAREST = "nearest"
+
+    def apply(self, value: float) -> int:
+        """Rounds a float to a whole number with this policy."""
+        if self is Rounding.DOWN:
+            return floor(value)
+        if self is Rounding.UP:
+            return ceil(value)
+        return floor(value + 0.5)
+
+    def divide(self, numerator: int, denominator: int) -> int:
+        """Divides two integers, rounding the result with this policy. Exact, unlike
+        apply(numerator / denominator).
+
+        Args:
+            numerator (int): The number being divided.
+            denominator (int): The number to divide by, must be positive.
+
+        Returns:
+            int: The rounded result.
+        """
+        quotient, remainder = divmod(numerator, denominator)
+        if self is Rounding.DOWN or not remainder:
+            return quotient
+        if self is Rounding.UP:
+            return quotient + 1
+        return quotient + (2 * remainder >= denominator)
+
+
+def _unit(unit: str) -> int:
+    try:
+        return UNITS[unit]
+    except KeyError:
+        raise ValueError(f"Unknown unit '{unit}', use one of {', '.join(UNITS)}") from None
+
+
+def to_nanometres(value: float | int | Fraction | Length, unit: str = "in") -> int:
+    """Converts a value to a whole number of nanometres, to the nearest nanometre.
+
+    Args:
+        value (float | int | Fraction | Length): The value. Lengths are returned as
+            they are, ints and Fractions are converted exactly.
+        unit (str, optional): The unit the value is in. Defaults to "in".
+
+    Raises:
+        ValueError: If the unit isn't known, or the value is infinite or NaN.
+
+    Returns:
+        int: The value in nanometres.
+    """
+    if isinstance(value, Length):
+        return value.nm
+    scale = _unit(unit)
+    if isinstance(value, int):
+        return value * scale
+    if hasattr(value, "denominator"):
+        # Fractions, without needing to import them
+        return Rounding.NEAREST.divide(value.numerator * scale, value.denominator)
+    if value != value or value in (float("inf"), float("-inf")):
+        raise ValueError(f"Can't convert {value} to a length")
+    return round(value * scale)
+
+
+@total_ordering
+class Length:
+    __slots__ = ("nm",)
+
+    def __init__(self, nm: int = 0):
+        """A length stored as a whole number of nanometres. Use Length.of(), or
+        Length.inches() and friends, to make one from another unit.
+
+        Args:
+            nm (int, optional): The length in nanometres. Defaults to 0.
+        """
+        self.nm = int(nm)
+
+    @classmethod
+    def of(cls, value: float | int | Fraction | Length, unit: str = "in") -> Length:
+        """Makes a length from a value in any unit in UNITS."""
+        return cls(to_nanometres(value, unit))
+
+    @classmethod
+    def inches(cls, value: float | int | Fraction) -> Length:
+        return cls(to_nanometres(value, "in"))
+
+    @classmethod
+    def feet(cls, value: float | int | Fraction) -> Length:
+        return cls(to_nanometres(value, "ft"))
+
+    @classmethod
+    def millimetres(cls, value: float | int | Fraction) -> Length:
+        return cls(to_nanometres(value, "mm"))
+
+    @classmethod
+    def centimetres(cls, value: float | int | Fraction) -> Length:
+        return cls(to_nanometres(value, "cm"))
+
+    @staticmethod
+    def sum(lengths: Iterable[Length]) -> Length:
+        """Adds up lengths exactly."""
+        return Length(sum(length.nm for length in lengths))
+
+    def to(self, unit: str = "in") -> float:
+        """Gets the length in a unit, as a float."""
+        return self.nm / _unit(unit)
+
+    def exact(self, unit: str = "in") -> Fraction:
+        """Gets the length in a unit, exactly."""
+        from fractions import Fraction
+
+        return Fraction(self.nm, _unit(unit))
+
+    def steps(self, denominator: int = 16, rounding: Rounding = Rounding.DOWN, unit: str = "in") -> int:
+        """Counts how many 1/denominator steps of a unit there are in the length, eg.
+        sixteenths of an inch or tenths of a millimetre. Exact for any step size.
+
+        Args:
+            denominator (int, optional): Steps per unit. Defaults to 16.
+            rounding (Rounding, optional): How to round partial steps. Defaults to
+                Rounding.DOWN.
+            unit (str, optional): The unit. Defaults to "in".
+
+        Returns:
+            int: The number of steps.
+        """
+        return rounding.divide(self.nm * denominator, _unit(unit))
+
+    def round(self, denominator: int = 16, rounding: Rounding = Rounding.DOWN, unit: str = "in") -> Length:
+        """Rounds the length to a 1/denominator step of a unit, eg. the nearest 1/16".
+        Steps that aren't a whole number of nanometres (smaller than 1/64" for inches)
+        are rounded to the nearest nanometre.
+
+        Args:
+            denominator (int, optional): Steps per unit. Defaults to 16.
+            rounding (Rounding, optional): How to round partial steps. Defaults to
+                Rounding.DOWN.
+            unit (str, optional): The unit. Defaults to "in".
+
+        Returns:
+            Length: The rounded length.
+        """
+        steps = self.steps(denominator, rounding, unit)
+        return Length(Rounding.NEAREST.divide(steps * _unit(unit), denominator))
+
+    def format(
+        self, unit: str = "in", denominator: int = 16, rounding: Rounding = Rounding.DOWN, places: int = 1
+    ) -> str:
+        """Formats the length for people to read. Inches and feet are shown as mixed
+        numbers (see utilities.as_mixed_number), metric units as decimals.
+
+        Args:
+            unit (str, optional): The unit to show. Defaults to "in".
+            denominator (int, optional): For inches and feet, the fraction to round to.
+                Defaults to 16.
+            rounding (Rounding, optional): How to round. Defaults to Rounding.DOWN.
+            places (int, optional): For metric units, the number of decimal places.
+                Defaults to 1.
+
+        Returns:
+            str: eg. "5+3/8" or "136.5".
+        """
+        if unit not in METRIC_UNITS:
+            import utilities
+
+            return utilities.as_mixed_number(self, denominator, rounding, unit)
+        steps = self.steps(10 ** places, rounding, unit)
+        whole, part = divmod(abs(steps), 10 ** places)
+        sign = "-" if steps < 0 else ""
+        return f"{sign}{whole}.{part:0{places}}" if places else f"{sign}{whole}"
+
+    def __add__(self, other: Length) -> Length:
+        if not isinstance(other, Length):
+            return NotImplemented
+        return Length(self.nm + other.nm)
+
+    def __radd__(self, other: Length | int) -> Length:
+        # So that the built in sum() works without a start value
+        if other == 0:
+            return self
+        return self.__add__(other)
+
+    def __sub__(self, other: Length) -> Length:
+        if not isinstance(other, Length):
+            return NotImplemented
+        return Length(self.nm - other.nm)
+
+    def __mul__(self, other: int) -> Length:
+        if not isinstance(other, int):
+            return NotImplemented
+        return Length(self.nm * other)
+
+    __rmul__ = __mul__
+
+    def __neg__(self) -> Length:
+        return Length(-self.nm)
+
+    def __abs__(self) -> Length:
+        return Length(abs(self.nm))
+
+    def __bool__(self) -> bool:
+        return bool(self.nm)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Length):
+            return NotImplemented
+        return self.nm == other.nm
+
+    def __lt__(self, other: Length) -> bool:
+        if not isinstance(other, Length):
+            return NotImplemented
+        return self.nm < other.nm
+
+    def __hash__(self) -> int:
+        return hash(self.nm)
+
+    def __float__(self) -> float:
+        # Everything else in the tool works in inches
+        return self.nm / UNITS["in"]
+
+    def __repr__(self) -> str:
+        return f"Length({self.nm})"
+
+    def __str__(self) -> str:
+        return self.format()
+
+
+class LengthArray:
+    def __init__(self, nm: Iterable[int] = ()):
+        """Many lengths, stored as 64 bit nanometre counts in an 'array'.
+
+        Args:
+            nm (Iterable[int], optional): The lengths in nanometres. Defaults to ().
+        """
+        self.nm = array("q", nm)
+
+    @classmethod
+    def of(cls, values: Iterable[float | int | Fraction | Length], unit: str = "in") -> LengthArray:
+        """Makes an array from values in any unit in UNITS."""
+        if hasattr(values, "dtype"):
+            # NumPy arrays are converted all at once
+            import numpy as np
+
+            scaled = np.rint(np.asarray(values, dtype=np.float64) * _unit(unit))
+            if not np.isfinite(scaled).all():
+                raise ValueError("Can't convert infinite or NaN values to lengths")
+            result = cls()
+            result.nm.frombytes(scaled.astype(np.int64).tobytes())
+            return result
+        return cls(to_nanometres(v, unit) for v in values)
+
+    def append(self, length: Length):
+        self.nm.append(length.nm)
+
+    def extend(self, lengths: Iterable[Length]):
+        self.nm.extend(length.nm for length in lengths)
+
+    def total(self) -> Length:
+        """Adds up every length exactly."""
+        return Length(sum(self.nm))
+
+    def to(self, unit: str = "in") -> list[float]:
+        """Gets every length in a unit, as floats."""
+        scale = _unit(unit)
+        return [nm / scale for nm in self.nm]
+
+    def steps(self, denominator: int = 16, rounding: Rounding = Rounding.DOWN, unit: str = "in") -> list[int]:
+        """Counts the 1/denominator steps of a unit in every length, see Length.steps."""
+        scale = _unit(unit)
+        divide = rounding.divide
+        return [divide(nm * denominator, scale) for nm in self.nm]
+
+    def round(self, denominator: int = 16, rounding: Rounding = Rounding.DOWN, unit: str = "in") -> LengthArray:
+        """Rounds every length to a 1/denominator step of a unit, see Length.round."""
+        scale = _unit(unit)
+        nearest = Rounding.NEAREST.divide
+        return LengthArray(nearest(s * scale, denominator) for s in self.steps(denominator, rounding, unit))
+
+    def __len__(self) -> int:
+        return len(self.nm)
+
+    def __iter__(self) -> Iterator[Length]:
+        return map(Length, self.nm)
+
+    def __getitem__(self, index: int) -> Length:
+        return Length(self.nm[index])
+
+    def __repr__(self) -> str:
+        return f"LengthArray({self.nm.tolist()})"
+
+
+def calculate(calculator, *arguments, unit: str = "in") -> tuple[Length]:
+    """Runs any calculator with lengths instead of inches.
+
+    Length arguments are converted to inches first, plain numbers are taken to be in
+    'unit', and counts (see COUNTS) are passed along as they are. The formulas
+    themselves still run on floats, so this costs nothing when it isn't used.
+
+    Args:
+        calculator: The calculator, anything with 'parameters' and a calculate()
+            method.
+        *arguments: The arguments for calculate(), in the order of 'parameters'.
+        unit (str, optional): The unit of any plain number arguments. Defaults to "in".
+
+    Returns:
+        tuple[Length]: Every result as a length.
+    """
+    scale = _unit(unit) / UNITS["in"]
+    inches = []
+    for name, argument in zip(calculator.parameters, arguments):
+        if isinstance(argument, Length):
+            inches.append(argument.nm / UNITS["in"])
+        elif name in COUNTS:
+            inches.append(argument)
+        else:
+            inches.append(argument * scale)
+    results = calculator.calculate(*inches)
+    if not isinstance(results, tuple):
+        results = (results,)
+    return tuple(Length(to_nanometres(r, "in")) for r in results)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Load generator for server.py. Opens a number of keep-alive connections to the
+service, sends one job at a time on each as fast as the answers come back, and reports
+the requests per second and latency percentiles.
+
+Usage:
+  loadgen.py [--host=<host>] [--port=<port>] [--connections=<n>] [--duration=<s>] [--calculation=<name>] [--seed=<n>]
+  loadgen.py --help
+
+Options:
+  --host=<host>         Address of the service. [default: 127.0.0.1]
+  --port=<port>         Port of the service. [default: 8080]
+  --connections=<n>     Number of connections to run at once. [default: 64]
+  --duration=<s>        How long to run for, in seconds. [default: 10]
+  --calculation=<name>  Calculation to send jobs for. [default: twisted_eye_splice]
+  --seed=<n>            Seed for the random jobs. [default: 0]
+  -h --help             Show this message.
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+
+def make_job(rng: random.Random) -> dict:
+    """Makes a random job with realistic sizes. Parameters that the calculation
+    doesn't use are ignored by the service."""
+    return {
+        "rope_diameter": rng.choice([0.25, 0.375, 0.5, 0.625, 0.75, 1.0]),
+        "radius": round(rng.uniform(0.5, 6), 3),
+        "tucks": rng.randint(3, 7),
+    }
+
+
+async def client(host: str, port: int, path: str, deadline: float, rng: random.Random, latencies: list[float]):
+    """Sends jobs on one connection until the deadline, recording each latency."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            body = json.dumps(make_job(rng)).encode()
+            start = time.perf_counter()
+            writer.write(
+                f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.decode("latin-1").split("\r\n"):
+                if line.lower().startswith("content-length:"):
+                    length = int(line.split(":", 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if not head.startswith(b"HTTP/1.1 200"):
+                raise RuntimeError(f"Service answered {head.splitlines()[0].decode()}")
+    finally:
+        writer.close()
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Gets a percentile from an already sorted list (nearest rank)."""
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(host: str, port: int, connections: int, duration: float, calculation: str, seed: int) -> dict:
+    """Runs the load test.
+
+    Returns:
+        dict: The number of requests, requests per second, and latency percentiles in
+            milliseconds.
+    """
+    latencies: list[float] = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*[
+        client(host, port, f"/{calculation}", deadline, random.Random(seed + i), latencies)
+        for i in range(connections)
+    ])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+
+    arguments = docopt(__doc__)
+    report = asyncio.run(run(
+        arguments["--host"],
+        int(arguments["--port"]),
+        int(arguments["--connections"]),
+        float(arguments["--duration"]),
+        arguments["--calculation"],
+        int(arguments["--seed"])
+    ))
+    json.dump(report, sys.stdout, indent=2)
+    print()
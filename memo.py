@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""Memoization of calculation results. Real orders repeat the same few combinations of
+rope diameter, eye size and tucks over and over, so a Memo put in front of the
+calculators answers most of them without running the formulas.
+
+Lengths are snapped to a grid (1/16" by default) before anything else happens, and the
+calculation is run on the snapped values, so a result only depends on its key no
+matter who calculated it first. Counts like 'tuck_count' are used as they are, and so
+are the multipliers the rope specs pass in (see ropespec.py), which are part of the key
+too. A call with multipliers keeps its rope diameter exactly as well, since it's the
+actual diameter from a spec, not one somebody typed.
+
+Results are kept in memory in least recently used order, up to a fixed number of them.
+A Store adds a second tier in an SQLite file, which keeps results between runs and can
+be shared by several processes at once, eg. the workers in sharded.py. If a formula
+changes, clear the store.
+
+To use one, hand it to a registry:
+    registry.default().set_memo(memo.Memo(store="results.sqlite"))
+
+Like core.py, this module only uses the standard library.
+"""
+from __future__ import annotations
+import atexit
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+from math import floor
+from typing import Callable
+from length import COUNTS
+
+# Results kept in memory by default
+MAX_SIZE = 4096
+
+# Steps per inch that lengths are snapped to
+GRID = 16
+
+# New results are written to the store in batches of this many
+FLUSH_EVERY = 256
+
+
+class Store:
+    def __init__(self, path: str):
+        """Results kept in an SQLite file, shared between runs and processes. Each
+        process opens its own connection when it first needs one, so a Store can be
+        passed on to forked workers.
+
+        Args:
+            path (str): The database file. It's created if it doesn't exist.
+        """
+        self.path = path
+        self._connection: sqlite3.Connection = None
+        self._pid: int = None
+        self._pending: list[tuple[str, str, str]] = []
+        atexit.register(self.flush)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            # Either the first use, or a new process that can't share its parent's
+            # connection. Anything the parent hadn't written yet is its job.
+            self._pending.clear()
+            self._connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # WAL lets readers carry on while another process writes
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "calculation TEXT NOT NULL, arguments TEXT NOT NULL, results TEXT NOT NULL, "
+                "PRIMARY KEY (calculation, arguments)) WITHOUT ROWID"
+            )
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, calculation: str, arguments: str) -> str | None:
+        """Looks up the results for a key, as JSON, or None if they aren't stored."""
+        row = self._connect().execute(
+            "SELECT results FROM results WHERE calculation = ? AND arguments = ?", (calculation, arguments)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, calculation: str, arguments: str, results: str):
+        """Stores the results for a key, as JSON. They're written with the next batch."""
+        self._connect()
+        self._pending.append((calculation, arguments, results))
+        if len(self._pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """Writes any stored results that haven't been written yet."""
+        if not self._pending or self._pid != os.getpid():
+            return
+        with self._connection:
+            self._connection.execute("BEGIN")
+            self._connection.executemany("INSERT OR IGNORE INTO results VALUES (?, ?, ?)", self._pending)
+        self._pending.clear()
+
+    def clear(self):
+        """Deletes every stored result, eg. after a formula has changed."""
+        self._pending.clear()
+        self._connect().execute("DELETE FROM results")
+
+    def __len__(self) -> int:
+        self.flush()
+        return self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        """Writes anything pending and closes the connection."""
+        self.flush()
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = self._pid = None
+
+
+class Memo:
+    def __init__(self, max_size: int = MAX_SIZE, store: Store | str = None, grid: int = GRID):
+        """A least recently used cache of calculation results.
+
+        Args:
+            max_size (int, optional): Most results to keep in memory. Defaults to
+                MAX_SIZE.
+            store (Store | str, optional): A second tier to check before
+                calculating, or the path of an SQLite file for one. Defaults to None.
+            grid (int, optional): Steps per inch that lengths are snapped to, or None
+                to use lengths exactly as they are given. Defaults to GRID.
+
+        Raises:
+            ValueError: If max_size or grid is less than 1.
+        """
+        if max_size < 1:
+            raise ValueError("The cache must hold at least 1 result")
+        if grid is not None and grid < 1:
+            raise ValueError("The grid must have at least 1 step per inch")
+        self.max_size = max_size
+        self.store = Store(store) if isinstance(store, str) else store
+        self.grid = grid
+        self._results: OrderedDict[tuple, object] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Misses in memory that were found in the store
+        self.store_hits = 0
+
+    def cached(self, calculator) -> Callable:
+        """Wraps a calculator's calculate() method with the cache.
+
+        Args:
+            calculator: The calculator, anything with a 'name', 'parameters' and a
+                calculate() method.
+
+        Returns:
+            Callable: A function that takes the same arguments as calculate().
+        """
+        calculate = calculator.calculate
+        name = calculator.name
+        grid = self.grid
+        key_of = _key_function(name, calculator.parameters, grid)
+        spec_key_of = _key_function(name, calculator.parameters, grid, ("rope_diameter",))
+        # Whether each argument is in the key as it is, rather than in grid steps
+        counts = [p in COUNTS for p in calculator.parameters]
+        spec_counts = [p in COUNTS or p == "rope_diameter" for p in calculator.parameters]
+        results = self._results
+        move_to_end = results.move_to_end
+
+        def cached_calculate(*arguments, **multipliers):
+            if multipliers:
+                # Multipliers and the actual diameter from a spec are used as they are
+                key = spec_key_of(*arguments) + tuple(sorted(multipliers.items()))
+            else:
+                key = key_of(*arguments)
+            try:
+                result = results[key]
+            except KeyError:
+                pass
+            else:
+                self.hits += 1
+                move_to_end(key)
+                return result
+
+            self.misses += 1
+            result = None
+            if self.store is not None:
+                # The grid is part of the key, as steps mean nothing without it
+                stored_key = json.dumps([grid, *key[1:]])
+                stored = self.store.get(name, stored_key)
+                if stored is not None:
+                    self.store_hits += 1
+                    result = json.loads(stored)
+                    result = tuple(result) if isinstance(result, list) else result
+            if result is None:
+                if grid is None:
+                    result = calculate(*arguments, **multipliers)
+                else:
+                    # Calculated on the snapped values, so the result matches the key
+                    exact = spec_counts if multipliers else counts
+                    snapped = [s if as_is else s / grid for s, as_is in zip(key[1:], exact)]
+                    result = calculate(*snapped, **multipliers)
+                if self.store is not None:
+                    self.store.put(name, stored_key, json.dumps(result))
+
+            results[key] = result
+            if len(results) > self.max_size:
+                results.popitem(last=False)
+                self.evictions += 1
+            return result
+
+        cached_calculate.__doc__ = calculate.__doc__
+        return cached_calculate
+
+    def wrap(self, calculator) -> object:
+        """Puts the cache in front of a calculator's calculate() method, in place. See
+        registry.Registry.set_memo for putting it in front of every calculator.
+
+        Returns:
+            object: The same calculator.
+        """
+        if hasattr(calculator, "parameters"):
+            calculator.calculate = self.cached(calculator)
+        return calculator
+
+    def stats(self) -> dict[str, int | float]:
+        """Gets the counters, for sizing the cache.
+
+        Returns:
+            dict[str, int | float]: hits, misses, store_hits, evictions, size, max_size
+                and hit_rate (hits as a fraction of every call).
+        """
+        calls = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "store_hits": self.store_hits,
+            "evictions": self.evictions,
+            "size": len(self._results),
+            "max_size": self.max_size,
+            "hit_rate": self.hits / calls if calls else 0.0,
+        }
+
+    def summary(self) -> str:
+        """The counters as one line of text."""
+        s = self.stats()
+        line = f"cache: {s['hits']} hits, {s['misses']} misses ({s['hit_rate']:.1%} hit rate), "
+        if self.store is not None:
+            line += f"{s['store_hits']} found in {self.store.path}, "
+        return line + f"{s['evictions']} evictions, {s['size']}/{s['max_size']} results"
+
+    def flush(self):
+        """Writes any new results to the store, eg. before a worker process exits
+        without running its atexit handlers."""
+        if self.store is not None:
+            self.store.flush()
+
+    def clear(self):
+        """Empties the memory tier and resets the counters. The store is left alone."""
+        self._results.clear()
+        self.hits = self.misses = self.evictions = self.store_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+
+def _key_function(
+    name: str, parameters: tuple[str], grid: int | None, exact: tuple[str] = ()
+) -> Callable[..., tuple]:
+    """Builds the function that turns a calculation's arguments into its key, as a
+    single expression, since it runs on every call. The key is the calculation's name
+    followed by each length as a whole number of grid steps (rounded to the nearest)
+    and each count as it is.
+
+    Args:
+        name (str): The name of the calculation.
+        parameters (tuple[str]): Its parameters, in order.
+        grid (int | None): Steps per inch, or None to use the lengths as they are.
+        exact (tuple[str], optional): Lengths to use as they are, like counts.
+            Defaults to ().
+
+    Returns:
+        Callable[..., tuple]: Takes the arguments of calculate() and returns the key.
+    """
+    arguments = ", ".join(f"v{i}" for i in range(len(parameters)))
+    parts = [
+        f"v{i}" if grid is None or p in COUNTS or p in exact else f"floor(v{i} * {grid} + 0.5)"
+        for i, p in enumerate(parameters)
+    ]
+    return eval(f"lambda {arguments}: (name, {', '.join(parts)})", {"name": name, "floor": floor})
+
+
+def verify():
+    """Checks that the cache doesn't change the results of calculators run with rope
+    specs (see ropespec.py), for specs with metric and off-grid diameters.
+
+    Raises:
+        ValueError: If any result with the cache differs from the one without.
+    """
+    import registry
+    import ropespec
+    from core import RopeType
+
+    specs = ropespec.SpecDatabase(":memory:")
+    specs.add(
+        ropespec.Spec(f"{rope_type.name} {i}", "", rope_type, "", nominal, actual, 80, 35, 20, 4, None)
+        for rope_type in RopeType
+        for i, (nominal, actual) in enumerate(((0.625, 0.6), (16 / 25.4, 16 / 25.4), (0.5, 0.53)))
+    )
+    plain, cached = registry.Registry(group=None), registry.Registry(group=None)
+    plain.set_specs(specs)
+    cached.set_specs(specs)
+    cached.set_memo(Memo())
+    for calculation in plain:
+        if not getattr(calculation, "multipliers", ()):
+            continue
+        for spec in specs.specs(calculation.rope_type):
+            # Everything but the rope diameter is on the grid, so only the specs matter
+            arguments = [
+                spec.nominal_diameter if p == "rope_diameter" else 5 if p in COUNTS else 1
+                for p in calculation.parameters
+            ]
+            expected = plain.instance(calculation).calculate(*arguments)
+            for _ in range(2):
+                # A miss, then a hit
+                got = cached.instance(calculation).calculate(*arguments)
+                if got != expected:
+                    raise ValueError(
+                        f"{calculation.__name__}: {got} with the cache, not {expected}, for {spec}"
+                    )
+
+
+if __name__ == "__main__":
+    verify()
+    print("The cache gives the same results as the calculators with rope specs.")
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Counters and latency histograms for seeing how the tool is used and how fast it
+responds, exported in the Prometheus text format to a file or a local endpoint.
+
+Nothing is measured until install() is called: it swaps timed wrappers in for the
+calculators' methods, utilities.select_from_list and the fid table rendering, and
+Metrics.wrap_session() and install_dialogs() do the same for the prompts and dialogs of
+an interactive session. Until then nothing is wrapped, so switched off it costs
+nothing at all, and rope_tools.py doesn't even import this module unless asked to.
+
+Like core.py, this module only uses the standard library.
+"""
+from __future__ import annotations
+import os
+import threading
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+    from prompt_toolkit import PromptSession
+    from registry import Registry
+
+# Upper bounds of the histogram buckets, in seconds. Calculations take microseconds,
+# anything a person answers takes seconds.
+CALCULATION_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 1e-3, 1e-2)
+RENDER_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 0.1)
+INTERACTIVE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+DEFAULT_PORT = 9464
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple[str] = ()):
+        """A count of things that have happened, per combination of label values.
+
+        Args:
+            name (str): The metric name.
+            help_text (str): What it counts, for the HELP line.
+            labels (tuple[str], optional): Label names. Defaults to ().
+        """
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values: dict[tuple[str], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            values = list(self.values.items())
+        for label_values, value in values:
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple[str] = (), buckets: tuple[float] = CALCULATION_BUCKETS):
+        """A distribution of durations, per combination of label values.
+
+        Args:
+            name (str): The metric name, usually ending in '_seconds'.
+            help_text (str): What it measures, for the HELP line.
+            labels (tuple[str], optional): Label names. Defaults to ().
+            buckets (tuple[float], optional): Upper bounds of the buckets, in order.
+                Defaults to CALCULATION_BUCKETS.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values: [count in each bucket (not cumulative) and +Inf, sum]
+        self.values: dict[tuple[str], list] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, seconds: float, *label_values: str):
+        with self.lock:
+            value = self.values.get(label_values)
+            if value is None:
+                value = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            value[0][bisect_left(self.buckets, seconds)] += 1
+            value[1] += seconds
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            values = [(label_values, list(counts), total) for label_values, (counts, total) in self.values.items()]
+        for label_values, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                labels = _labels((*self.labels, "le"), (*label_values, bound if bound == "+Inf" else _number(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _labels(names: tuple[str], values: tuple) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metrics:
+    def __init__(self):
+        """Every metric the tool records."""
+        self.calculations = Counter(
+            "rope_tools_calculations_total", "Calculations run.", ("calculation", "rope_type")
+        )
+        self.calculation_errors = Counter(
+            "rope_tools_calculation_errors_total", "Calculations that raised an error.", ("calculation", "rope_type")
+        )
+        self.calculation_seconds = Histogram(
+            "rope_tools_calculation_seconds", "Time spent in calculate().", ("calculation", "rope_type"),
+            CALCULATION_BUCKETS,
+        )
+        self.menu_seconds = Histogram(
+            "rope_tools_menu_seconds", "Time taken to pick from a text menu.", (), INTERACTIVE_BUCKETS
+        )
+        self.prompt_seconds = Histogram(
+            "rope_tools_prompt_seconds", "Time taken to answer a prompt or dialog.", ("mode",), INTERACTIVE_BUCKETS
+        )
+        self.session_seconds = Histogram(
+            "rope_tools_session_seconds", "Time from choosing a calculation to seeing its results.",
+            ("calculation", "rope_type", "mode"), INTERACTIVE_BUCKETS,
+        )
+        self.swap_seconds = Histogram(
+            "rope_tools_dialog_swap_seconds", "Time from a dialog being asked for to it being on screen.", (),
+            RENDER_BUCKETS,
+        )
+        self.render_seconds = Histogram(
+            "rope_tools_table_render_seconds", "Time taken to render a table.", ("table",), RENDER_BUCKETS
+        )
+        self._server: ThreadingHTTPServer = None
+
+    def __iter__(self):
+        return (m for m in vars(self).values() if isinstance(m, (Counter, Histogram)))
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text format."""
+        return "".join(line + "\n" for metric in self for line in metric.render())
+
+    def write(self, path: str):
+        """Writes the metrics to a file, eg. for node_exporter's textfile collector.
+        The file is replaced in one step, so a reader never sees half of it."""
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(self.render())
+        os.replace(temporary, path)
+
+    def serve(self, port: int = DEFAULT_PORT, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serves the metrics at 'http://host:port/metrics' from a background thread.
+
+        Args:
+            port (int, optional): Port to listen on, 0 for any free port. Defaults to
+                DEFAULT_PORT.
+            host (str, optional): Address to listen on. Defaults to "127.0.0.1".
+
+        Returns:
+            ThreadingHTTPServer: The server, already running.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                # Requests would end up in the middle of the interactive prompts
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def close(self):
+        """Stops the endpoint, if it was started."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def wrap(self, calculator) -> object:
+        """Times a calculator's calculate(), text() and dialog() methods, in place.
+
+        Returns:
+            object: The same calculator.
+        """
+        labels = (calculator.name, calculator.rope_type.name.lower())
+        for mode in ("text", "dialog"):
+            if hasattr(calculator, mode):
+                setattr(calculator, mode, self._timed(getattr(calculator, mode), self.session_seconds, *labels, mode))
+        if not hasattr(calculator, "parameters"):
+            # Tables have nothing to calculate
+            return calculator
+
+        calculate = calculator.calculate
+        count, errors, observe = self.calculations.inc, self.calculation_errors.inc, self.calculation_seconds.observe
+
+        @wraps(calculate)
+        def timed_calculate(*arguments, **multipliers):
+            start = perf_counter()
+            try:
+                return calculate(*arguments, **multipliers)
+            except Exception:
+                errors(*labels)
+                raise
+            finally:
+                observe(perf_counter() - start, *labels)
+                count(*labels)
+
+        calculator.calculate = timed_calculate
+        return calculator
+
+    def wrap_session(self, session: PromptSession) -> PromptSession:
+        """Times every prompt of a text mode session, in place."""
+        session.prompt = self._timed(session.prompt, self.prompt_seconds, "text")
+        return session
+
+    def _timed(self, function: Callable, histogram: Histogram, *labels: str) -> Callable:
+        observe = histogram.observe
+
+        @wraps(function)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                observe(perf_counter() - start, *labels)
+        return timed
+
+
+_installed: Metrics = None
+
+
+def install(registry: Registry = None) -> Metrics:
+    """Starts recording: puts timers around the text menus and the fid table the first
+    time it's called, and around the calculators of a registry every time.
+
+    Args:
+        registry (Registry, optional): A registry whose calculators are timed.
+            Defaults to None.
+
+    Returns:
+        Metrics: The metrics being recorded, the same every time.
+    """
+    global _installed
+    if _installed is None:
+        import general
+        import utilities
+
+        _installed = Metrics()
+        utilities.select_from_list = _installed._timed(utilities.select_from_list, _installed.menu_seconds)
+        build_table = general.FidLengthTable.build_table
+        general.FidLengthTable.build_table = _installed._timed(build_table, _installed.render_seconds, "fid_length")
+
+    if registry is not None:
+        registry.set_metrics(_installed)
+    return _installed
+
+
+def install_dialogs(metrics: Metrics):
+    """Times every dialog, from being asked for to being answered, and how long each
+    one takes to appear. Kept apart from install() so that batch mode never imports
+    prompt_toolkit."""
+    import screen
+
+    if not getattr(screen.Form.run, "timed", False):
+        screen.Form.run = metrics._timed(screen.Form.run, metrics.prompt_seconds, "dialog")
+        screen.Form.run.timed = True
+    screen.shared().on_swap = metrics.swap_seconds.observe
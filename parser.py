@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Reads the lengths people actually type: decimals ('0.625'), fractions ('5/8'), mixed
+numbers ('1-5/8', '1+5/8' or '1 5/8', as in the fid table and most order sheets), with
+or without a unit ('5/8"', '2 ft', '16mm'), and the 'd' that switches a radius prompt
+to a diameter ('d', 'd=2' or 'D 1-1/2').
+
+Everything goes through one regular expression, compiled when the module is loaded.
+Plain decimals are handed straight to float(), which is faster still, and the results
+for the last few thousand strings are memoized, because the same few sizes come up
+over and over. parse_column() reads a whole column of values, parsing each distinct
+string once. Numbers that aren't finite are rejected, whether they're typed or passed
+in, as are the other things float() accepts, like '1e3', 'inf' or '1_000'.
+
+Every length comes back in inches, the unit the calculations work in. A value without
+a unit is taken to be in the unit passed in, inches unless told otherwise. Counts, like
+the number of tucks, are read by parse_count(), which only takes whole numbers without
+a unit.
+
+Like core.py, this module only uses the standard library.
+"""
+from __future__ import annotations
+import re
+from fractions import Fraction
+from functools import lru_cache
+from math import isfinite
+from typing import Iterable
+from length import UNITS
+
+# How many distinct strings the expression's results are kept for
+MEMO_SIZE = 4096
+
+# Everything a unit can be written as, and the unit in length.UNITS it means
+UNIT_NAMES = {
+    '"': "in",
+    "''": "in",
+    "in": "in",
+    "inch": "in",
+    "inches": "in",
+    "'": "ft",
+    "ft": "ft",
+    "foot": "ft",
+    "feet": "ft",
+    "mm": "mm",
+    "cm": "cm",
+    "m": "m",
+}
+
+# A plain decimal, as TOKEN reads it, for handing straight to float()
+DECIMAL = re.compile(r"\s*[-+]?(?:\d+(?:\.\d*)?|\.\d+)\s*")
+
+# A whole number, as parse_count() reads it
+INTEGER = re.compile(r"\s*[-+]?\d+\s*")
+
+# Inches in each unit, exactly
+INCHES = {name: Fraction(UNITS[unit], UNITS["in"]) for name, unit in UNIT_NAMES.items()}
+
+TOKEN = re.compile(
+    r"""
+    \s*
+    (?P<diameter>d\s*=?)?\s*
+    (?:
+        (?P<sign>[-+]?)
+        (?:
+            # A whole number or decimal, maybe followed by a fraction: 1-5/8, 1 5/8
+            (?P<whole>\d+(?:\.\d*)?|\.\d+)
+            (?:(?:\s*[-+]\s*|\s+)(?P<numerator>\d+)\s*/\s*(?P<denominator>\d+))?
+        |
+            # Just a fraction: 5/8
+            (?P<fraction>\d+)\s*/\s*(?P<over>\d+)
+        )
+        \s*(?P<unit>"|''|'|inch(?:es)?|in|ft|foot|feet|mm|cm|m)?
+    )?
+    \s*
+    """,
+    re.VERBOSE | re.IGNORECASE,
+)
+
+
+def parse_measurement(text: str, unit: str = "in") -> tuple[float | None, bool]:
+    """Reads a radius or diameter, as asked for by the radius prompts.
+
+    Args:
+        text (str): What was typed, eg. '1-1/2', 'd' or 'd=3'.
+        unit (str, optional): The unit of a value without one. Defaults to "in".
+
+    Raises:
+        ValueError: If the text isn't a length.
+        TypeError: If it isn't a string or a number, eg. None from a cancelled dialog.
+
+    Returns:
+        tuple[float | None, bool]: (value, diameter) The value in inches, or None for a
+            bare 'd', and whether it's a diameter.
+    """
+    if _is_number(text):
+        return float(_finite(text)) * float(_inches(unit)), False
+    value, diameter = _parse(_text(text), unit)
+    return None if value is None else float(value), diameter
+
+
+def parse_length(text: str | float, unit: str = "in") -> float:
+    """Reads a length, in any of the forms in the module docstring except the 'd'.
+
+    Args:
+        text (str | float): What was typed. Numbers are returned as floats.
+        unit (str, optional): The unit of a value without one. Defaults to "in".
+
+    Raises:
+        ValueError: If the text isn't a length.
+        TypeError: If it isn't a string or a number, eg. None from a cancelled dialog.
+
+    Returns:
+        float: The length in inches.
+    """
+    if isinstance(text, str):
+        return _length(text, unit)
+    if _is_number(text):
+        text = float(_finite(text))
+        return text if unit == "in" else text * float(_inches(unit))
+    return float(parse_exact(text, unit))
+
+
+def parse_exact(text: str | float | Fraction, unit: str = "in") -> Fraction:
+    """Reads a length exactly, like parse_length().
+
+    Returns:
+        Fraction: The length in inches.
+    """
+    if isinstance(text, Fraction) or _is_number(text):
+        return Fraction(_finite(text)) * _inches(unit)
+    value, diameter = _parse(_text(text), unit)
+    if value is None or diameter:
+        raise ValueError(f"'{text}' is not a length")
+    return value
+
+
+def parse_count(text: str | int) -> int:
+    """Reads a count, eg. the number of tucks: a whole number, without a unit.
+
+    Args:
+        text (str | int): What was typed. Numbers have to be whole.
+
+    Raises:
+        ValueError: If the text isn't a whole number.
+        TypeError: If it isn't a string or a number.
+
+    Returns:
+        int: The count.
+    """
+    if _is_number(text):
+        if isinstance(text, float) and not text.is_integer():
+            raise ValueError(f"'{text}' is not a whole number")
+        return int(text)
+    if INTEGER.fullmatch(_text(text)) is None:
+        raise ValueError(f"'{text}' is not a whole number")
+    return int(text)
+
+
+def parse_column(values: Iterable[str | float], unit: str = "in") -> list[float]:
+    """Reads a column of lengths, parsing each distinct value only once.
+
+    Args:
+        values (Iterable[str | float]): The values, eg. one column of an order file.
+        unit (str, optional): The unit of values without one. Defaults to "in".
+
+    Raises:
+        ValueError: If any of them isn't a length.
+        TypeError: If any of them isn't a string or a number.
+
+    Returns:
+        list[float]: The lengths in inches, in the same order.
+    """
+    values = values if isinstance(values, list) else list(values)
+    parsed = {v: parse_length(v, unit) for v in dict.fromkeys(values)}
+    return list(map(parsed.__getitem__, values))
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _finite(value: int | float | Fraction) -> int | float | Fraction:
+    if isinstance(value, float) and not isfinite(value):
+        raise ValueError(f"'{value}' is not a length")
+    return value
+
+
+def _text(text: str) -> str:
+    if isinstance(text, str):
+        return text
+    raise TypeError(f"expected a length, not {type(text).__name__}")
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _length(text: str, unit: str) -> float:
+    if DECIMAL.fullmatch(text):
+        value = float(text)
+        return value if unit == "in" else value * float(_inches(unit))
+    return float(parse_exact(text, unit))
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _parse(text: str, unit: str) -> tuple[Fraction | None, bool]:
+    match = TOKEN.fullmatch(text)
+    if match is None:
+        raise ValueError(f"'{text}' is not a length")
+    diameter = match["diameter"] is not None
+    if match["whole"] is not None:
+        value = Fraction(match["whole"])
+        if match["numerator"] is not None:
+            value += _fraction(match["numerator"], match["denominator"], text)
+    elif match["fraction"] is not None:
+        value = _fraction(match["fraction"], match["over"], text)
+    elif diameter:
+        # A bare 'd', the diameter comes next
+        return None, True
+    else:
+        raise ValueError(f"'{text}' is not a length")
+
+    if match["sign"] == "-":
+        value = -value
+    return value * _inches(match["unit"].lower() if match["unit"] else unit), diameter
+
+
+def _inches(unit: str) -> Fraction:
+    try:
+        return INCHES[unit]
+    except KeyError:
+        raise ValueError(f"Unknown unit '{unit}', use one of {', '.join(UNITS)}") from None
+
+
+def _fraction(numerator: str, denominator: str, text: str) -> Fraction:
+    if int(denominator) == 0:
+        raise ValueError(f"'{text}' divides by zero")
+    return Fraction(int(numerator), int(denominator))
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""Registry of every calculation the tool knows about, so that the menus, batch mode
+and anything else can find a calculator by its name, one of its aliases, or its rope
+type without keeping their own lists.
+
+Calculators are found by scanning the modules in MODULES for classes with a 'name' and
+a 'rope_type', and through the 'rope_tools.calculations' entry point group, so that
+calculations can be added from other packages. A calculator is only constructed the
+first time it is actually used.
+
+Aliases are short names shared between rope types, eg. 'eye' is the twisted eye splice
+for twisted rope and the locked brummel for hollow braid, so they are looked up
+together with a rope type. An alias can also be used on its own if only one
+calculation has it.
+"""
+from __future__ import annotations
+from functools import cache
+from importlib import import_module
+from typing import TYPE_CHECKING, Iterator
+from core import RopeType
+
+if TYPE_CHECKING:
+    from prompt_toolkit import PromptSession
+    from memo import Memo
+    from metrics import Metrics
+    from prompt_toolkit.styles import Style
+    from ropespec import SpecDatabase
+
+ENTRY_POINT_GROUP = "rope_tools.calculations"
+
+# Modules scanned for calculations, in the order they appear in the menus
+MODULES = ("general", "eye_splice", "back_splice", "chain_splice", "grog_sling")
+
+
+class Registry:
+    def __init__(
+        self,
+        session: PromptSession = None,
+        style: Style = None,
+        lang: str = "en",
+        modules: tuple[str] = MODULES,
+        group: str = ENTRY_POINT_GROUP
+    ):
+        """Finds the available calculations and indexes them by name, alias and rope
+        type.
+
+        Args:
+            session (PromptSession, optional): Passed to calculators when they are
+                constructed. Defaults to None.
+            style (Style, optional): Passed to calculators when they are constructed.
+                Defaults to None.
+            lang (str, optional): Language specifer for translations. Defaults to "en".
+            modules (tuple[str], optional): Modules to scan for calculations. Defaults
+                to MODULES.
+            group (str, optional): Entry point group to load calculations from, or
+                None to skip entry points. Defaults to ENTRY_POINT_GROUP.
+        """
+        self.session = session
+        self.style = style
+        self.lang = lang
+
+        self._by_name: dict[str, type] = {}
+        self._by_alias: dict[tuple[RopeType, str], type] = {}
+        # Aliases that belong to exactly one calculation, and can be used on their own
+        self._unique_alias: dict[str, type] = {}
+        self._ambiguous_alias: dict[str, list[type]] = {}
+        self._by_rope_type: dict[RopeType, list[type]] = {rt: [] for rt in RopeType}
+        self._instances: dict[type, object] = {}
+        # Put in front of every calculator when set, see set_memo(), set_metrics() and
+        # set_specs()
+        self.memo: Memo = None
+        self.metrics: Metrics = None
+        self.specs: SpecDatabase = None
+
+        for module_name in modules:
+            module = import_module(module_name)
+            for obj in vars(module).values():
+                if isinstance(obj, type) and obj.__module__ == module.__name__ and is_calculation(obj):
+                    self.register(obj)
+
+        if group is not None:
+            # importlib.metadata is slow to import, so only load it when it's used
+            from importlib.metadata import entry_points
+
+            for entry_point in entry_points(group=group):
+                self.register(entry_point.load())
+
+    def register(self, calculation: type):
+        """Adds a calculation to the registry.
+
+        Args:
+            calculation (type): The calculation class. It needs 'name' and 'rope_type'
+                attributes, and can have 'aliases'.
+
+        Raises:
+            ValueError: If the class isn't a calculation, or the name or one of the
+                aliases is already taken for the same rope type.
+        """
+        if not is_calculation(calculation):
+            raise ValueError(f"{calculation!r} needs 'name' and 'rope_type' attributes to be a calculation")
+        if calculation.name in self._by_name:
+            raise ValueError(f"A calculation named '{calculation.name}' is already registered")
+
+        keys = [(calculation.rope_type, a) for a in dict.fromkeys((calculation.name, *getattr(calculation, "aliases", ())))]
+        for key in keys:
+            if key in self._by_alias:
+                raise ValueError(f"'{key[1]}' is already used by {self._by_alias[key].name} for {key[0]}")
+
+        self._by_name[calculation.name] = calculation
+        self._by_rope_type[calculation.rope_type].append(calculation)
+        for key in keys:
+            self._by_alias[key] = calculation
+            alias = key[1]
+            if alias in self._ambiguous_alias:
+                self._ambiguous_alias[alias].append(calculation)
+            elif alias in self._unique_alias:
+                self._ambiguous_alias[alias] = [self._unique_alias.pop(alias), calculation]
+            else:
+                self._unique_alias[alias] = calculation
+
+    def get(self, name: str, rope_type: RopeType = None) -> type:
+        """Looks up a calculation class.
+
+        Args:
+            name (str): The name or an alias of the calculation.
+            rope_type (RopeType, optional): The rope type, needed when an alias is
+                shared between rope types. Defaults to None.
+
+        Raises:
+            LookupError: If there is no matching calculation, or the alias is shared
+                and no rope type was given.
+
+        Returns:
+            type: The calculation class.
+        """
+        if rope_type is not None:
+            if (rope_type, name) in self._by_alias:
+                return self._by_alias[(rope_type, name)]
+            raise LookupError(f"No calculation called '{name}' for {rope_type} rope")
+        if name in self._by_name:
+            return self._by_name[name]
+        if name in self._unique_alias:
+            return self._unique_alias[name]
+        if name in self._ambiguous_alias:
+            options = ", ".join(c.name for c in self._ambiguous_alias[name])
+            raise LookupError(f"'{name}' could mean any of {options}; give a rope type")
+        raise LookupError(f"No calculation called '{name}'")
+
+    def build(self, name: str, rope_type: RopeType = None) -> object:
+        """Gets the calculator for a calculation, constructing it the first time it is
+        needed.
+
+        Args:
+            name (str): The name or an alias of the calculation.
+            rope_type (RopeType, optional): The rope type, needed when an alias is
+                shared between rope types. Defaults to None.
+
+        Raises:
+            LookupError: If there is no matching calculation.
+
+        Returns:
+            object: The calculator.
+        """
+        return self.instance(self.get(name, rope_type))
+
+    def instance(self, calculation: type) -> object:
+        """Gets the calculator for a registered calculation class, constructing it the
+        first time it is needed.
+
+        Args:
+            calculation (type): The calculation class.
+
+        Returns:
+            object: The calculator.
+        """
+        if calculation not in self._instances:
+            self._instances[calculation] = self._wrap(calculation(self.session, self.style, self.lang))
+        return self._instances[calculation]
+
+    def set_memo(self, memo: Memo = None):
+        """Puts a cache of results in front of every calculator, including the ones
+        that haven't been constructed yet.
+
+        Args:
+            memo (Memo, optional): The cache, or None to stop caching. Defaults to
+                None.
+        """
+        self.memo = memo
+        for calculator in self._instances.values():
+            self._wrap(calculator)
+
+    def set_metrics(self, metrics: Metrics = None):
+        """Times every calculator, including the ones that haven't been constructed
+        yet.
+
+        Args:
+            metrics (Metrics, optional): Where to record the times, or None to stop
+                recording. Defaults to None.
+        """
+        self.metrics = metrics
+        for calculator in self._instances.values():
+            self._wrap(calculator)
+
+    def set_specs(self, specs: SpecDatabase = None):
+        """Runs every calculator with the spec for the job's rope, including the ones
+        that haven't been constructed yet.
+
+        Args:
+            specs (SpecDatabase, optional): The rope specs, or None to use the default
+                multipliers. Defaults to None.
+        """
+        self.specs = specs
+        for calculator in self._instances.values():
+            self._wrap(calculator)
+
+    def _wrap(self, calculator: object) -> object:
+        """Puts the specs, the cache and the timers in front of a calculator,
+        replacing any that were there before."""
+        for method in ("calculate", "text", "dialog"):
+            # Back to the class's own methods
+            vars(calculator).pop(method, None)
+        if self.memo is not None:
+            self.memo.wrap(calculator)
+        if self.specs is not None:
+            # Outside the cache, so that it looks up the nominal diameter as it was
+            # given, and the cache is keyed on the spec's actual diameter (kept exactly,
+            # see memo.py) and multipliers
+            self.specs.wrap(calculator)
+        if self.metrics is not None:
+            # Outside the cache, so that the times include the hits
+            self.metrics.wrap(calculator)
+        return calculator
+
+    def for_rope_type(self, rope_type: RopeType) -> list[type]:
+        """Lists the calculations for a rope type, in menu order.
+
+        Args:
+            rope_type (RopeType): The rope type.
+
+        Returns:
+            list[type]: The calculation classes.
+        """
+        return self._by_rope_type[rope_type]
+
+    def names(self) -> list[str]:
+        """Lists the names of every registered calculation."""
+        return list(self._by_name)
+
+    def aliases(self) -> dict[tuple[RopeType, str], type]:
+        """Gets every (rope type, name or alias) key and the calculation it leads to."""
+        return dict(self._by_alias)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name or name in self._unique_alias
+
+    def __iter__(self) -> Iterator[type]:
+        return iter(self._by_name.values())
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+
+def is_calculation(obj: type) -> bool:
+    """Checks whether a class looks like a calculation.
+
+    Args:
+        obj (type): The class to check.
+
+    Returns:
+        bool: True if it has a 'name' and a RopeType 'rope_type'.
+    """
+    return isinstance(getattr(obj, "name", None), str) and isinstance(getattr(obj, "rope_type", None), RopeType)
+
+
+@cache
+def default() -> Registry:
+    """Gets the shared registry for code that only needs the calculations, not the
+    user interface (batch mode, the service, etc). Its calculators have no session or
+    style.
+
+    Returns:
+        Registry: The registry.
+    """
+    return Registry()
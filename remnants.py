@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""Inventory of remnants, the pieces left over after cutting, so that a job can be cut
+from the shortest piece that's still long enough instead of from a new spool.
+
+Pieces are filed by rope type and rope diameter, and each bin keeps its lengths in
+sorted order. A bin is a list of short sorted lists (like the 'sortedcontainers'
+package does it), so finding the best fit for a job, adding a piece and taking one out
+are a bisect over the short lists' largest values and then one inside a short list,
+and stay quick with hundreds of thousands of pieces in stock.
+
+Lengths and diameters are kept as whole nanometres (see length.py), so a diameter of
+5/8" and one of 0.625" are the same bin and lengths compare exactly. The inventory can
+be kept in an SQLite file: it's read in when opened, and changes are written in
+batches, like memo.Store does.
+
+Usage:
+  remnants.py add <rope_type> <rope_diameter> <length>... [--inventory=<path>]
+  remnants.py cut [--inventory=<path>] [--kerf=<length>] [--keep=<length>] [--format=<format>] [--dry-run]
+  remnants.py list [--inventory=<path>]
+  remnants.py --help
+
+Commands:
+  add       Put pieces of rope into the inventory.
+  cut       Read jobs from stdin (in the batch mode formats) and cut each one from
+            the shortest piece it fits in, putting what's left back.
+  list      Show how many pieces of each rope type and diameter there are.
+
+Options:
+  --inventory=<path>    The inventory file. [default: remnants.sqlite]
+  --kerf=<length>       Rope lost to each cut. [default: 0]
+  --keep=<length>       Shortest piece worth putting back. [default: 6]
+  --format=<format>     Input format, 'jsonl' or 'csv'. Detected if not given.
+  --dry-run             Show which pieces would be used, without cutting them.
+  -h --help             Show this message.
+"""
+from __future__ import annotations
+import atexit
+import sqlite3
+import sys
+from bisect import bisect_left, insort
+from typing import Iterable, Iterator, NamedTuple
+from core import RopeType
+from length import UNITS, Rounding, to_nanometres
+import headless
+import parser
+import utilities
+
+# Short lists are split when they get twice this long
+LOAD = 512
+
+# Changes are written to the file in batches of this many
+FLUSH_EVERY = 256
+
+# Remnants shorter than this aren't worth keeping, in inches
+KEEP = 6
+
+INVENTORY_FILE = "remnants.sqlite"
+
+NM_PER_INCH = UNITS["in"]
+
+
+class Piece(NamedTuple):
+    id: int
+    rope_type: RopeType
+    rope_diameter: float
+    length: float
+
+    def __str__(self):
+        return f"#{self.id} ({utilities.as_mixed_number(self.length)})"
+
+
+class SortedPieces:
+    def __init__(self, pieces: Iterable[tuple[int, int]] = ()):
+        """The pieces in one bin, as (length, id) pairs in sorted order.
+
+        Args:
+            pieces (Iterable[tuple[int, int]], optional): Pieces to start with, in
+                any order. Defaults to ().
+        """
+        pieces = sorted(pieces)
+        self._lists = [pieces[i:i + LOAD] for i in range(0, len(pieces), LOAD)]
+        self._maxes = [p[-1] for p in self._lists]
+        self._len = len(pieces)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        return (piece for pieces in self._lists for piece in pieces)
+
+    def add(self, piece: tuple[int, int]):
+        lists, maxes = self._lists, self._maxes
+        if not maxes:
+            lists.append([piece])
+            maxes.append(piece)
+        else:
+            i = bisect_left(maxes, piece)
+            if i == len(maxes):
+                # Longer than anything there, so it goes on the end
+                i -= 1
+                lists[i].append(piece)
+                maxes[i] = piece
+            else:
+                insort(lists[i], piece)
+            if len(lists[i]) > 2 * LOAD:
+                half = lists[i][LOAD:]
+                del lists[i][LOAD:]
+                lists.insert(i + 1, half)
+                maxes[i] = lists[i][-1]
+                maxes.insert(i + 1, half[-1])
+        self._len += 1
+
+    def remove(self, piece: tuple[int, int]):
+        """Takes a piece out.
+
+        Raises:
+            KeyError: If it isn't there.
+        """
+        lists, maxes = self._lists, self._maxes
+        i = bisect_left(maxes, piece)
+        if i < len(maxes):
+            j = bisect_left(lists[i], piece)
+            if lists[i][j] == piece:
+                del lists[i][j]
+                if lists[i]:
+                    maxes[i] = lists[i][-1]
+                else:
+                    del lists[i], maxes[i]
+                self._len -= 1
+                return
+        raise KeyError(piece)
+
+    def ceiling(self, length: int) -> tuple[int, int] | None:
+        """Finds the shortest piece at least 'length' long, or None."""
+        # Ids are positive, so this comes before every piece of exactly that length
+        key = (length, 0)
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return None
+        pieces = self._lists[i]
+        return pieces[bisect_left(pieces, key)]
+
+
+class Inventory:
+    def __init__(self, path: str = None, keep: float = KEEP):
+        """Remnants on hand, see the module docstring.
+
+        Args:
+            path (str, optional): SQLite file to keep the inventory in, created if it
+                doesn't exist, or None to keep it in memory only. Defaults to None.
+            keep (float, optional): Shortest offcut cut() puts back, in inches.
+                Defaults to KEEP.
+        """
+        self.path = path
+        self.keep = to_nanometres(keep)
+        # (rope type, rope diameter in nm): pieces
+        self.bins: dict[tuple[RopeType, int], SortedPieces] = {}
+        self._next_id = 1
+        self._connection: sqlite3.Connection = None
+        self._pending: list[tuple[str, tuple]] = []
+        # Bins still shared with the inventory this is a scratch copy of, see scratch()
+        self._shared: set[tuple[RopeType, int]] = set()
+        if path is not None:
+            self._open(path)
+
+    def _open(self, path: str):
+        self._connection = sqlite3.connect(path, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS pieces ("
+            "id INTEGER PRIMARY KEY, rope_type TEXT NOT NULL, rope_diameter INTEGER NOT NULL, "
+            "length INTEGER NOT NULL)"
+        )
+        rows: dict[tuple[RopeType, int], list[tuple[int, int]]] = {}
+        for id, rope_type, rope_diameter, length in self._connection.execute("SELECT * FROM pieces"):
+            rows.setdefault((RopeType[rope_type], rope_diameter), []).append((length, id))
+            self._next_id = max(self._next_id, id + 1)
+        self.bins = {key: SortedPieces(pieces) for key, pieces in rows.items()}
+        atexit.register(self.flush)
+
+    def _write(self, statement: str, values: tuple):
+        if self._connection is not None:
+            self._pending.append((statement, values))
+            if len(self._pending) >= FLUSH_EVERY:
+                self.flush()
+
+    def flush(self):
+        """Writes any changes that haven't been written yet."""
+        if not self._pending or self._connection is None:
+            return
+        with self._connection:
+            self._connection.execute("BEGIN")
+            for statement, values in self._pending:
+                self._connection.execute(statement, values)
+        self._pending.clear()
+
+    def close(self):
+        """Writes anything pending and closes the file."""
+        self.flush()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self) -> Inventory:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(len(pieces) for pieces in self.bins.values())
+
+    def scratch(self) -> Inventory:
+        """Makes a copy of the inventory to try cuts on, kept in memory only. Each bin
+        is copied the first time the copy changes it, so nothing done to the copy
+        touches this inventory or its file.
+
+        Returns:
+            Inventory: The copy.
+        """
+        copy = Inventory()
+        copy.keep = self.keep
+        copy.bins = dict(self.bins)
+        copy._next_id = self._next_id
+        copy._shared = set(self.bins)
+        return copy
+
+    def _bin(self, key: tuple[RopeType, int]) -> SortedPieces:
+        if key in self._shared:
+            self._shared.discard(key)
+            self.bins[key] = SortedPieces(self.bins[key])
+        elif key not in self.bins:
+            self.bins[key] = SortedPieces()
+        return self.bins[key]
+
+    def _piece(self, key: tuple[RopeType, int], entry: tuple[int, int]) -> Piece:
+        return Piece(entry[1], key[0], key[1] / NM_PER_INCH, entry[0] / NM_PER_INCH)
+
+    def add(self, rope_type: RopeType, rope_diameter: float, length: float) -> Piece:
+        """Puts a piece of rope into the inventory.
+
+        Args:
+            rope_type (RopeType): The rope type.
+            rope_diameter (float): The rope diameter, in inches.
+            length (float): The length of the piece, in inches.
+
+        Returns:
+            Piece: The piece, with its new id.
+        """
+        key = (rope_type, to_nanometres(rope_diameter))
+        entry = (to_nanometres(length), self._next_id)
+        self._next_id += 1
+        self._bin(key).add(entry)
+        self._write("INSERT INTO pieces VALUES (?, ?, ?, ?)", (entry[1], rope_type.name, key[1], entry[0]))
+        return self._piece(key, entry)
+
+    def remove(self, piece: Piece):
+        """Takes a piece out of the inventory.
+
+        Raises:
+            KeyError: If it isn't there.
+        """
+        key = (piece.rope_type, to_nanometres(piece.rope_diameter))
+        if key not in self.bins:
+            raise KeyError(piece)
+        self._bin(key).remove((to_nanometres(piece.length), piece.id))
+        self._write("DELETE FROM pieces WHERE id = ?", (piece.id,))
+
+    def best_fit(self, rope_type: RopeType, rope_diameter: float, length: float) -> Piece | None:
+        """Finds the shortest piece of a rope that's at least 'length' long.
+
+        Args:
+            rope_type (RopeType): The rope type.
+            rope_diameter (float): The rope diameter, in inches.
+            length (float): The length needed, in inches.
+
+        Returns:
+            Piece | None: The piece, or None if nothing is long enough.
+        """
+        key = (rope_type, to_nanometres(rope_diameter))
+        pieces = self.bins.get(key)
+        if pieces is None:
+            return None
+        # Rounded up, so the piece is never short by a fraction of a nanometre
+        entry = pieces.ceiling(Rounding.UP.apply(length * NM_PER_INCH))
+        return None if entry is None else self._piece(key, entry)
+
+    def pieces(self, rope_type: RopeType, rope_diameter: float) -> list[Piece]:
+        """Lists the pieces of a rope, shortest first."""
+        key = (rope_type, to_nanometres(rope_diameter))
+        return [self._piece(key, entry) for entry in self.bins.get(key, ())]
+
+    def match(self, job: dict) -> tuple[Piece | None, float]:
+        """Finds the piece to cut a job from, without cutting it.
+
+        Args:
+            job (dict): The job, in the form batch mode reads.
+
+        Raises:
+            headless.JobError: If the job can't be calculated, or doesn't need a piece
+                of rope.
+
+        Returns:
+            tuple[Piece | None, float]: The shortest piece long enough, or None, and
+                the length the job needs.
+        """
+        calculation, length, rope_diameter = required_length(job)
+        return self.best_fit(calculation.rope_type, rope_diameter, length), length
+
+    def cut(self, job: dict, kerf: float = 0) -> tuple[Piece | None, float, Piece | None]:
+        """Cuts a job from the shortest piece it fits in, and puts the rest back if
+        it's at least 'keep' long.
+
+        Args:
+            job (dict): The job, in the form batch mode reads.
+            kerf (float, optional): Rope lost to the cut, in inches. Defaults to 0.
+
+        Raises:
+            headless.JobError: See match().
+
+        Returns:
+            tuple[Piece | None, float, Piece | None]: (piece, length, offcut) The piece
+                that was cut, or None if nothing was long enough, the length the job
+                needs, and the offcut that was put back, if any.
+        """
+        calculation, length, rope_diameter = required_length(job)
+        piece = self.best_fit(calculation.rope_type, rope_diameter, length + kerf)
+        if piece is None:
+            return None, length, None
+        self.remove(piece)
+        rest = piece.length - length - kerf
+        offcut = None
+        if to_nanometres(rest) >= self.keep:
+            offcut = self.add(piece.rope_type, piece.rope_diameter, rest)
+        return piece, length, offcut
+
+
+def required_length(job: dict) -> tuple[type, float, float]:
+    """Works out how much rope a job needs, with its calculator.
+
+    Args:
+        job (dict): The job, in the form batch mode reads.
+
+    Raises:
+        headless.JobError: If the job can't be calculated, or doesn't need a piece of
+            rope.
+
+    Returns:
+        tuple[type, float, float]: The calculation class, the length needed and the
+            rope diameter, in inches.
+    """
+    calculation, results = headless.run_job(job)
+    if not hasattr(calculation, "cut_length"):
+        raise headless.JobError(f"'{calculation.name}' doesn't need a piece of rope")
+    length = results[calculation.results.index(calculation.cut_length)]
+    rope_diameter = headless.job_arguments(calculation, job)[calculation.parameters.index("rope_diameter")]
+    return calculation, length, rope_diameter
+
+
+def cut_jobs(inventory: Inventory, jobs: Iterable[dict], kerf: float = 0, dry_run: bool = False) -> int:
+    """Cuts jobs from the inventory, printing a line for each one. A dry run makes
+    the same cuts on a scratch copy of the inventory (see Inventory.scratch), so later
+    jobs see the pieces and offcuts the earlier ones would leave.
+
+    Returns:
+        int: 0 if every job was cut, 1 if any weren't.
+    """
+    if dry_run:
+        inventory = inventory.scratch()
+    status = 0
+    for line_number, job in enumerate(jobs, 1):
+        try:
+            if isinstance(job, headless.JobError):
+                raise job
+            piece, length, offcut = inventory.cut(job, kerf)
+        except (ArithmeticError, ValueError, TypeError) as e:
+            # One bad job (eg. an eye too small for the rope) only fails its own line
+            error = str(e) if isinstance(e, headless.JobError) else f"calculation failed ({e})"
+            print(f"line {line_number}: {error}", file=sys.stderr)
+            status = 1
+            continue
+        needed = utilities.as_mixed_number(length)
+        if piece is None:
+            print(f"  job {line_number}: {needed}, no remnant long enough")
+            status = 1
+        else:
+            left = f", {offcut} back in stock" if offcut is not None else ""
+            print(f"  job {line_number}: {needed} from {piece}{left}")
+    return status
+
+
+def main(arguments: dict) -> int:
+    """Runs one of the commands in the usage.
+
+    Returns:
+        int: The exit status.
+    """
+    try:
+        with Inventory(arguments["--inventory"], parser.parse_length(arguments["--keep"])) as inventory:
+            if arguments["add"]:
+                rope_type = RopeType[arguments["<rope_type>"].strip().upper().replace(" ", "_")]
+                rope_diameter = parser.parse_length(arguments["<rope_diameter>"])
+                for length in arguments["<length>"]:
+                    print(inventory.add(rope_type, rope_diameter, parser.parse_length(length)))
+                return 0
+            if arguments["cut"]:
+                jobs, _ = headless.open_jobs(sys.stdin, arguments["--format"])
+                return cut_jobs(inventory, jobs, parser.parse_length(arguments["--kerf"]), arguments["--dry-run"])
+            for (rope_type, rope_diameter), pieces in sorted(inventory.bins.items(), key=lambda b: (b[0][0].value, b[0][1])):
+                if pieces:
+                    diameter = utilities.as_mixed_number(rope_diameter / NM_PER_INCH)
+                    total = utilities.as_mixed_number(sum(length for length, _ in pieces) / NM_PER_INCH)
+                    print(f"{rope_type} {diameter}\": {len(pieces)} pieces, {total} in all")
+            return 0
+    except KeyError as e:
+        print(f"Error: unknown rope type {e}", file=sys.stderr)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+
+    sys.exit(main(docopt(__doc__)))
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Command line mode: a whole calculation on one line, eg.
+
+    > eye twisted 5/8 d=2 tucks=5
+
+is the twisted eye splice for 5/8" rope with a 2" eye diameter and 5 tucks. The line is
+the calculation (its name, an alias or the start of either), the rope type if the name
+is shared between rope types, then the measurements. Measurements without a name go to
+the rope diameter first and then the calculation's other parameters in order, and
+named ones take the same names as batch mode ('radius' or 'r', 'diameter' or 'd',
+'tucks' or 't', or the calculator's own parameter names).
+
+Names are looked up in prefix tries, which also drive tab completion. Past lines are
+kept in a history file, so the up arrow brings back a job to repeat or edit.
+"""
+from __future__ import annotations
+import os
+from typing import TYPE_CHECKING, Iterable, Iterator
+from core import RopeType
+import headless
+import registry
+import translate as tr
+import utilities
+
+if TYPE_CHECKING:
+    from prompt_toolkit import PromptSession
+
+HISTORY_FILE = os.path.join(os.path.expanduser("~"), ".rope_tools_history")
+
+# Short names for the measurements, on top of the ones batch mode takes
+KEYWORDS = {
+    "d": "diameter",
+    "r": "radius",
+    "t": "tucks",
+}
+
+HELP_COMMANDS = ("help", "?")
+QUIT_COMMANDS = ("quit", "exit", "q")
+
+
+class CommandError(ValueError):
+    """Raised when a line can't be turned into a calculation."""
+
+
+class Trie:
+    __slots__ = ("children", "values", "keys")
+
+    def __init__(self):
+        """A prefix tree of strings. Every node keeps the keys below it, so finding
+        every key that starts with a prefix only costs a walk down the prefix."""
+        self.children: dict[str, Trie] = {}
+        # Values stored under the key that ends at this node
+        self.values: list = []
+        # Every key that goes through this node, in the order they were added
+        self.keys: list[str] = []
+
+    def add(self, key: str, value):
+        node = self
+        node.keys.append(key)
+        for character in key:
+            node = node.children.setdefault(character, Trie())
+            if not node.keys or node.keys[-1] != key:
+                node.keys.append(key)
+        node.values.append(value)
+
+    def _node(self, prefix: str) -> Trie | None:
+        node = self
+        for character in prefix:
+            node = node.children.get(character)
+            if node is None:
+                return None
+        return node
+
+    def complete(self, prefix: str) -> list[str]:
+        """Lists every key that starts with 'prefix'."""
+        node = self._node(prefix)
+        return list(dict.fromkeys(node.keys)) if node else []
+
+    def find(self, prefix: str) -> list:
+        """Gets the values for a key, or if there's no such key, every value under
+        a key that starts with 'prefix'."""
+        node = self._node(prefix)
+        if node is None:
+            return []
+        if node.values:
+            return list(node.values)
+        values = []
+        for key in node.keys:
+            values.extend(v for v in self._node(key).values if v not in values)
+        return values
+
+
+class Commands:
+    def __init__(self, calculations: registry.Registry, lang: str = "en"):
+        """Turns lines into calculations and runs them.
+
+        Args:
+            calculations (registry.Registry): Where the calculations come from.
+            lang (str, optional): Language specifer for translations. Defaults to "en".
+        """
+        self.calculations = calculations
+        self.msg = tr.catalog(lang)
+
+        self.names = Trie()
+        for (rope_type, alias), calculation in calculations.aliases().items():
+            self.names.add(alias, calculation)
+        self.rope_types = Trie()
+        for rope_type in RopeType:
+            self.rope_types.add(rope_type.name.lower(), rope_type)
+
+    def parse(self, line: str) -> tuple[type, list]:
+        """Reads a calculation and its arguments from a line.
+
+        Args:
+            line (str): The line, eg. 'eye twisted 5/8 d=2 tucks=5'.
+
+        Raises:
+            CommandError: If the line isn't a calculation the registry has, or its
+                measurements don't fit.
+
+        Returns:
+            tuple[type, list]: The calculation class and the arguments for its
+                calculate() method, or None for calculations without any.
+        """
+        name, *tokens = line.lower().split()
+        candidates = self.names.find(name)
+        if not candidates:
+            raise CommandError(self.msg.repl_unknown_calculation.format(name=name))
+
+        if tokens and "=" not in tokens[0]:
+            rope_types = self.rope_types.find(tokens[0])
+            if len(rope_types) == 1:
+                candidates = [c for c in candidates if c.rope_type is rope_types[0]]
+                if not candidates:
+                    raise CommandError(self.msg.repl_unknown_calculation.format(name=f"{name} {tokens[0]}"))
+                tokens.pop(0)
+        if len(candidates) > 1:
+            options = ", ".join(f"{c.name} ({c.rope_type.name.lower()})" for c in candidates)
+            raise CommandError(self.msg.repl_ambiguous_calculation.format(name=name, options=options))
+        calculation = candidates[0]
+
+        if not hasattr(calculation, "parameters"):
+            return calculation, None
+        job = self._job(calculation, tokens)
+        try:
+            return calculation, headless.job_arguments(calculation, job)
+        except headless.JobError as e:
+            raise CommandError(f"{calculation.name}: {e}") from None
+
+    def _job(self, calculation: type, tokens: list[str]) -> dict:
+        """Sorts the measurements on a line into a job, as batch mode would read it."""
+        # The rope diameter first, then the rest in the calculation's order
+        order = sorted(calculation.parameters, key=lambda p: p != "rope_diameter")
+        keywords = set(order)
+        if any(p.endswith("_radius") for p in order):
+            keywords.update(("radius", "diameter"))
+        if "tuck_count" in keywords:
+            keywords.add("tucks")
+
+        job = {}
+        positional = []
+        for token in tokens:
+            key, found, value = token.partition("=")
+            if found:
+                key = KEYWORDS.get(key, key)
+                if key not in keywords:
+                    raise CommandError(self.msg.repl_unknown_keyword.format(
+                        name=calculation.name, keyword=key, parameters=", ".join(order)
+                    ))
+                job[key] = value
+            else:
+                positional.append(token)
+
+        given = set(job)
+        if given & {"radius", "diameter"}:
+            given.update(p for p in order if p.endswith("_radius"))
+        if "tucks" in given:
+            given.add("tuck_count")
+        remaining = [p for p in order if p not in given]
+        if len(positional) > len(remaining):
+            raise CommandError(self.msg.repl_too_many_values.format(
+                name=calculation.name, parameters=", ".join(order)
+            ))
+        job.update(zip(remaining, positional))
+        return job
+
+    def run(self, line: str) -> str:
+        """Runs a line and gets what to show for it.
+
+        Raises:
+            CommandError: See parse(), or if the measurements can't be calculated.
+        """
+        calculation, arguments = self.parse(line)
+        calculator = self.calculations.instance(calculation)
+        if arguments is None:
+            # Nothing to work out, eg. the fid table
+            return calculator.build_table()[0] if hasattr(calculator, "build_table") else str(calculator)
+        try:
+            results = calculator.calculate(*arguments)
+            if not isinstance(results, tuple):
+                results = (results,)
+            # Measurements that don't make sense, eg. an eye smaller than the rope,
+            # fail in the formulas or come out infinite
+            texts = utilities.as_mixed_numbers(results)
+        except (ArithmeticError, ValueError) as e:
+            raise CommandError(self.msg.repl_calculation_failed.format(name=calculation.name, error=e)) from None
+        template = self.msg.result_template(*getattr(calculation, "labels", calculation.results), header=False)
+        return f"{calculator.title}\n{template(*texts)}"
+
+    def help(self) -> str:
+        names = ", ".join(self.names.complete(""))
+        return self.msg.repl_help.format(calculations=names)
+
+    def completions(self, line: str) -> Iterator[str]:
+        """Lists the ways the last word of a line could be finished."""
+        words = line.lower().split(" ")
+        if len(words) == 1:
+            yield from self.names.complete(words[0])
+            return
+        word = words[-1]
+        if len(words) == 2:
+            yield from self.rope_types.complete(word)
+        if "=" not in word:
+            yield from (f"{k}=" for k in (*KEYWORDS.values(), "rope_diameter") if k.startswith(word))
+
+
+def _completer(commands: Commands):
+    from prompt_toolkit.completion import Completer, Completion
+
+    class CommandCompleter(Completer):
+        def get_completions(self, document, complete_event) -> Iterable[Completion]:
+            word = document.get_word_before_cursor(WORD=True)
+            for completion in commands.completions(document.text_before_cursor):
+                yield Completion(completion, start_position=-len(word))
+
+    return CommandCompleter()
+
+
+def loop(session: PromptSession, commands: Commands, lines: Iterable[str] = None):
+    """Reads and runs lines until told to quit.
+
+    Args:
+        session (PromptSession): Where to read lines from.
+        commands (Commands): What to run them with.
+        lines (Iterable[str], optional): Lines to run instead of asking, eg. for
+            scripts. Defaults to None.
+    """
+    msg = commands.msg
+    print(msg.repl_intro)
+    if lines is None:
+        lines = iter(lambda: session.prompt("> "), None)
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.lower() in QUIT_COMMANDS:
+            break
+        if line.lower() in HELP_COMMANDS:
+            print(commands.help())
+            continue
+        try:
+            print(f"{commands.run(line)}\n")
+        except CommandError as e:
+            print(f"{msg.error}: {e}")
+
+
+def main(lang: str = "en", history: str = HISTORY_FILE, metrics=None) -> int:
+    """Runs command line mode, after the disclaimer.
+
+    Args:
+        lang (str, optional): Language specifer for translations. Defaults to "en".
+        history (str, optional): File to keep past lines in. Defaults to
+            HISTORY_FILE.
+        metrics (metrics.Metrics, optional): Where to record counts and timings, or
+            None to record nothing. Defaults to None.
+
+    Returns:
+        int: The exit status.
+    """
+    from prompt_toolkit import PromptSession, print_formatted_text
+    from prompt_toolkit.formatted_text import FormattedText
+    from prompt_toolkit.history import FileHistory
+
+    msg = tr.catalog(lang)
+    calculations = registry.Registry(lang=lang)
+    commands = Commands(calculations, lang)
+    session = PromptSession(history=FileHistory(history), completer=_completer(commands))
+    if metrics is not None:
+        import metrics as instrumentation
+
+        instrumentation.install(calculations)
+        metrics.wrap_session(session)
+
+    print_formatted_text(FormattedText([("#ff0000", f"{msg.disclaimer_title}\n\n")]))
+    print(f"{msg.disclaimer_body}\n\n")
+    # Asked in a session of its own, so the answer doesn't end up in the history
+    response = PromptSession().prompt(FormattedText([("#ff0000", msg.disclaimer_acknowledge_text_message)]))
+    if response.lower() != msg.disclaimer_acknowledge_text_answer:
+        return 0
+    try:
+        loop(session, commands)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
@@ -3,166 +3,228 @@ aBoredDev's Rope Tools
 Tool for calculating the length required for various operations with ropes
 
 Usage:
-  rope_tools.py
-  rope_tools.py --dialog
+  rope_tools.py [--dialog] [--metrics-file=<path>] [--metrics-port=<port>]
+  rope_tools.py --repl [--history=<path>] [--metrics-file=<path>] [--metrics-port=<port>]
+  rope_tools.py --batch [--format=<format>] [--output-format=<format>] [--calculation=<name>] [--cache=<n>] [--cache-file=<path>] [--specs=<path> [--product=<name>]] [--metrics-file=<path>] [--metrics-port=<port>]
   rope_tools.py --help
   rope_tools.py --version
 
 Options:
-  -d --dialog   Run in dialog mode.
-  -v --version  Show version.
-  -h --help     Show this message.
+  -d --dialog               Run in dialog mode.
+  -r --repl                 Type whole calculations on one line, eg.
+                            'eye twisted 5/8 d=2 tucks=5'.
+  --history=<path>          File to keep the lines typed with --repl in.
+                            Defaults to ~/.rope_tools_history.
+  -b --batch                Read jobs from stdin and write results to stdout, one
+                            per line.
+  --format=<format>         Input format for batch mode, 'jsonl' or 'csv'. Detected
+                            from the first line if not given.
+  --output-format=<format>  Output format for batch mode. Defaults to the input format.
+  --calculation=<name>      Calculation to use for jobs that don't name one.
+  --cache=<n>               Keep up to this many results in memory in batch mode,
+                            and print the cache's hit rate when done. Lengths are
+                            rounded to the nearest 1/16" when cached.
+  --cache-file=<path>       Also keep results in this SQLite file, between runs.
+  --specs=<path>            Use the rope specs in this file (see ropespec.py) for
+                            the actual rope diameters and multipliers.
+  --product=<name>          The product to use from --specs, rather than the first
+                            one listed for each rope.
+  --metrics-file=<path>     Record counts and timings, and write them to this file
+                            in the Prometheus text format when done.
+  --metrics-port=<port>     Record counts and timings, and serve them at
+                            http://127.0.0.1:<port>/metrics while running.
+  -v --version              Show version.
+  -h --help                 Show this message.
 """
 #!/usr/bin/env python3
-from prompt_toolkit import PromptSession, print_formatted_text
-from prompt_toolkit.styles import Style
-from prompt_toolkit.shortcuts import radiolist_dialog, message_dialog, yes_no_dialog
-from prompt_toolkit.formatted_text import FormattedText
-import eye_splice, back_splice, chain_splice, grog_sling, general
+import sys
+import registry
 import translate as tr
 import utilities
-from docopt import docopt
-
-arguments = docopt(__doc__, version="aBoredDev's Rope Tools 1.0")
-session = PromptSession()
-style = Style.from_dict({})
-full_screen = arguments["--dialog"]
-lang = "en"
-
-# Check that the language is one that we have translations for to avoid a TON of KeyErrors
-if lang not in tr.language_options:
-    if full_screen:
-        message_dialog(
-            title="Alert",
-            text=f"Specified language is unavailable. Available options are {', '.join(tr.language_options)}.\nDefaulting to english.",
-            style=style
-        )
-    else:
-        print(f"Specified language is unavailable. Available options are {', '.join(tr.language_options)}.\nDefaulting to english.")
-    lang = "en"
-
-# === Ropes and splices ===
-rope_types = list(utilities.RopeType)
-calculations = [
-    [  # General calculations
-        general.FidLengthCalculate(session, style),
-        general.FidLengthTable(session, style)
-    ],
-    [  # Splices in twisted rope
-        eye_splice.TwistedEyeSplice(session, style),
-        back_splice.TwistedBackSplice(session, style),
-        chain_splice.TwistedChainSplice(session, style)
-    ],
-    [  # Splices in hollow braid rope
-        eye_splice.HollowBraidLockedEyeSplice(session, style),
-        chain_splice.HollowBraidChainSplice(session, style),
-        grog_sling.GrogSling(session, style)
-    ]
-]
-
-# Check that all the calculations have been categorized correctly in case the user has
-# added more.
-cat_errors = []
-for rt in rope_types:
-    for c in calculations[rt.value]:
-        if not c.rope_type == rt:
-            cat_errors.append(tr.cat_error_listing[lang].format(
-                c_title=c.title,
-                c_rope_type=tr.rope_types[lang][c.rope_type],
-                rt=tr.rope_types[lang][rt]
-            ))
-            calculations[rt.value].remove(c)
-
-# If mis-categorized calculations have been found, notify the user of this, and remove
-# the offending calculation from the list.
-if len(cat_errors):
-    if not full_screen:
-        print(f"{tr.cat_error_message[lang]}\n")
-        print(*cat_errors, sep="\n  ===\n")
-    if full_screen:
-        m = f"{tr.cat_error_message[lang]}\n"
-        m += "\n  ===\n".join(cat_errors)
-        message_dialog(
-            title=tr.error[lang],
-            text=m,
-            style=style
-        ).run()
-
-running = True
-# Print the disclaimer
-if full_screen:
-    running = yes_no_dialog(
-        title=tr.disclaimer_title[lang],
-        text=f"{tr.disclaimer_body[lang]}\n\n{tr.disclaimer_acknowledge_dialog[lang]}",
-        style=Style.from_dict({
-            "frame.label": "#ff0000",
-            "dialog": "bg:#ff0000"
-        })
-    ).run()
-else:
-    print_formatted_text(FormattedText([
-        ("#ff0000", f"{tr.disclaimer_title[lang]}\n\n")
-    ]))
-    print(f"{tr.disclaimer_body[lang]}\n\n")
-    response = session.prompt(FormattedText([
-        ("#ff0000", tr.disclaimer_acknowledge_text_message[lang])
-    ]))
-    if not response.lower() == tr.disclaimer_acknowledge_text_answer[lang]:
-        running = False
-
-while running and not full_screen:
-    # Ask what rope type we are working with
-    rope_type = utilities.select_from_list(
-        session,
-        tr.select_rope_type_text[lang],
-        [tr.rope_types[lang][rt] for rt in rope_types],
-        tr.quit[lang]
-    )
-
-    if rope_type == len(rope_types):
-        break
-    
-    # Ask what calculation the user wants to perform
-    calculation = utilities.select_from_list(
-        session,
-        tr.select_calculation_text[lang],
-        calculations[rope_type],
-        tr.back[lang],
-    )
-
-    if calculation == len(calculations[rope_type]):
-        continue
-
-    # Run the calculation
-    calculations[rope_type][calculation].text()
-
-    # See if the user wants to run another calculation
-    run_again = session.prompt(tr.end_message[lang])
-    if run_again.lower() not in tr.end_message_answer[lang]:
-        break
-
-while running and full_screen:
-    rope_type = radiolist_dialog(
-        title=tr.rope_type[lang],
-        text=tr.select_rope_type_dialog[lang],
-        values=[[rt.value, tr.rope_types[lang][rt]] for rt in rope_types],
-        cancel_text=tr.quit[lang],
-    ).run()
-
-    if rope_type is None:
-        break
-
-    calculation = radiolist_dialog(
-        title=tr.calculation[lang],
-        text=tr.select_calculation_dialog[lang],
-        values=[
-            [i, calculations[rope_type][i].title]
-            for i in range(len(calculations[rope_type]))
-        ],
-        cancel_text=tr.back[lang]
-    ).run()
-
-    if calculation is None:
-        continue
-
-    calculations[rope_type][calculation].dialog()
+
+
+def interactive(full_screen: bool, lang: str = "en", metrics=None):
+    """Runs the interactive part of the tool, in either text or dialog mode.
+
+    Args:
+        full_screen (bool): Whether or not to use dialogs.
+        lang (str, optional): The translation language. Defaults to "en".
+        metrics (metrics.Metrics, optional): Where to record counts and timings, or
+            None to record nothing. Defaults to None.
+    """
+    # prompt_toolkit is only needed here, so don't make batch mode pay for loading it
+    from prompt_toolkit import PromptSession, print_formatted_text
+    from prompt_toolkit.styles import Style
+    # Dialogs are all shown in one long-lived application, see screen.py
+    import screen
+    from screen import radiolist_dialog, message_dialog, yes_no_dialog
+    from prompt_toolkit.formatted_text import FormattedText
+
+    session = PromptSession()
+    style = Style.from_dict({})
+
+    # Check that the language is one that we have translations for to avoid a TON of KeyErrors
+    if lang not in tr.language_options:
+        if full_screen:
+            message_dialog(
+                title="Alert",
+                text=f"Specified language is unavailable. Available options are {', '.join(tr.language_options)}.\nDefaulting to english.",
+                style=style
+            ).run()
+        else:
+            print(f"Specified language is unavailable. Available options are {', '.join(tr.language_options)}.\nDefaulting to english.")
+        lang = "en"
+    msg = tr.catalog(lang)
+
+    # === Ropes and splices ===
+    # Each calculator is only constructed once its rope type is first picked
+    rope_types = list(utilities.RopeType)
+    calculations = registry.Registry(session, style, lang)
+    if metrics is not None:
+        import metrics as instrumentation
+
+        instrumentation.install(calculations)
+        if full_screen:
+            instrumentation.install_dialogs(metrics)
+        else:
+            metrics.wrap_session(session)
+
+    try:
+        running = True
+        # Print the disclaimer
+        if full_screen:
+            running = yes_no_dialog(
+                title=msg.disclaimer_title,
+                text=f"{msg.disclaimer_body}\n\n{msg.disclaimer_acknowledge_dialog}",
+                style=Style.from_dict({
+                    "frame.label": "#ff0000",
+                    "dialog": "bg:#ff0000"
+                })
+            ).run()
+        else:
+            print_formatted_text(FormattedText([
+                ("#ff0000", f"{msg.disclaimer_title}\n\n")
+            ]))
+            print(f"{msg.disclaimer_body}\n\n")
+            response = session.prompt(FormattedText([
+                ("#ff0000", msg.disclaimer_acknowledge_text_message)
+            ]))
+            if not response.lower() == msg.disclaimer_acknowledge_text_answer:
+                running = False
+
+        while running and not full_screen:
+            # Ask what rope type we are working with
+            rope_type = utilities.select_from_list(
+                session,
+                msg.select_rope_type_text,
+                [msg.rope_type_name(rt) for rt in rope_types],
+                msg.quit
+            )
+
+            if rope_type == len(rope_types):
+                break
+
+            # Ask what calculation the user wants to perform
+            options = [calculations.instance(c) for c in calculations.for_rope_type(rope_types[rope_type])]
+            calculation = utilities.select_from_list(
+                session,
+                msg.select_calculation_text,
+                options,
+                msg.back,
+            )
+
+            if calculation == len(options):
+                continue
+
+            # Run the calculation
+            options[calculation].text()
+
+            # See if the user wants to run another calculation
+            run_again = session.prompt(msg.end_message)
+            if run_again.lower() not in msg.end_message_answer:
+                break
+
+        while running and full_screen:
+            rope_type = radiolist_dialog(
+                title=msg.rope_type,
+                text=msg.select_rope_type_dialog,
+                values=[[rt, msg.rope_type_name(rt)] for rt in rope_types],
+                cancel_text=msg.quit,
+            ).run()
+
+            if rope_type is None:
+                break
+
+            options = [calculations.instance(c) for c in calculations.for_rope_type(rope_type)]
+            calculation = radiolist_dialog(
+                title=msg.calculation,
+                text=msg.select_calculation_dialog,
+                values=[[c, c.title] for c in options],
+                cancel_text=msg.back
+            ).run()
+
+            if calculation is None:
+                continue
+
+            calculation.dialog()
+
+    finally:
+        # Give the terminal back, even if something went wrong
+        screen.close()
+
+def main(argv: list[str] = None) -> int:
+    """Parses the command line arguments and runs the selected mode.
+
+    Args:
+        argv (list[str], optional): The arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: The exit status.
+    """
+    from docopt import docopt
+
+    arguments = docopt(__doc__, argv, version="aBoredDev's Rope Tools 1.0")
+
+    recorder = None
+    if arguments["--metrics-file"] or arguments["--metrics-port"]:
+        import metrics
+
+        recorder = metrics.install(registry.default() if arguments["--batch"] else None)
+        if arguments["--metrics-port"]:
+            recorder.serve(int(arguments["--metrics-port"]))
+
+    try:
+        # Batch mode never touches the terminal, so skip everything interactive
+        if arguments["--batch"]:
+            import headless
+            if arguments["--specs"]:
+                import ropespec
+                registry.default().set_specs(ropespec.SpecDatabase(arguments["--specs"], arguments["--product"]))
+            if arguments["--cache"] or arguments["--cache-file"]:
+                import memo
+                cache = memo.Memo(int(arguments["--cache"] or memo.MAX_SIZE), arguments["--cache-file"])
+                registry.default().set_memo(cache)
+            status = headless.main(
+                arguments["--format"],
+                arguments["--output-format"],
+                arguments["--calculation"]
+            )
+            if registry.default().memo is not None:
+                print(registry.default().memo.summary(), file=sys.stderr)
+            return status
+
+        if arguments["--repl"]:
+            import repl
+            return repl.main(history=arguments["--history"] or repl.HISTORY_FILE, metrics=recorder)
+
+        interactive(arguments["--dialog"], metrics=recorder)
+        return 0
+    finally:
+        if recorder is not None:
+            if arguments["--metrics-file"]:
+                recorder.write(arguments["--metrics-file"])
+            recorder.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""Specifications of the ropes actually in use, so that the calculations can use what
+the manufacturer says instead of the rules of thumb in core.py: the diameter the rope
+really measures, and how many rope diameters its bury, tails, back splice and tucks
+take.
+
+Specs are kept in an SQLite file, one row per product and nominal diameter, indexed on
+(rope type, nominal diameter), which is how the calculators look them up. Diameters
+are stored as whole nanometres (see length.py), so 5/8" and 0.625" find the same row.
+A multiplier left empty keeps the default from core.py.
+
+To use one, hand it to a registry, and every calculator with 'multipliers' looks up
+the spec for its rope type and the job's rope diameter, and is run with the actual
+diameter and the spec's multipliers:
+    registry.default().set_specs(ropespec.SpecDatabase("ropespecs.sqlite"))
+
+Lookups go through a cache in front of the file, so a batch only queries it once for
+each rope diameter in it, however many jobs there are.
+
+Usage:
+  ropespec.py import <file> [--specs=<path>]
+  ropespec.py list [<rope_type>] [--specs=<path>]
+  ropespec.py show <rope_type> <rope_diameter> [--product=<name>] [--specs=<path>]
+  ropespec.py --help
+
+Commands:
+  import    Add or replace specs from a CSV file, with a header row naming the
+            columns in FIELDS. Diameters can be given in any unit, eg. '5/8' or '16mm'.
+  list      Show every spec, or those for one rope type.
+  show      Show the spec a calculation would use for a rope.
+
+Options:
+  --specs=<path>     The specs file. [default: ropespecs.sqlite]
+  --product=<name>   Use this product's spec instead of the first one listed.
+  -h --help          Show this message.
+
+Like core.py, this module only uses the standard library.
+"""
+from __future__ import annotations
+import csv
+import sqlite3
+import sys
+from typing import Callable, Iterable, NamedTuple
+from core import RopeType
+from length import UNITS, to_nanometres
+import core
+import parser
+
+SPECS_FILE = "ropespecs.sqlite"
+
+# The multipliers a spec can set, named after the parameters of the formulas in core.py
+MULTIPLIERS = ("bury_multiplier", "tail_multiplier", "back_splice_multiplier", "tuck_multiplier")
+
+# What the formulas use when a spec doesn't say
+DEFAULTS = {
+    name: value
+    for function in vars(core).values() if hasattr(function, "formula")
+    for name, value in function.formula.defaults.items()
+}
+
+# Columns of the table, and of an import file
+FIELDS = (
+    "product",
+    "manufacturer",
+    "rope_type",
+    "construction",
+    "nominal_diameter",
+    "actual_diameter",
+    *MULTIPLIERS,
+    "linear_density",
+)
+
+# Lookups kept in memory before the cache is started again
+CACHE_SIZE = 4096
+
+NM_PER_INCH = UNITS["in"]
+
+
+class Spec(NamedTuple):
+    product: str
+    manufacturer: str
+    rope_type: RopeType
+    construction: str
+    # In inches
+    nominal_diameter: float
+    actual_diameter: float
+    bury_multiplier: float | None
+    tail_multiplier: float | None
+    back_splice_multiplier: float | None
+    tuck_multiplier: float | None
+    # Grams per metre
+    linear_density: float | None
+
+    def multipliers(self, names: Iterable[str] = MULTIPLIERS) -> dict[str, float]:
+        """Gets the multipliers the spec sets, out of 'names'."""
+        return {name: getattr(self, name) for name in names if getattr(self, name) is not None}
+
+    def __str__(self):
+        diameter = f"{self.nominal_diameter:g}\" ({self.actual_diameter:g}\" actual)"
+        multipliers = ", ".join(
+            f"{name.removesuffix('_multiplier')} {value:g}" for name, value in self.multipliers().items()
+        ) or "default multipliers"
+        return f"{self.product} {diameter}, {self.construction or self.rope_type}: {multipliers}"
+
+
+class SpecDatabase:
+    def __init__(self, path: str = SPECS_FILE, product: str = None):
+        """Rope specs kept in an SQLite file, opened the first time they're needed.
+
+        Args:
+            path (str, optional): The specs file. It's created if it doesn't exist.
+                Defaults to SPECS_FILE.
+            product (str, optional): The product to use, or None to use whichever
+                spec for a rope type and diameter was added first. Defaults to None.
+        """
+        self.path = path
+        self.product = product
+        self._connection: sqlite3.Connection = None
+        # (rope type, nominal diameter in nm, product): the spec, or None
+        self._specs: dict[tuple, Spec | None] = {}
+        # For each calculation, rope diameter: what resolve() returned
+        self._resolved: dict[type, dict[float, tuple[float, dict[str, float]]]] = {}
+        # How many lookups actually went to the file
+        self.queries = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, isolation_level=None)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS specs ("
+                "id INTEGER PRIMARY KEY, product TEXT NOT NULL, manufacturer TEXT, rope_type TEXT NOT NULL, "
+                "construction TEXT, nominal_diameter INTEGER NOT NULL, actual_diameter INTEGER NOT NULL, "
+                "bury_multiplier REAL, tail_multiplier REAL, back_splice_multiplier REAL, tuck_multiplier REAL, "
+                "linear_density REAL, UNIQUE (product, nominal_diameter))"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS specs_by_diameter ON specs (rope_type, nominal_diameter)"
+            )
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self) -> SpecDatabase:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, specs: Iterable[Spec]) -> int:
+        """Adds specs, replacing any for the same product and nominal diameter.
+
+        Returns:
+            int: How many were added.
+        """
+        rows = [
+            (
+                s.product, s.manufacturer, s.rope_type.name, s.construction,
+                to_nanometres(s.nominal_diameter), to_nanometres(s.actual_diameter),
+                *(getattr(s, name) for name in MULTIPLIERS), s.linear_density,
+            )
+            for s in specs
+        ]
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN")
+            # The id is left alone on a replace, so the order products were added in holds
+            connection.executemany(
+                f"INSERT INTO specs ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))}) "
+                f"ON CONFLICT (product, nominal_diameter) DO UPDATE SET "
+                + ", ".join(f"{f} = excluded.{f}" for f in FIELDS[1:]),
+                rows,
+            )
+        self._specs.clear()
+        for resolved in self._resolved.values():
+            resolved.clear()
+        return len(rows)
+
+    def find(self, rope_type: RopeType, rope_diameter: float, product: str = None) -> Spec | None:
+        """Looks up the spec for a rope, through the cache.
+
+        Args:
+            rope_type (RopeType): The rope type.
+            rope_diameter (float): The nominal rope diameter, in inches.
+            product (str, optional): The product, or None for whichever spec for the
+                rope was added first. Defaults to None.
+
+        Returns:
+            Spec | None: The spec, or None if there isn't one.
+        """
+        key = (rope_type, to_nanometres(rope_diameter), product)
+        try:
+            return self._specs[key]
+        except KeyError:
+            pass
+
+        self.queries += 1
+        query = f"SELECT {', '.join(FIELDS)} FROM specs WHERE rope_type = ? AND nominal_diameter = ?"
+        values = [rope_type.name, key[1]]
+        if product is not None:
+            query += " AND product = ?"
+            values.append(product)
+        row = self._connect().execute(query + " ORDER BY id LIMIT 1", values).fetchone()
+        if len(self._specs) >= CACHE_SIZE:
+            self._specs.clear()
+        self._specs[key] = spec = None if row is None else _spec(row)
+        return spec
+
+    def specs(self, rope_type: RopeType = None) -> list[Spec]:
+        """Lists every spec, or those for a rope type, by rope type and diameter."""
+        query = f"SELECT {', '.join(FIELDS)} FROM specs"
+        values = []
+        if rope_type is not None:
+            query += " WHERE rope_type = ?"
+            values.append(rope_type.name)
+        rows = self._connect().execute(query + " ORDER BY rope_type, nominal_diameter, id", values)
+        return [_spec(row) for row in rows]
+
+    def resolve(self, calculation: type, rope_diameter: float) -> tuple[float, dict[str, float]]:
+        """Works out what a calculation should be run with for a rope diameter.
+
+        Args:
+            calculation (type): The calculation class, with a 'rope_type' and
+                'multipliers'.
+            rope_diameter (float): The nominal rope diameter, in inches.
+
+        Returns:
+            tuple[float, dict[str, float]]: The actual rope diameter, and every one
+                of the calculation's multipliers to pass to calculate(), with the
+                defaults for any the spec leaves empty. The diameter as it was and no
+                multipliers if there's no spec for the rope.
+        """
+        cache = self._resolved.setdefault(calculation, {})
+        try:
+            return cache[rope_diameter]
+        except KeyError:
+            pass
+        spec = self.find(calculation.rope_type, rope_diameter, self.product)
+        if spec is None:
+            resolved = rope_diameter, {}
+        else:
+            # Always passed in full, which tells the cache the diameter is a spec's
+            multipliers = {name: DEFAULTS[name] for name in calculation.multipliers}
+            resolved = spec.actual_diameter, {**multipliers, **spec.multipliers(calculation.multipliers)}
+        if len(cache) >= CACHE_SIZE:
+            cache.clear()
+        cache[rope_diameter] = resolved
+        return resolved
+
+    def resolving(self, calculator) -> Callable:
+        """Wraps a calculator's calculate() method so that it's run with the spec for
+        the job's rope.
+
+        Args:
+            calculator: The calculator, anything with a 'rope_type', 'parameters',
+                'multipliers' and a calculate() method taking them as keywords.
+
+        Returns:
+            Callable: A function that takes the same arguments as calculate().
+        """
+        calculate = calculator.calculate
+        calculation = type(calculator)
+        index = calculator.parameters.index("rope_diameter")
+        resolve = self.resolve
+        # The same dict resolve() fills, looked up directly since it's almost always
+        # a hit
+        cache = self._resolved.setdefault(calculation, {})
+
+        def resolved_calculate(*arguments, **overrides):
+            try:
+                rope_diameter, multipliers = cache[arguments[index]]
+            except KeyError:
+                rope_diameter, multipliers = resolve(calculation, arguments[index])
+            if overrides:
+                # Multipliers passed in win over the spec's, as in batch.calculate
+                multipliers = {**multipliers, **overrides}
+            return calculate(*arguments[:index], rope_diameter, *arguments[index + 1:], **multipliers)
+
+        resolved_calculate.__doc__ = calculate.__doc__
+        return resolved_calculate
+
+    def wrap(self, calculator) -> object:
+        """Puts the specs in front of a calculator's calculate() method, in place. See
+        registry.Registry.set_specs for putting them in front of every calculator.
+
+        Returns:
+            object: The same calculator.
+        """
+        if getattr(calculator, "multipliers", ()) and "rope_diameter" in calculator.parameters:
+            calculator.calculate = self.resolving(calculator)
+        return calculator
+
+
+def _spec(row: tuple) -> Spec:
+    values = dict(zip(FIELDS, row))
+    values["rope_type"] = RopeType[values["rope_type"]]
+    values["nominal_diameter"] /= NM_PER_INCH
+    values["actual_diameter"] /= NM_PER_INCH
+    return Spec(**values)
+
+
+def read_specs(lines: Iterable[str]) -> list[Spec]:
+    """Reads specs from a CSV file with a header row. 'actual_diameter' defaults to the
+    nominal one, and empty multipliers to the defaults in core.py.
+
+    Raises:
+        ValueError: If a row is missing something or has a bad value.
+    """
+    specs = []
+    for line_number, row in enumerate(csv.DictReader(lines), 2):
+        try:
+            if not row.get("product"):
+                raise ValueError("no product given")
+            rope_type = _rope_type(row.get("rope_type") or "")
+            nominal = parser.parse_length(row.get("nominal_diameter") or "")
+            actual = parser.parse_length(row["actual_diameter"]) if row.get("actual_diameter") else nominal
+            numbers = {
+                name: float(row[name]) if row.get(name) else None
+                for name in (*MULTIPLIERS, "linear_density")
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"line {line_number}: {e}") from None
+        specs.append(Spec(
+            row["product"], row.get("manufacturer") or "", rope_type, row.get("construction") or "",
+            nominal, actual, **numbers,
+        ))
+    return specs
+
+
+def _rope_type(text: str) -> RopeType:
+    try:
+        return RopeType[text.strip().upper().replace(" ", "_")]
+    except KeyError:
+        raise ValueError(f"unknown rope type '{text}'") from None
+
+
+def main(arguments: dict) -> int:
+    """Runs one of the commands in the usage.
+
+    Returns:
+        int: The exit status.
+    """
+    try:
+        with SpecDatabase(arguments["--specs"], arguments["--product"]) as database:
+            if arguments["import"]:
+                with open(arguments["<file>"], newline="") as file:
+                    print(f"{database.add(read_specs(file))} specs added")
+                return 0
+            if arguments["show"]:
+                rope_type = _rope_type(arguments["<rope_type>"])
+                rope_diameter = parser.parse_length(arguments["<rope_diameter>"])
+                spec = database.find(rope_type, rope_diameter, database.product)
+                print(spec if spec is not None else "No spec, the default multipliers are used")
+                return 0
+            rope_type = _rope_type(arguments["<rope_type>"]) if arguments["<rope_type>"] else None
+            for spec in database.specs(rope_type):
+                print(spec)
+            return 0
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+
+    sys.exit(main(docopt(__doc__)))
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""The screen for dialog mode: a single full screen prompt_toolkit application that
+stays up for the whole session, with the dialogs swapped in and out of it.
+
+prompt_toolkit's own dialog shortcuts build and run a new Application for every
+dialog, which clears and redraws the whole terminal each time and flickers badly over
+slow connections. The functions here take the same arguments as those shortcuts and
+return something with the same run() method, so the calculators call them the same
+way, but every dialog of a kind is the same set of widgets with new text, shown in the
+one application. Between dialogs only the parts of the screen that changed are
+redrawn.
+
+The application runs its event loop in a background thread, and run() waits for the
+answer, so the code asking the questions doesn't need to be asynchronous.
+prompt_toolkit isn't thread-safe, so the widgets are only ever changed from that
+thread. The screen is started by the first dialog and stays up until close() is called
+(rope_tools.py does that when dialog mode ends) or the program exits.
+"""
+from __future__ import annotations
+import atexit
+import threading
+from concurrent.futures import Future
+from time import perf_counter
+from typing import Any, Callable, Sequence
+from prompt_toolkit.application import Application
+from prompt_toolkit.document import Document
+from prompt_toolkit.formatted_text import AnyFormattedText
+from prompt_toolkit.key_binding.bindings.focus import focus_next, focus_previous
+from prompt_toolkit.key_binding.defaults import load_key_bindings
+from prompt_toolkit.key_binding.key_bindings import KeyBindings, merge_key_bindings
+from prompt_toolkit.layout import Layout
+from prompt_toolkit.layout.containers import DynamicContainer, HSplit, Window
+from prompt_toolkit.layout.dimension import Dimension as D
+from prompt_toolkit.styles import BaseStyle, DynamicStyle
+from prompt_toolkit.widgets import Button, Dialog, Label, RadioList, TextArea, ValidationToolbar
+
+
+class Screen:
+    def __init__(self):
+        """The application the dialogs are shown in. It isn't started until the first
+        dialog is shown."""
+        self.style: BaseStyle = None
+        # Called with the time from a dialog being asked for to it being on screen
+        self.on_swap: Callable[[float], None] = None
+
+        self._container = Window()
+        self._answer: Future = None
+        self._asked_at: float = None
+        self._thread: threading.Thread = None
+        self._started = threading.Event()
+        self._error: BaseException = None
+        # Widgets for each kind of dialog, built the first time they're needed
+        self._forms: dict[str, Any] = {}
+
+        bindings = KeyBindings()
+        bindings.add("tab")(focus_next)
+        bindings.add("s-tab")(focus_previous)
+
+        @bindings.add("c-c")
+        def _(event):
+            self.answer(KeyboardInterrupt())
+
+        self.app = Application(
+            layout=Layout(DynamicContainer(lambda: self._container)),
+            key_bindings=merge_key_bindings([load_key_bindings(), bindings]),
+            mouse_support=True,
+            style=DynamicStyle(lambda: self.style),
+            full_screen=True,
+            # Draw a new dialog straight away rather than waiting for a quiet moment
+            max_render_postpone_time=None,
+        )
+        self.app.after_render += self._rendered
+        atexit.register(self.close)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def ask(self, update: Callable[[], tuple[Any, Any]], style: BaseStyle = None) -> Any:
+        """Shows a dialog and waits for it to be answered.
+
+        Args:
+            update (Callable[[], tuple[Any, Any]]): Fills in the dialog's widgets and
+                returns the dialog and the part of it to put the cursor in. It's
+                called from the application's thread.
+            style (BaseStyle, optional): The style to show it with. Defaults to None.
+
+        Raises:
+            KeyboardInterrupt: If Ctrl-C was pressed.
+            EOFError: If the screen was closed before the dialog was answered.
+
+        Returns:
+            Any: The answer.
+        """
+        answer = Future()
+
+        def swap():
+            try:
+                container, focus = update()
+            except BaseException as e:
+                answer.set_exception(e)
+                return
+            self._answer = answer
+            self._container = container
+            self.style = style
+            self.app.layout.focus(focus)
+            self.app.invalidate()
+
+        self._asked_at = perf_counter()
+        if self.running:
+            self.app.loop.call_soon_threadsafe(swap)
+        else:
+            # The first dialog is in place before the first render
+            swap()
+            self._start()
+        return answer.result()
+
+    def answer(self, value: Any = None):
+        """Answers the dialog on screen, from the application's thread. Anything
+        pressed after the first answer is ignored."""
+        if self._answer is not None and not self._answer.done():
+            if isinstance(value, BaseException):
+                self._answer.set_exception(value)
+            else:
+                self._answer.set_result(value)
+
+    def form(self, kind: str, build: Callable[[], Any]) -> Any:
+        """Gets the widgets for a kind of dialog, building them the first time."""
+        if kind not in self._forms:
+            self._forms[kind] = build()
+        return self._forms[kind]
+
+    def close(self):
+        """Takes the screen down and gives the terminal back, if it's up."""
+        if self.running:
+            self.app.loop.call_soon_threadsafe(self.app.exit)
+            self._thread.join()
+        self._thread = None
+
+    def _start(self):
+        self._started.clear()
+        self._thread = threading.Thread(target=self._run, name="screen", daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self):
+        try:
+            self.app.run(pre_run=self._started.set, handle_sigint=False)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._started.set()
+            self.answer(self._error or EOFError("The screen was closed"))
+
+    def _rendered(self, app: Application):
+        if self._asked_at is not None:
+            if self.on_swap is not None:
+                self.on_swap(perf_counter() - self._asked_at)
+            self._asked_at = None
+
+
+_screen: Screen = None
+
+
+def shared() -> Screen:
+    """Gets the screen every dialog is shown in."""
+    global _screen
+    if _screen is None:
+        _screen = Screen()
+    return _screen
+
+
+def close():
+    """Takes the shared screen down, if it's up."""
+    if _screen is not None:
+        _screen.close()
+
+
+class Form:
+    def __init__(self, show: Callable[[], Any]):
+        """A dialog waiting to be shown, see run()."""
+        self.show = show
+
+    def run(self) -> Any:
+        """Shows the dialog and waits for it to be answered, like
+        prompt_toolkit.Application.run().
+
+        Returns:
+            Any: The answer.
+        """
+        return self.show()
+
+
+def _dialog(body, buttons: list[Button]) -> Dialog:
+    return Dialog(title="", body=body, buttons=buttons, with_background=True)
+
+
+def message_dialog(
+    title: AnyFormattedText = "",
+    text: AnyFormattedText = "",
+    ok_text: str = "Ok",
+    style: BaseStyle = None,
+) -> Form:
+    """Shows a message until OK is pressed, like
+    prompt_toolkit.shortcuts.message_dialog."""
+    screen = shared()
+
+    def build():
+        label = Label(text="", dont_extend_height=True)
+        ok = Button(text="", handler=screen.answer)
+        return _dialog(label, [ok]), label, ok
+
+    def update():
+        dialog, label, ok = screen.form("message", build)
+        dialog.title, label.text, ok.text = title, text, ok_text
+        return dialog, ok
+
+    return Form(lambda: screen.ask(update, style))
+
+
+def yes_no_dialog(
+    title: AnyFormattedText = "",
+    text: AnyFormattedText = "",
+    yes_text: str = "Yes",
+    no_text: str = "No",
+    style: BaseStyle = None,
+) -> Form:
+    """Asks a yes or no question, like prompt_toolkit.shortcuts.yes_no_dialog. The
+    answer is True or False."""
+    screen = shared()
+
+    def build():
+        label = Label(text="", dont_extend_height=True)
+        yes = Button(text="", handler=lambda: screen.answer(True))
+        no = Button(text="", handler=lambda: screen.answer(False))
+        return _dialog(label, [yes, no]), label, yes, no
+
+    def update():
+        dialog, label, yes, no = screen.form("yes_no", build)
+        dialog.title, label.text, yes.text, no.text = title, text, yes_text, no_text
+        return dialog, yes
+
+    return Form(lambda: screen.ask(update, style))
+
+
+def input_dialog(
+    title: AnyFormattedText = "",
+    text: AnyFormattedText = "",
+    ok_text: str = "OK",
+    cancel_text: str = "Cancel",
+    style: BaseStyle = None,
+    default: str = "",
+) -> Form:
+    """Asks for a line of text, like prompt_toolkit.shortcuts.input_dialog. The answer
+    is the text, or None if the dialog was cancelled."""
+    screen = shared()
+
+    def build():
+        label = Label(text="", dont_extend_height=True)
+        ok = Button(text="", handler=lambda: screen.answer(field.text))
+        cancel = Button(text="", handler=screen.answer)
+
+        def accept(buffer) -> bool:
+            screen.app.layout.focus(ok)
+            # Keep the text
+            return True
+
+        field = TextArea(multiline=False, accept_handler=accept)
+        body = HSplit([label, field, ValidationToolbar()], padding=D(preferred=1, max=1))
+        return _dialog(body, [ok, cancel]), label, field, ok, cancel
+
+    def update():
+        dialog, label, field, ok, cancel = screen.form("input", build)
+        dialog.title, label.text, ok.text, cancel.text = title, text, ok_text, cancel_text
+        # Starts afresh, without the last answer's text or undo history
+        field.buffer.reset(Document(default))
+        return dialog, field
+
+    return Form(lambda: screen.ask(update, style))
+
+
+def radiolist_dialog(
+    title: AnyFormattedText = "",
+    text: AnyFormattedText = "",
+    ok_text: str = "Ok",
+    cancel_text: str = "Cancel",
+    values: Sequence[tuple[Any, AnyFormattedText]] = None,
+    default: Any = None,
+    style: BaseStyle = None,
+) -> Form:
+    """Asks for one of a list of options, like
+    prompt_toolkit.shortcuts.radiolist_dialog. The answer is the value of the option,
+    or None if the dialog was cancelled."""
+    screen = shared()
+
+    def build():
+        label = Label(text="", dont_extend_height=True)
+        # The list itself changes every time, so it goes in a slot of its own
+        slot = [Window()]
+        ok = Button(text="", handler=lambda: screen.answer(slot[0].current_value))
+        cancel = Button(text="", handler=screen.answer)
+        body = HSplit([label, DynamicContainer(lambda: slot[0])], padding=1)
+        return _dialog(body, [ok, cancel]), label, slot, ok, cancel
+
+    def update():
+        dialog, label, slot, ok, cancel = screen.form("radiolist", build)
+        dialog.title, label.text, ok.text, cancel.text = title, text, ok_text, cancel_text
+        slot[0] = RadioList(values=list(values or []), default=default)
+        return dialog, slot[0]
+
+    return Form(lambda: screen.ask(update, style))
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""Local HTTP service for running calculations from other programs, without starting a
+new process for every job.
+
+Every calculation in the registry is available at '/<name>' (aliases work too, as long
+as they aren't shared between rope types). POST a job as a JSON object with the same
+parameters batch mode takes, or a JSON list of jobs, and the results come back in the
+same form batch mode writes them. 'GET /' lists the calculations and their parameters.
+
+Jobs for the same calculation that arrive within a short window of each other are
+gathered up and calculated together, using the NumPy batch versions when NumPy is
+installed. Connections are kept alive between requests unless the client asks
+otherwise. The service only listens on localhost by default.
+
+Usage:
+  server.py [--host=<host>] [--port=<port>] [--window=<ms>] [--max-batch=<n>]
+  server.py --help
+
+Options:
+  --host=<host>     Address to listen on. [default: 127.0.0.1]
+  --port=<port>     Port to listen on. [default: 8080]
+  --window=<ms>     How long to wait for more jobs before calculating. [default: 2]
+  --max-batch=<n>   Calculate straight away once this many jobs are waiting. [default: 1024]
+  -h --help         Show this message.
+"""
+import asyncio
+import json
+import sys
+import headless
+import registry
+
+# Largest request body that will be accepted, in bytes
+MAX_BODY = 16 * 1024 * 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+}
+
+
+class Batcher:
+    def __init__(self, calculation: type, window: float, max_batch: int):
+        """Gathers up jobs for one calculation and calculates them together.
+
+        Args:
+            calculation (type): The calculation class.
+            window (float): Seconds to wait for more jobs after the first one arrives.
+            max_batch (int): Calculate straight away once this many jobs are waiting.
+        """
+        self.calculation = calculation
+        self.window = window
+        self.max_batch = max_batch
+        self.pending: list[tuple[list, asyncio.Future]] = []
+        self.timer: asyncio.TimerHandle = None
+        # Batch counts, for seeing how well the window is working
+        self.batches = 0
+        self.jobs = 0
+
+    def submit(self, arguments: list) -> asyncio.Future:
+        """Queues a job.
+
+        Args:
+            arguments (list): The arguments for the calculation's calculate() method.
+
+        Returns:
+            asyncio.Future: Resolves to the job's results.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((arguments, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return future
+
+    def flush(self):
+        """Calculates every waiting job and hands out the results."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        self.batches += 1
+        self.jobs += len(pending)
+
+        try:
+            results = headless.calculate_many(self.calculation, [arguments for arguments, _ in pending])
+        except Exception:
+            # Something in the batch can't be calculated. Work the jobs out one at a
+            # time so that only the requests with bad jobs fail.
+            for arguments, future in pending:
+                if future.done():
+                    continue
+                try:
+                    future.set_result(headless.calculate_many(self.calculation, [arguments])[0])
+                except Exception as e:
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class Service:
+    def __init__(self, window: float = 0.002, max_batch: int = 1024):
+        """The HTTP side of the service.
+
+        Args:
+            window (float, optional): Seconds to wait for more jobs before
+                calculating. Defaults to 0.002.
+            max_batch (int, optional): Calculate straight away once this many jobs
+                are waiting. Defaults to 1024.
+        """
+        self.window = window
+        self.max_batch = max_batch
+        self.batchers: dict[type, Batcher] = {}
+
+    def batcher(self, calculation: type) -> Batcher:
+        if calculation not in self.batchers:
+            self.batchers[calculation] = Batcher(calculation, self.window, self.max_batch)
+        return self.batchers[calculation]
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves requests on one connection until either side closes it."""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, path, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        headers[key.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    self.respond(writer, 400, {"error": "invalid Content-Length"}, False)
+                    break
+                if length > MAX_BODY:
+                    self.respond(writer, 413, {"error": "request body is too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" and (version != "HTTP/1.0" or connection == "keep-alive")
+
+                status, payload = await self.route(method, path, body)
+                self.respond(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, path: str, body: bytes) -> tuple[int, object]:
+        """Works out the response to a request.
+
+        Returns:
+            tuple[int, object]: The status code and the JSON payload.
+        """
+        name = path.split("?", 1)[0].strip("/")
+        if not name:
+            if method != "GET":
+                return 405, {"error": "use GET to list the calculations"}
+            return 200, [
+                {"name": c.name, "rope_type": c.rope_type.name.lower(), "parameters": c.parameters, "results": c.results}
+                for c in registry.default() if hasattr(c, "parameters")
+            ]
+
+        try:
+            calculation = headless.find_calculation(name)
+        except headless.JobError as e:
+            return 404, {"error": str(e)}
+        if method != "POST":
+            return 405, {"error": f"use POST to run {calculation.name}"}
+
+        try:
+            jobs = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            return 400, {"error": f"invalid JSON ({e})"}
+        single = isinstance(jobs, dict)
+        if single:
+            jobs = [jobs]
+        if not isinstance(jobs, list) or not all(isinstance(j, dict) for j in jobs):
+            return 400, {"error": "send a job object or a list of job objects"}
+
+        try:
+            arguments = [headless.job_arguments(calculation, job) for job in jobs]
+        except headless.JobError as e:
+            return 400, {"error": str(e)}
+
+        batcher = self.batcher(calculation)
+        try:
+            results = await asyncio.gather(*[batcher.submit(a) for a in arguments])
+            # Bad jobs come back from the NumPy versions as inf or NaN, which can't be
+            # formatted
+            records = [headless.result_record(calculation, r) for r in results]
+        except (ArithmeticError, ValueError, TypeError) as e:
+            return 400, {"error": f"calculation failed ({e})"}
+        return 200, records[0] if single else records
+
+    @staticmethod
+    def respond(writer: asyncio.StreamWriter, status: int, payload: object, keep_alive: bool):
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+        )
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8080, window: float = 0.002, max_batch: int = 1024):
+    """Runs the service until it is cancelled.
+
+    Args:
+        host (str, optional): Address to listen on. Defaults to "127.0.0.1".
+        port (int, optional): Port to listen on. Defaults to 8080.
+        window (float, optional): Seconds to wait for more jobs before calculating.
+            Defaults to 0.002.
+        max_batch (int, optional): Calculate straight away once this many jobs are
+            waiting. Defaults to 1024.
+    """
+    # Load NumPy now rather than on the first request
+    headless.batch_module()
+    service = Service(window, max_batch)
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Listening on http://{host}:{port}/", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+
+    arguments = docopt(__doc__)
+    try:
+        asyncio.run(serve(
+            arguments["--host"],
+            int(arguments["--port"]),
+            float(arguments["--window"]) / 1000,
+            int(arguments["--max-batch"])
+        ))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""Batch mode for big input files: splits the file into byte ranges ('shards') and
+runs them through headless.run in a pool of worker processes, one shard at a time per
+worker. The results are written in the same order as the jobs in the input, exactly as
+headless mode would write them.
+
+Every shard starts and ends on a line break, so a job is never split between shards.
+CSV files must have one job per line (no line breaks inside quoted values), and their
+header row is handed to every shard. Workers only import the headless module, never
+the interactive prompts.
+
+Each worker counts the jobs in its shard as it calculates them, and the error messages
+are renumbered as the shards are written, so they give the same line numbers as
+headless mode. Only a few shards per worker are held in memory at a time.
+
+Usage:
+  sharded.py <input> [--output=<file>] [--workers=<n>] [--chunk-size=<bytes>] [--format=<format>] [--output-format=<format>] [--calculation=<name>] [--cache=<n>] [--cache-file=<path>]
+  sharded.py --help
+
+Options:
+  --output=<file>           Write the results here instead of stdout.
+  --workers=<n>             Number of worker processes. Defaults to the number of
+                            CPUs.
+  --chunk-size=<bytes>      Roughly how many bytes of input each shard gets.
+                            [default: 4194304]
+  --format=<format>         'jsonl' or 'csv'. Detected from the first line if not
+                            given.
+  --output-format=<format>  'jsonl' or 'csv'. Defaults to the input format.
+  --calculation=<name>      Calculation to use for jobs that don't name one.
+  --cache=<n>               Keep up to this many results in memory in each worker.
+                            Lengths are rounded to the nearest 1/16" when cached.
+  --cache-file=<path>       Also keep results in this SQLite file, shared by the
+                            workers and kept between runs.
+  -h --help                 Show this message.
+"""
+import io
+import json
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import TextIO
+import headless
+import registry
+import translate as tr
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Shards waiting to be written, per worker. Enough to keep every worker busy while
+# one slow shard holds up the output.
+SHARDS_IN_FLIGHT = 4
+
+# Line numbers at the start of headless.run's error messages
+ERROR_LINE = re.compile(r"^line (\d+):", re.MULTILINE)
+
+
+def shard_ranges(path: str, chunk_size: int = CHUNK_SIZE, skip_header: bool = False) -> list[tuple[int, int]]:
+    """Splits a file into byte ranges of roughly 'chunk_size' bytes, each ending just
+    after a line break (or at the end of the file).
+
+    Args:
+        path (str): The file to split.
+        chunk_size (int, optional): Bytes per shard. Defaults to CHUNK_SIZE.
+        skip_header (bool, optional): Leave the first line out of every shard, for CSV
+            files. Defaults to False.
+
+    Raises:
+        ValueError: If the chunk size is less than 1.
+
+    Returns:
+        list[tuple[int, int]]: The start and end (exclusive) of each shard.
+    """
+    if chunk_size < 1:
+        raise ValueError("The chunk size must be at least 1")
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as file:
+        start = len(file.readline()) if skip_header else 0
+        while start < size:
+            file.seek(min(start + chunk_size, size) - 1)
+            # Finish the line the boundary landed in
+            file.readline()
+            end = file.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _read_shard(path: str, start: int, end: int) -> str:
+    with open(path, "rb") as file:
+        file.seek(start)
+        return file.read(end - start).decode("utf-8")
+
+
+def count_jobs(text: str, input_format: str) -> int:
+    """Counts the jobs in a shard the way headless.read_jobs does: every line of a CSV
+    file that isn't empty, and every line of a JSON lines file that isn't blank. Lines
+    end at '\\n' only, like they do when the shard is read from a StringIO."""
+    lines = text.split("\n")
+    if input_format == "csv":
+        return sum(1 for line in lines if line not in ("", "\r"))
+    return sum(1 for line in lines if line.strip())
+
+
+def renumber(output: str, errors: str, offset: int, output_format: str) -> tuple[str, str]:
+    """Moves the line numbers in a shard's error messages and JSON error records on by
+    'offset', from the shard's own numbering to the whole file's."""
+    errors = ERROR_LINE.sub(lambda m: f"line {int(m[1]) + offset}:", errors)
+    if output_format == "csv":
+        return output, errors
+    lines = output.splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        if line.startswith('{"error": '):
+            record = json.loads(line)
+            record["line"] += offset
+            lines[i] = json.dumps(record) + "\n"
+    return "".join(lines), errors
+
+
+def run_shard(
+    path: str,
+    start: int,
+    end: int,
+    header: str,
+    input_format: str,
+    output_format: str,
+    calculation: str,
+) -> tuple[int, str, str, int]:
+    """Runs the jobs in one shard, in a worker process. Errors are numbered from the
+    first job in the shard (see 'renumber').
+
+    Args:
+        path (str): The input file.
+        start (int): Where the shard starts in the file.
+        end (int): Where the shard ends in the file.
+        header (str): The CSV header row, or "" for JSON lines.
+        input_format (str): 'jsonl' or 'csv'.
+        output_format (str): 'jsonl' or 'csv'.
+        calculation (str): Calculation to use for jobs that don't name one, or None.
+
+    Returns:
+        tuple[int, str, str, int]: The status from headless.run, the results without
+            a CSV header row, the error messages and the number of jobs.
+    """
+    text = _read_shard(path, start, end)
+    destination, log = io.StringIO(), io.StringIO()
+    status = headless.run(io.StringIO(header + text), destination, input_format, output_format, calculation, 1, log)
+    if registry.default().memo is not None:
+        # Pool workers are ended without running atexit handlers
+        registry.default().memo.flush()
+    output = destination.getvalue()
+    if output_format == "csv":
+        # The CSV header is only written once, by run()
+        output = output.partition("\n")[2]
+    return status, output, log.getvalue(), count_jobs(text, input_format)
+
+
+def _start_worker(cache_size: int = None, cache_file: str = None):
+    # Load the calculators once per worker, rather than in its first shard
+    if cache_size or cache_file:
+        import memo
+        registry.default().set_memo(memo.Memo(cache_size or memo.MAX_SIZE, cache_file))
+    registry.default()
+
+
+def run(
+    path: str,
+    destination: TextIO,
+    workers: int = None,
+    chunk_size: int = CHUNK_SIZE,
+    input_format: str = None,
+    output_format: str = None,
+    calculation: str = None,
+    cache_size: int = None,
+    cache_file: str = None,
+) -> int:
+    """Runs every job in a file through the calculators in parallel, writing the results
+    to 'destination' in input order.
+
+    Args:
+        path (str): The file to read jobs from.
+        destination (TextIO): The stream to write results to.
+        workers (int, optional): Number of worker processes. Defaults to the number of
+            CPUs.
+        chunk_size (int, optional): Bytes of input per shard. Defaults to CHUNK_SIZE.
+        input_format (str, optional): 'jsonl' or 'csv'. Detected from the first line
+            if not given. Defaults to None.
+        output_format (str, optional): 'jsonl' or 'csv'. Defaults to the input format.
+        calculation (str, optional): Calculation to use for jobs that don't name one.
+            Defaults to None.
+        cache_size (int, optional): Results each worker keeps in memory, see
+            memo.Memo. Defaults to None, for no cache.
+        cache_file (str, optional): SQLite file the workers share results through.
+            Defaults to None.
+
+    Raises:
+        ValueError: If the chunk size or number of workers is less than 1.
+
+    Returns:
+        int: 0 if every job succeeded, 1 if any of them failed, 2 if the calculation
+            isn't known.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("There must be at least 1 worker")
+
+    with open(path, encoding="utf-8") as file:
+        first = file.readline()
+    if input_format is None:
+        input_format = "jsonl" if first.lstrip().startswith("{") else "csv"
+    if output_format is None:
+        output_format = input_format
+    header = first if input_format == "csv" else ""
+
+    # Checks the calculation and writes the CSV header, with no jobs to run
+    status = headless.run(io.StringIO(header), destination, input_format, output_format, calculation)
+    if status:
+        return status
+
+    shards = shard_ranges(path, chunk_size, skip_header=bool(header))
+    failed = False
+    with ProcessPoolExecutor(workers, initializer=_start_worker, initargs=(cache_size, cache_file)) as pool:
+        # Shards are handed out as earlier ones are written, so that a slow shard can't
+        # leave the rest of the file's results piling up in memory
+        waiting = deque()
+        pending = iter(shards)
+        # Jobs in the shards written so far
+        offset = 0
+        while True:
+            while len(waiting) < workers * SHARDS_IN_FLIGHT:
+                shard = next(pending, None)
+                if shard is None:
+                    break
+                start, end = shard
+                waiting.append(pool.submit(
+                    run_shard, path, start, end, header, input_format, output_format, calculation
+                ))
+            if not waiting:
+                break
+            shard_status, output, errors, count = waiting.popleft().result()
+            if shard_status:
+                failed = True
+                output, errors = renumber(output, errors, offset, output_format)
+            offset += count
+            sys.stderr.write(errors)
+            destination.write(output)
+    destination.flush()
+    return 1 if failed else 0
+
+
+def main(
+    path: str,
+    output: str = None,
+    workers: int = None,
+    chunk_size: int = CHUNK_SIZE,
+    input_format: str = None,
+    output_format: str = None,
+    calculation: str = None,
+    cache_size: int = None,
+    cache_file: str = None,
+) -> int:
+    """Runs a sharded batch, printing the disclaimer to stderr like headless.main.
+
+    Returns:
+        int: The exit status.
+    """
+    msg = tr.catalog()
+    print(f"{msg.disclaimer_title}\n{msg.disclaimer_body}\n", file=sys.stderr)
+    try:
+        if output is None:
+            return run(path, sys.stdout, workers, chunk_size, input_format, output_format, calculation, cache_size, cache_file)
+        with open(output, "w", encoding="utf-8", newline="") as destination:
+            return run(path, destination, workers, chunk_size, input_format, output_format, calculation, cache_size, cache_file)
+    except (OSError, ValueError) as e:
+        if isinstance(e, BrokenPipeError):
+            # The reader went away, see headless.main
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+
+    arguments = docopt(__doc__)
+    sys.exit(main(
+        arguments["<input>"],
+        arguments["--output"],
+        int(arguments["--workers"]) if arguments["--workers"] else None,
+        int(arguments["--chunk-size"]),
+        arguments["--format"],
+        arguments["--output-format"],
+        arguments["--calculation"],
+        int(arguments["--cache"]) if arguments["--cache"] else None,
+        arguments["--cache-file"],
+    ))
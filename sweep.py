@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""Generates cut charts: runs a calculation over every combination of a range of rope
+diameters, eye/chain/sling sizes and tuck counts, and writes one row per combination as
+CSV or a markdown table.
+
+Each range is given as 'start:stop:step' (stop is included) or a single value, and
+fractions, mixed numbers and units like '1/8', '1-1/2' or '2ft' are accepted (see
+parser.py). Anything not given uses the ranges in DEFAULT_RANGES. The grid is worked
+through in chunks, and each chunk is calculated, formatted and written before the next
+is started, so a chart of any size only needs enough memory for one chunk. Combinations
+that can't be calculated, eg. an eye smaller than the rope, show NOT_AVAILABLE for
+their results. Tuck counts are whole numbers, without a unit.
+
+Usage:
+  sweep.py <calculation> [--range=<range>]... [--rope-type=<type>] [--format=<format>] [--chunk=<n>]
+  sweep.py --help
+
+Options:
+  --range=<range>       A range for one parameter, eg. 'eye_radius=1/2:4:1/4' or
+                        'tuck_count=5'. Can be given more than once.
+  --rope-type=<type>    Rope type, needed when the calculation is an alias shared
+                        between rope types.
+  --format=<format>     'csv' or 'markdown'. [default: csv]
+  --chunk=<n>           Number of rows to calculate at a time. [default: 4096]
+  -h --help             Show this message.
+"""
+import csv
+import os
+import sys
+from fractions import Fraction
+from itertools import islice, product
+from math import isfinite
+from typing import Callable, Iterable, Iterator, TextIO
+from length import COUNTS
+import headless
+import parser
+import utilities
+
+CHUNK_SIZE = 4096
+
+# Shown for the results of a combination that can't be calculated
+NOT_AVAILABLE = "n/a"
+
+# Used for parameters that aren't given a range. Anything else ending in '_radius' uses
+# the 'radius' range.
+DEFAULT_RANGES = {
+    "rope_diameter": "1/8:2:1/16",
+    "radius": "1/4:6:1/4",
+    "tuck_count": "3:7:1",
+}
+
+
+def parse_number(text: str) -> Fraction:
+    """Reads a number, fraction or mixed number exactly, eg. '2', '0.5', '3/8',
+    '1-1/2', '1+1/2' or '1 1/2', in inches unless it has a unit.
+
+    Raises:
+        ValueError: If the text isn't a number.
+    """
+    return parser.parse_exact(text)
+
+
+def parse_range(text: str, parse: Callable[[str], Fraction | int] = parse_number) -> list[Fraction | int]:
+    """Expands a range into its values.
+
+    Args:
+        text (str): 'start:stop:step' with the stop included, or a single value.
+        parse (Callable[[str], Fraction | int], optional): Reads each value, eg.
+            parser.parse_count for counts. Defaults to parse_number.
+
+    Raises:
+        ValueError: If the range can't be read, or its step isn't positive.
+
+    Returns:
+        list[Fraction | int]: The values, exactly.
+    """
+    parts = text.split(":")
+    if len(parts) == 1:
+        return [parse(parts[0])]
+    if len(parts) != 3:
+        raise ValueError(f"'{text}' should be 'start:stop:step' or a single value")
+    start, stop, step = (parse(p) for p in parts)
+    if step <= 0:
+        raise ValueError(f"The step of '{text}' must be more than 0")
+    # Multiplying rather than adding up the steps keeps every value exact
+    return [start + i * step for i in range(int((stop - start) / step) + 1)]
+
+
+def grid_ranges(calculation: type, ranges: dict[str, str] = None) -> dict[str, list]:
+    """Works out the values of every parameter of a calculation.
+
+    Args:
+        calculation (type): The calculation class.
+        ranges (dict[str, str], optional): Ranges for some of the parameters. Defaults
+            to None.
+
+    Raises:
+        ValueError: If a range is for a parameter the calculation doesn't have.
+
+    Returns:
+        dict[str, list]: The values for each parameter, with the rope diameter first
+            and the rest in the calculation's order. That is also the order the grid
+            goes through them, and the column order of the chart.
+    """
+    ranges = dict(ranges or {})
+    unknown = set(ranges) - set(calculation.parameters)
+    if unknown:
+        raise ValueError(f"{calculation.name} has no parameter {', '.join(sorted(unknown))}")
+
+    order = sorted(calculation.parameters, key=lambda p: p != "rope_diameter")
+    values = {}
+    for p in order:
+        default = DEFAULT_RANGES.get(p, DEFAULT_RANGES["radius"])
+        if p in COUNTS:
+            values[p] = parse_range(ranges.get(p, default), parser.parse_count)
+        else:
+            values[p] = [float(v) for v in parse_range(ranges.get(p, default))]
+    return values
+
+
+def chunks(iterable: Iterable, size: int) -> Iterator[list]:
+    """Splits anything iterable into lists of up to 'size' items."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def sweep(calculation: type, values: dict[str, list], chunk_size: int = CHUNK_SIZE) -> Iterator[list[list[str]]]:
+    """Calculates and formats every combination of the parameter values, a chunk at a
+    time.
+
+    Args:
+        calculation (type): The calculation class.
+        values (dict[str, list]): The values for each parameter, see grid_ranges().
+        chunk_size (int, optional): Rows per chunk. Defaults to CHUNK_SIZE.
+
+    Yields:
+        list[list[str]]: The formatted rows of each chunk, parameters then results,
+            with NOT_AVAILABLE for the results of rows that can't be calculated.
+    """
+    order = list(values)
+    # Where each of the calculation's parameters is in a grid row
+    positions = [order.index(p) for p in calculation.parameters]
+    formatters = [(lambda c: [str(v) for v in c]) if p in COUNTS else utilities.as_mixed_numbers for p in order]
+    failed = (float("nan"),) * len(calculation.results)
+
+    for rows in chunks(product(*values.values()), chunk_size):
+        jobs = [[row[i] for i in positions] for row in rows]
+        try:
+            results = headless.calculate_many(calculation, jobs)
+        except (ArithmeticError, ValueError):
+            # Calculated one at a time, a row that can't be calculated raises instead
+            # of coming out infinite, so find which it was
+            results = [_calculate_one(calculation, job, failed) for job in jobs]
+        columns = [f(column) for f, column in zip(formatters, zip(*rows))]
+        columns += [_format_results(column) for column in zip(*results)]
+        yield [list(row) for row in zip(*columns)]
+
+
+def _calculate_one(calculation: type, job: list, failed: tuple[float]) -> tuple[float]:
+    try:
+        return headless.calculate_many(calculation, [job])[0]
+    except (ArithmeticError, ValueError):
+        return failed
+
+
+def _format_results(column: tuple[float]) -> list[str]:
+    if all(map(isfinite, column)):
+        return utilities.as_mixed_numbers(column)
+    return [utilities.as_mixed_number(v) if isfinite(v) else NOT_AVAILABLE for v in column]
+
+
+def write_csv(header: list[str], chunks: Iterable[list[list[str]]], destination: TextIO):
+    writer = csv.writer(destination, lineterminator="\n")
+    writer.writerow(header)
+    for rows in chunks:
+        writer.writerows(rows)
+
+
+def write_markdown(header: list[str], chunks: Iterable[list[list[str]]], destination: TextIO):
+    destination.write(f"|{'|'.join(header)}|\n|{'|'.join('---' for _ in header)}|\n")
+    for rows in chunks:
+        destination.write("".join(f"|{'|'.join(row)}|\n" for row in rows))
+
+
+WRITERS = {
+    "csv": write_csv,
+    "markdown": write_markdown,
+}
+
+
+def main(
+    name: str,
+    ranges: list[str],
+    rope_type: str = None,
+    output_format: str = "csv",
+    chunk_size: int = CHUNK_SIZE
+) -> int:
+    """Writes a cut chart.
+
+    Args:
+        name (str): The name or an alias of the calculation.
+        ranges (list[str]): Ranges, as 'parameter=range'.
+        rope_type (str, optional): The rope type, for aliases. Defaults to None.
+        output_format (str, optional): 'csv' or 'markdown'. Defaults to "csv".
+        chunk_size (int, optional): Rows per chunk. Defaults to CHUNK_SIZE.
+
+    Returns:
+        int: The exit status.
+    """
+    try:
+        if output_format not in WRITERS:
+            raise ValueError(f"Unknown format '{output_format}', use one of {', '.join(WRITERS)}")
+        if chunk_size < 1:
+            raise ValueError("The chunk size must be at least 1")
+        calculation = headless.find_calculation(name, rope_type)
+        given = {}
+        for r in ranges:
+            parameter, found, value = r.partition("=")
+            if not found:
+                raise ValueError(f"'{r}' should be 'parameter=range'")
+            given[parameter.strip()] = value
+        values = grid_ranges(calculation, given)
+    except (ValueError, ZeroDivisionError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    header = list(values) + list(calculation.results)
+    try:
+        WRITERS[output_format](header, sweep(calculation, values, chunk_size), sys.stdout)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away (eg. piped into 'head'), see headless.main
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+
+    arguments = docopt(__doc__)
+    sys.exit(main(
+        arguments["<calculation>"],
+        arguments["--range"],
+        arguments["--rope-type"],
+        arguments["--format"],
+        int(arguments["--chunk"])
+    ))
@@ -7,280 +7,279 @@ accurate translations for.
 In the process of doing all this, I've realized that it does make the code a huge pain
 in the ass to maintain, but ¯\_(ツ)_/¯. I'm doing it mostly because it's something I've
 never done before.
-"""
-import utilities
-
-
-language_options = {"en"}
-
-# +--------------------------------------------------------+
-# |                                                        |
-# |            Dialog buttons and exit options             |
-# |                                                        |
-# +--------------------------------------------------------+
-yes = {
-    "en": "Yes"
-}
-
-no = {
-    "en": "No"
-}
 
-ok = {
-    "en": "OK"
-}
+The messages for each language live in 'locales/<lang>.json', and are only read the
+first time that language is asked for. Use catalog() to get them:
 
-continue_btn = {
-    "en": "Continue"
-}
-
-cancel = {
-    "en": "Cancel"
-}
-
-back = {
-    "en": "Back"
-}
-
-quit = {
-    "en": "Quit"
-}
+    msg = translate.catalog("en")
+    print(msg.rope_diameter_message)
 
-
-# +--------------------------------------------------------+
-# |                                                        |
-# |           Calculation questions and results            |
-# |                                                        |
-# +--------------------------------------------------------+
-rope_diameter_message = {
-    "en": "Enter the diameter of the rope you are using: "
-}
-
-# Used with utilities.radius_or_diameter helper functions
-radius_or_diameter_message = {
-    "radius": {
-        "en": "Enter the desired {name} radius, or d to use diameter: "
-    },
-    "diameter": {
-        "en": "Enter the desired {name} diameter: "
-    }
-}
-
-chain_diameter_message = {
-    "en": "Enter chain link diameter: "
-}
-
-tuck_count_message = {
-    "en": "Enter the desired number of tucks (5 is typical): "
-}
-
-# Single word entries
-eye = {
-    "en": "eye"
-}
-
-sling = {
-    "en": "sling"
-}
-
-source = {
-    "en": "Source"
-}
-
-# Results entries
-results = {
-    "en": "Results"
-}
-
-length = {
-    "en": "Length"
-}
-
-total_length = {
-    "en": "Total length"
-}
-
-eye_length = {
-    "en": "Eye length"
-}
-
-loop_length = {
-    "en": "Loop length"
-}
-
-tuck_length = {
-    "en": "Tuck length"
-}
-
-lost_length = {
-    "en": "Est. length lost"
-}
-
-bury_length = {
-    "en": "Bury length"
-}
-
-tail_length = {
-    "en": "Tail length"
-}
-
-sling_circumference = {
-    "en": "Sling circumference"
-}
-
-short_fid = {
-    "en": "Short fid"
-}
-
-half_fid = {
-    "en": "Half fid"
-}
-
-long_fid = {
-    "en": "Long fid"
-}
-
-full_fid = {
-    "en": "Full fid"
-}
-
-
-# +--------------------------------------------------------+
-# |                                                        |
-# |         Script control questions and responses         |
-# |                                                        |
-# +--------------------------------------------------------+
-# Some of these prompts differ between text and dialog modes, so I have split them up
-# into two dicts.
-select_rope_type_text = {
-    "en": "Enter a number from the list to select a type of rope: "
-}
-
-select_rope_type_dialog = {
-    "en": "What type of rope are you working with?"
-}
-
-select_calculation_text = {
-    "en": "Enter a number from the list to select a calculation: "
-}
-
-select_calculation_dialog = {
-    "en": "What calculation do you want to do?"
-}
-
-# For the 'utilities.select_from_list' function
-select_from_list_error = {
-    "en": "'{answer}' is not a valid option. Please try again or select the '{oops_option}' option.\n"
-}
-
-# If you are not familiar with command line prompts, yes/no question are often asked in
-# this format, ending with [y/n]. Typically Y or N are capitalized, indicating the
-# default answer.
-end_message = {
-    "en": "Run again? [y/N]: "
-}
-
-# Because of how I handle this in the script, this translation should be the AFFIMATIVE
-# answer to the above question.
-end_message_answer = {
-    "en": ["y", "yes"]
-}
-
-# Categorization error messages
-cat_error_message = {
-    "en": "The following calculations have been categorized incorrectly and will be omitted:"
-}
-
-# The values inside the curly braces within the string MUST remain the same in all
-# languages, otherwise they will not be replace correctly.
-cat_error_listing = {
-    "en": "  Name: {c_title} ({c_rope_type})\n  As rope type: {rt}"
-}
-
-# Single word entries
-rope_type = {
-    "en": "Rope type"
-}
-
-calculation = {
-    "en": "Calculation"
-}
-
-error = {
-    "en": "Error"
-}
-
-
-# +--------------------------------------------------------+
-# |                                                        |
-# |            Rope types and calculation names            |
-# |                                                        |
-# +--------------------------------------------------------+
-rope_types: dict[str, dict[utilities.RopeType, str]] = {
-    "en": {
-        utilities.RopeType.GENERAL:         "General",
-        utilities.RopeType.TWISTED:         "Twisted",
-        utilities.RopeType.HOLLOW_BRAID:    "Hollow braid"
-    }
-}
-
-back_splice = {
-    "en": "Back splice"
-}
-
-chain_splice = {
-    "en": "Chain splice"
-}
-
-eye_splice = {
-    "en": "Eye splice"
-}
-
-locked_eye_splice = {
-    "en": "Locked Brummel eye splice"
-}
-
-grog_sling = {
-    "en": "Grog sling"
-}
-
-fid_length_table = {
-    "en": "Fid Length Table"
-}
-
-fid_length_calculate = {
-    "en": "Fid Length Calculator"
-}
-
-fid_table_headers: dict[str, tuple[str]] = {
-    "en": ("Rope dia. (in)", "Short fid (in)", "Long fid (in)", "Full fid (in)")
-}
-
-
-# +--------------------------------------------------------+
-# |                                                        |
-# |                       Disclaimer                       |
-# |                                                        |
-# +--------------------------------------------------------+
-# If you need the full text of the disclaimer in a nice, line-wrapped format, see
-# README.md
-disclaimer_title = {
-    "en": "!!! DISCLAIMER - READ FULLY BEFORE CONTINUING !!!"
-}
-
-disclaimer_body = {
-    "en": "The numbers given by this tool are intended as a guide only. If you plan on using any of the splices described here for lifting or life support appliations, it is your responsibility to make sure you are tying everything correctly and following all relevant laws where you live. There are a lot of variables with splices, and making a mistake with the wrong ones can seriously impact the strength of the final splice. If you doubt yuor skills at all, you should not be trusting your, or other people's, lives to your splices."
-}
-
-disclaimer_acknowledge_text_message = {
-    "en": "Type 'yes' if you have read and agree to the disclaimer: "
-}
-
-# This should be correct answer to the above prompt. Eg. 'yes' for english
-disclaimer_acknowledge_text_answer = {
-    "en": "yes"
-}
-
-disclaimer_acknowledge_dialog = {
-    "en": "By selecting 'yes', you are saying that you have read and agree to the disclaimer."
-}
+A new language only needs a new file. Anything missing from it falls back to english.
+"""
+import json
+import os
+from functools import cache
+from typing import Callable, Iterator
+
+LOCALE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locales")
+DEFAULT_LANGUAGE = "en"
+
+language_options = {
+    os.path.splitext(f)[0] for f in os.listdir(LOCALE_DIR) if f.endswith(".json")
+}
+
+# Every message a catalog has, in the same order as the locale files
+MESSAGES = (
+    # +--------------------------------------------------------+
+    # |                                                        |
+    # |            Dialog buttons and exit options             |
+    # |                                                        |
+    # +--------------------------------------------------------+
+    "yes",
+    "no",
+    "ok",
+    "continue_btn",
+    "cancel",
+    "back",
+    "quit",
+
+    # +--------------------------------------------------------+
+    # |                                                        |
+    # |           Calculation questions and results            |
+    # |                                                        |
+    # +--------------------------------------------------------+
+    "rope_diameter_message",
+    # Used with utilities.radius_or_diameter helper functions, '{name}' is the thing
+    # being measured, eg. 'eye'
+    "radius_message",
+    "diameter_message",
+    "chain_diameter_message",
+    "tuck_count_message",
+    # Single word entries
+    "eye",
+    "sling",
+    "source",
+    # Results entries
+    "results",
+    "length",
+    "total_length",
+    "eye_length",
+    "loop_length",
+    "tuck_length",
+    "lost_length",
+    "bury_length",
+    "tail_length",
+    "sling_circumference",
+    "short_fid",
+    "half_fid",
+    "long_fid",
+    "full_fid",
+
+    # +--------------------------------------------------------+
+    # |                                                        |
+    # |         Script control questions and responses         |
+    # |                                                        |
+    # +--------------------------------------------------------+
+    # Some of these prompts differ between text and dialog modes, so I have split them
+    # up into two messages.
+    "select_rope_type_text",
+    "select_rope_type_dialog",
+    "select_calculation_text",
+    "select_calculation_dialog",
+    # For the 'utilities.select_from_list' function
+    "select_from_list_error",
+    # If you are not familiar with command line prompts, yes/no question are often
+    # asked in this format, ending with [y/n]. Typically Y or N are capitalized,
+    # indicating the default answer.
+    "end_message",
+    # Because of how I handle this in the script, this translation should be a list of
+    # the AFFIMATIVE answers to the above question.
+    "end_message_answer",
+    # Single word entries
+    "rope_type",
+    "calculation",
+    "error",
+
+    # +--------------------------------------------------------+
+    # |                                                        |
+    # |            Rope types and calculation names            |
+    # |                                                        |
+    # +--------------------------------------------------------+
+    # Keyed by the lower case RopeType name, eg. 'hollow_braid'
+    "rope_types",
+    "back_splice",
+    "chain_splice",
+    "eye_splice",
+    "locked_eye_splice",
+    "grog_sling",
+    "fid_length_table",
+    "fid_length_calculate",
+    "fid_table_headers",
+
+    # +--------------------------------------------------------+
+    # |                                                        |
+    # |                       Disclaimer                       |
+    # |                                                        |
+    # +--------------------------------------------------------+
+    # If you need the full text of the disclaimer in a nice, line-wrapped format, see
+    # README.md
+    "disclaimer_title",
+    "disclaimer_body",
+    "disclaimer_acknowledge_text_message",
+    # This should be correct answer to the above prompt. Eg. 'yes' for english
+    "disclaimer_acknowledge_text_answer",
+    "disclaimer_acknowledge_dialog",
+
+    # +--------------------------------------------------------+
+    # |                                                        |
+    # |                 One line commands (repl)               |
+    # |                                                        |
+    # +--------------------------------------------------------+
+    "repl_intro",
+    # '{calculations}' is the list of calculation names and aliases
+    "repl_help",
+    "repl_unknown_calculation",
+    # '{options}' is the list of calculations it could be
+    "repl_ambiguous_calculation",
+    "repl_too_many_values",
+    # '{keyword}' is the name given, '{parameters}' the ones the calculation takes
+    "repl_unknown_keyword",
+    # '{error}' is the reason, eg. 'float division by zero'
+    "repl_calculation_failed",
+)
+
+
+class Catalog:
+    __slots__ = ("lang", "_templates", *MESSAGES)
+
+    def __init__(self, lang: str, messages: dict):
+        """Every message for one language, as plain attributes.
+
+        Args:
+            lang (str): Language specifer for translations.
+            messages (dict): The messages, with a key for every name in MESSAGES.
+        """
+        self.lang = lang
+        self._templates: dict[tuple[tuple[str], bool], Callable[..., str]] = {}
+        for key in MESSAGES:
+            setattr(self, key, messages[key])
+        self.end_message_answer = tuple(self.end_message_answer)
+        self.fid_table_headers = tuple(self.fid_table_headers)
+
+    def rope_type_name(self, rope_type) -> str:
+        """Gets the name of a RopeType in this language."""
+        return self.rope_types[rope_type.name.lower()]
+
+    def result_template(self, *labels: str, header: bool = True) -> Callable[..., str]:
+        """Gets a template for a block of results, eg. for ("total_length", "eye_length"):
+
+            Results
+            ================
+            Total length: {}
+            Eye length: {}
+
+        The template is only put together the first time it is asked for, so showing
+        lots of results only costs a single call each.
+
+        Args:
+            *labels (str): The message name of each result, in order.
+            header (bool, optional): Whether to start with the 'Results' heading.
+                Defaults to True.
+
+        Returns:
+            Callable[..., str]: Takes the formatted value of each result and returns
+                the block.
+        """
+        key = (labels, header)
+        template = self._templates.get(key)
+        if template is None:
+            # The text that goes before each value
+            parts = [f"{getattr(self, label)}: " for label in labels]
+            if parts:
+                parts[0] = (f"{self.results}\n================\n" if header else "") + parts[0]
+                parts[1:] = ["\n" + p for p in parts[1:]]
+            template = self._templates[key] = _compile_template(parts)
+        return template
+
+
+def _compile_template(parts: list[str]) -> Callable[..., str]:
+    """Turns the text between the values of a template into a function that takes the
+    values, built around a single f-string. That skips parsing the template on every
+    call, which str.format() can't. The text itself is passed in as variables, so the
+    translations never end up in the generated code.
+
+    Args:
+        parts (list[str]): The text that goes before each value.
+
+    Returns:
+        Callable[..., str]: Takes one value for each part and returns the filled in
+            template.
+    """
+    arguments = ", ".join(f"v{i}" for i in range(len(parts)))
+    body = "".join(f"{{p{i}}}{{v{i}}}" for i in range(len(parts)))
+    return eval(f"lambda {arguments}: f'{body}'", {f"p{i}": p for i, p in enumerate(parts)})
+
+
+@cache
+def catalog(lang: str = DEFAULT_LANGUAGE) -> Catalog:
+    """Gets the messages for a language, reading them in the first time.
+
+    Args:
+        lang (str, optional): Language specifer for translations. Defaults to
+            DEFAULT_LANGUAGE.
+
+    Raises:
+        LookupError: If there are no translations for the language.
+        ValueError: If the english file is missing any messages.
+
+    Returns:
+        Catalog: The messages.
+    """
+    if lang not in language_options:
+        raise LookupError(f"No translations for '{lang}'. Available options are {', '.join(sorted(language_options))}")
+    with open(os.path.join(LOCALE_DIR, f"{lang}.json"), encoding="utf-8") as f:
+        messages = json.load(f)
+
+    missing = [key for key in MESSAGES if key not in messages]
+    if missing and lang == DEFAULT_LANGUAGE:
+        raise ValueError(f"{lang}.json is missing {', '.join(missing)}")
+    if missing:
+        fallback = catalog(DEFAULT_LANGUAGE)
+        for key in missing:
+            messages[key] = getattr(fallback, key)
+    return Catalog(lang, messages)
+
+
+class _Message:
+    def __init__(self, key: str):
+        """One message in every language, for code still written against the old
+        'translate.<message>[lang]' dicts."""
+        self.key = key
+
+    def __getitem__(self, lang: str):
+        try:
+            return getattr(catalog(lang), self.key)
+        except LookupError:
+            raise KeyError(lang) from None
+
+    def __contains__(self, lang: str) -> bool:
+        return lang in language_options
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(language_options)
+
+
+def __getattr__(name: str):
+    # The old module level dicts, built on demand from the catalogs
+    if name == "radius_or_diameter_message":
+        return {"radius": _Message("radius_message"), "diameter": _Message("diameter_message")}
+    if name == "rope_types":
+        from core import RopeType
+
+        return {
+            lang: {rt: catalog(lang).rope_type_name(rt) for rt in RopeType}
+            for lang in language_options
+        }
+    if name in MESSAGES:
+        return _Message(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,16 +1,24 @@
 #!/usr/bin/env python3
-from typing import TypeAlias, Union
-from prompt_toolkit import PromptSession
-from prompt_toolkit.styles import Style
-from prompt_toolkit.shortcuts import input_dialog
-from enum import Enum
+from __future__ import annotations
+from functools import cache
+from math import floor, gcd
+from typing import TYPE_CHECKING, TypeAlias
+from core import RopeType
+from length import Length, LengthArray, Rounding
+import parser
 import translate as tr
 import re
 
+# prompt_toolkit is only imported by the functions that actually talk to the user, so
+# that the calculations and formatting can be used without loading it.
+if TYPE_CHECKING:
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.styles import Style
+
 
 # NOTE: DEPRECATED - Changed classes to accept both the session and style separately, instead
 # of taking one or the other.
-SessionOrStyle: TypeAlias = Union[PromptSession, Style]
+SessionOrStyle: TypeAlias = "PromptSession | Style"
 
 
 def select_from_list(
@@ -32,6 +40,7 @@ def select_from_list(
         int: The index of the item selected. May be in the range of
             [0, length of options list].
     """
+    msg = tr.catalog(lang)
     options_list = "".join(
         [f"\n  {i}) {options[i]}" for i in range(len(options))] + [f"\n  {len(options)}) {oops_option}"]
     )
@@ -41,14 +50,14 @@ def select_from_list(
             answer = int(session.prompt(full_message))
             if answer > len(options):
                 print(
-                    tr.select_from_list_error[lang].format(answer=answer, oops_option=oops_option)
+                    msg.select_from_list_error.format(answer=answer, oops_option=oops_option)
                 )
                 continue
             return answer
         except ValueError as e:
             value = re.search(r"'(.*)'$", str(e))
             print(
-                tr.select_from_list_error[lang].format(answer=value.group(1), oops_option=oops_option)
+                msg.select_from_list_error.format(answer=value.group(1), oops_option=oops_option)
             )
 
 
@@ -63,12 +72,12 @@ def radius_or_diameter_text(session: PromptSession, item_name: str, lang: str =
     Returns:
         float: The radius of the item, because that's usually what we actually want.
     """
-    raw_radius: str = session.prompt(tr.radius_or_diameter_message["radius"][lang].format(name=item_name))
-    if raw_radius in ["d", "D"]:
-        raw_diameter = session.prompt(tr.radius_or_diameter_message["diameter"][lang].format(name=item_name))
-        return float(raw_diameter) / 2
-    else:
-        return float(raw_radius)
+    msg = tr.catalog(lang)
+    radius, diameter = parser.parse_measurement(session.prompt(msg.radius_message.format(name=item_name)))
+    if radius is None:
+        # Just 'd', so ask for the diameter
+        radius = parser.parse_length(session.prompt(msg.diameter_message.format(name=item_name)))
+    return radius / 2 if diameter else radius
 
 
 def radius_or_diameter_dialog(style: Style, title: str, item_name: str, lang: str = "en") -> float:
@@ -83,73 +92,160 @@ def radius_or_diameter_dialog(style: Style, title: str, item_name: str, lang: st
     Returns:
         float: The radius of the item, because that's usually what we actually want.
     """
+    from screen import input_dialog
+
+    msg = tr.catalog(lang)
     raw_radius = input_dialog(
         title=title,
-        text=tr.radius_or_diameter_message["radius"][lang].format(name=item_name),
-        ok_text=tr.ok[lang],
-        cancel_text=tr.cancel[lang],
+        text=msg.radius_message.format(name=item_name),
+        ok_text=msg.ok,
+        cancel_text=msg.cancel,
         style=style
     ).run()
-    if raw_radius in ["d", "D"]:
-        raw_diameter = input_dialog(
+    radius, diameter = parser.parse_measurement(raw_radius)
+    if radius is None:
+        radius = parser.parse_length(input_dialog(
             title=title,
-            text=tr.radius_or_diameter_message["diameter"][lang].format(name=item_name),
-            ok_text=tr.ok[lang],
-            cancel_text=tr.cancel[lang],
+            text=msg.diameter_message.format(name=item_name),
+            ok_text=msg.ok,
+            cancel_text=msg.cancel,
             style=style
-        ).run()
-        return float(raw_diameter) / 2
-    else:
-        return float(raw_radius)
+        ).run())
+    return radius / 2 if diameter else radius
 
-def round_to_sixteenths(value: float) -> float:
+def round_to_sixteenths(value: float, denominator: int = 16, rounding: Rounding = Rounding.DOWN) -> float:
     """Utility function to round a floating point value to the nearest 1/16th. Will
-    always round down.
+    always round down, unless told otherwise. Use Length.round() for exact rounding.
 
     Args:
         value (float): The floating point value to be rounded.
+        denominator (int, optional): Round to this fraction instead, eg. 32 for the
+            nearest 1/32nd. Defaults to 16.
+        rounding (Rounding, optional): Which way to round. Defaults to Rounding.DOWN.
 
     Returns:
         float: The rounded value.
     """
-    remainder = value % 0.0625
-    return value - remainder
+    return rounding.apply(value * denominator) / denominator
+
+
+@cache
+def _fraction_suffixes(denominator: int) -> tuple[str]:
+    """Builds the lookup table used by 'as_mixed_number', holding the reduced fraction
+    to add to the whole number for each possible count of 1/denominator parts, eg. for
+    sixteenths entry 4 is "+1/4" and entry 0 is "".
+
+    Args:
+        denominator (int): The denominator the values are rounded to.
+
+    Returns:
+        tuple[str]: The suffix for each remainder from 0 to denominator - 1.
+    """
+    if denominator < 1:
+        raise ValueError(f"denominator must be at least 1, not {denominator}")
+    suffixes = [""]
+    for n in range(1, denominator):
+        common = gcd(n, denominator)
+        suffixes.append(f"+{n // common}/{denominator // common}")
+    return tuple(suffixes)
+
+
+_SIXTEENTHS = _fraction_suffixes(16)
+_DOWN = Rounding.DOWN
 
-def as_mixed_number(value: float) -> str:
+
+def as_mixed_number(
+    value: float | Length, denominator: int = 16, rounding: Rounding = Rounding.DOWN, unit: str = "in"
+) -> str:
     """Utility function to convert a floating point value to a mixed number, rounded to
     the nearest 1/16th.
 
     Args:
-        value (float): The floating point value to be converted
+        value (float | Length): The value to be converted. Lengths are rounded exactly.
+        denominator (int, optional): Round to this fraction instead, eg. 32 or 64.
+            Defaults to 16.
+        rounding (Rounding, optional): Which way to round. Defaults to Rounding.DOWN,
+            the same as round_to_sixteenths.
+        unit (str, optional): The unit to show Lengths in, eg. "ft". Floats are shown
+            as they are. Defaults to "in".
 
     Returns:
         str: The mixed number form, rounded to the nearest 1/16th.
     """
-    rounded_value = round_to_sixteenths(value)
-    
-    fractional_part = (rounded_value % 1) * 16
-    integral_part = int(rounded_value)
-    
-    halves = 1
-    while fractional_part:
-        if fractional_part % 2:
-            break
-        fractional_part /= 2
-        halves *= 2
-    
-    if not fractional_part:
-        return str(integral_part)
+    suffixes = _SIXTEENTHS if denominator == 16 else _fraction_suffixes(denominator)
+    if rounding is _DOWN and value.__class__ is float:
+        steps = floor(value * denominator)
+    elif isinstance(value, Length):
+        steps = value.steps(denominator, rounding, unit)
     else:
-        return f"{integral_part}+{int(fractional_part)}/{int(16/halves)}"
+        steps = rounding.apply(value * denominator)
+    whole, part = divmod(steps, denominator)
+    # The whole number is rounded towards zero for negative values, eg. -1/2 is shown
+    # as "0+1/2", which is how this has always worked
+    if whole < 0 and part:
+        whole += 1
+    return f"{whole}{suffixes[part]}"
 
 
-class RopeType(Enum):
-    GENERAL = 0
-    TWISTED = 1
-    HOLLOW_BRAID = 2
+def as_mixed_numbers(
+    values, denominator: int = 16, rounding: Rounding = Rounding.DOWN, unit: str = "in"
+) -> list[str]:
+    """Utility function to convert many values to mixed numbers at once. Gives exactly
+    the same results as calling 'as_mixed_number' on each value, but NumPy arrays are
+    rounded all in one go.
 
-    def __str__(self):
-        return self.name.capitalize().replace("_", " ")
+    Args:
+        values (Iterable[float | Length] | LengthArray | np.ndarray): The values to be
+            converted.
+        denominator (int, optional): Round to this fraction instead, eg. 32 or 64.
+            Defaults to 16.
+        rounding (Rounding, optional): Which way to round. Defaults to Rounding.DOWN.
+        unit (str, optional): The unit to show Lengths in. Defaults to "in".
+
+    Raises:
+        ValueError: If a NumPy array contains infinite or NaN values.
+
+    Returns:
+        list[str]: The mixed number form of each value.
+    """
+    suffixes = _SIXTEENTHS if denominator == 16 else _fraction_suffixes(denominator)
+
+    if hasattr(values, "dtype"):
+        import numpy as np
+
+        scaled = np.asarray(values, dtype=np.float64) * denominator
+        if rounding is Rounding.UP:
+            scaled = np.ceil(scaled)
+        else:
+            scaled = np.floor(scaled if rounding is _DOWN else scaled + 0.5)
+        if not np.isfinite(scaled).all():
+            raise ValueError("cannot convert infinite or NaN values to mixed numbers")
+        wholes, parts = np.divmod(scaled.astype(np.int64), denominator)
+        wholes += (wholes < 0) & (parts != 0)
+        return [f"{w}{suffixes[p]}" for w, p in zip(wholes.ravel().tolist(), parts.ravel().tolist())]
+
+    # Same steps as as_mixed_number, with the lookups hoisted out of the loop
+    if isinstance(values, LengthArray):
+        all_steps = values.steps(denominator, rounding, unit)
+    elif rounding is _DOWN:
+        all_steps = [
+            v.steps(denominator, rounding, unit) if v.__class__ is Length else floor(v * denominator)
+            for v in values
+        ]
+    else:
+        all_steps = [
+            v.steps(denominator, rounding, unit) if v.__class__ is Length else rounding.apply(v * denominator)
+            for v in values
+        ]
+
+    results = []
+    append = results.append
+    for steps in all_steps:
+        whole, part = divmod(steps, denominator)
+        if whole < 0 and part:
+            whole += 1
+        append(f"{whole}{suffixes[part]}")
+    return results
 
 
 class LengthCalculator: